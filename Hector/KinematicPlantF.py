@@ -0,0 +1,357 @@
+import os, hashlib, tempfile
+import numpy
+import xml.etree.ElementTree as ElementTree
+from math import pi
+from . import RobotSettings as RSTATIC
+import geomparse
+
+##
+#	Headless stand-in for the Hector simulator and its communication interface.
+#
+#	The kinematic plant provides the BioFlexBus clients which are used by the
+#	Robot, Leg and SimulatorTimerModule objects (same attribute names as the
+#	clients of comminter), but computes the drives itself with NumPy instead of
+#	connecting to the simulator: the joint velocities are integrated into the
+#	input positions of the drives, the output positions follow through the
+#	elastic element (spring and damper). Ground contact is approximated from the
+#	height of the feet: the body (kept horizontal) rests on the lowest feet and
+#	its weight, shared by these legs, deflects the elastic elements of the beta
+#	joints.
+#	Use: CommunicationInterface() instead of comminter.CommunicationInterface().
+##
+
+## Id of the simulator server.
+SIMSERV_ID = 14
+
+## Directory of the drive parameters read from geometry xmls (see read_drives),
+#  None to parse the geometry xml at every start.
+GEOMETRY_CACHE = os.path.join(tempfile.gettempdir(), "hector_geometry_cache")
+
+##
+#	Parameters of the rotatory drives of a geometry xml: one row (BioFlexBus id,
+#	initial output angle, spring constant, damping constant) per drive, NaN for
+#	missing values.
+#	Parsing the complete geometry (several MB) takes most of the start up time of
+#	the plant, so the parameters are cached in GEOMETRY_CACHE under the hash of
+#	the xml and the xml is only parsed once.
+##
+def read_drives(geometry_xml):
+	data = geometry_xml.encode() if isinstance(geometry_xml, str) else geometry_xml
+	filename = None
+	if GEOMETRY_CACHE is not None:
+		filename = os.path.join(GEOMETRY_CACHE, hashlib.sha1(data).hexdigest() + ".npy")
+		if os.path.exists(filename):
+			try:
+				return numpy.load(filename)
+			except (OSError, ValueError):
+				pass	# incomplete file, parsed and written again
+
+	tags = ('InitialOutputAngle', 'SpringConstant', 'DampingConstant')
+	drives = []
+	for drive in ElementTree.fromstring(data).iter('BioFlexRotatory'):
+		elements = [drive.find(tag) for tag in tags]
+		drives.append([float(drive.get('BioFlexBusId'))] + [float('nan') if element is None else float(element.text) for element in elements])
+	drives = numpy.array(drives, dtype=float).reshape(-1, 1 + len(tags))
+
+	if filename is not None:
+		# written under a temporary name, so that parallel runs never read an incomplete file
+		try:
+			os.makedirs(GEOMETRY_CACHE, exist_ok=True)
+			temporary = "%s.%d.tmp" % (filename, os.getpid())
+			with open(temporary, "wb") as cache_file:
+				numpy.save(cache_file, drives)
+			os.replace(temporary, filename)
+		except OSError:
+			pass	# no cache (e.g. read only file system)
+	return drives
+
+##
+#	Numerical state of all drives (legs x joints) and the plant dynamics.
+#	The plants of several robots can be stacked (robots x legs x joints, see stack)
+#	and are then advanced at once.
+##
+class KinematicPlant:
+
+	## State arrays of a plant that are moved into the stacked state
+	state_names = ('input_position', 'output_position', 'velocity', 'activation',
+				   'spring_constant', 'damping_constant', 'contact', 'deflection')
+
+	##	Initialisation with the leg geometry (from geomparse).
+	#	@param body_weight weight of the robot in N, carried by the stance legs
+	#	@param contact_tolerance feet up to this distance above the lowest foot are on the ground
+	def __init__(self, body_weight=(6.4 + 6*0.9)*9.81, contact_tolerance=0.01):
+		self.body_weight = body_weight
+		self.contact_tolerance = contact_tolerance
+
+		geometry = geomparse.parseHectorXml('')
+		legs = [geometry[leg_name] for leg_name in RSTATIC.leg_names]
+		self.bus_ids = [leg['bfb_client_ids'][0:3] for leg in legs]
+		self.segment_lengths = numpy.array([leg['segment_lengths'] for leg in legs]).T
+		# For all drives, for which a positive rotation of beta will lift the leg (as in the Robot object)
+		beta_direction = numpy.array([leg_name not in ['front_left_leg', 'middle_left_leg', 'hind_right_leg'] for leg_name in RSTATIC.leg_names])
+		self.lift_sign = numpy.where(beta_direction, 1., -1.)
+		# Height (last row of the phi psi chi transformation) of the points in the leg coordinate system
+		self.height_row = numpy.array([self._phi_psi_transform(leg['phi'], leg['psi'], leg['chi'])[2, 0:3] for leg in legs])
+
+		shape = (len(legs), 3)
+		self.input_position = numpy.zeros(shape)
+		self.output_position = numpy.zeros(shape)
+		self.velocity = numpy.zeros(shape)
+		self.activation = numpy.zeros(shape)
+		self.spring_constant = numpy.full(shape, 100.)
+		self.damping_constant = numpy.ones(shape)
+		self.contact = numpy.zeros(len(legs), dtype=bool)
+		self.deflection = numpy.zeros(len(legs))
+		self.body_height = 0.
+		self.time = 0.
+
+	##	Plant of several robots: the state of the given plants is stacked (robots x legs x joints),
+	#	the plants keep their attributes as views on the rows of the stacked state (so the
+	#	clients of the robots read and write the stacked state), body height and time are
+	#	kept per robot in the stacked plant. The stacked plant is advanced with step,
+	#	the given plants are not advanced on their own any more.
+	@classmethod
+	def stack(cls, plants):
+		stacked = cls.__new__(cls)
+		stacked.__dict__.update(plants[0].__dict__)
+		for name in cls.state_names:
+			values = numpy.array([getattr(plant, name) for plant in plants])
+			setattr(stacked, name, values)
+			for row, plant in enumerate(plants):
+				setattr(plant, name, values[row])
+		stacked.body_height = numpy.array([plant.body_height for plant in plants])
+		stacked.time = plants[0].time
+		return stacked
+
+	##	Index (leg, joint) of the drive with the given BioFlexBus id, None for other ids.
+	def drive_index(self, bus_id):
+		for leg_nr, ids in enumerate(self.bus_ids):
+			if bus_id in ids:
+				return (leg_nr, ids.index(bus_id))
+		return None
+
+	##	Reading the drives from a geometry xml (as sent to the simulator):
+	#	initial output angle, spring and damping constant of the rotatory drives.
+	def load_geometry(self, geometry_xml):
+		for drive in read_drives(geometry_xml):
+			index = self.drive_index(int(drive[0]))
+			if index is None:
+				continue
+			for value, values in zip(drive[1:], (self.output_position, self.spring_constant, self.damping_constant)):
+				if not numpy.isnan(value):
+					values[index] = value
+			self.input_position[index] = self.output_position[index]
+
+	##	Height of the feet in the robot coordinate system (vectorized forward kinematics
+	#	as in Leg.computeForwardKinematics, all legs at once) and the horizontal
+	#	distance of the feet from the beta joints (lever of the load at the beta joints).
+	#	The angles are given as legs x joints, or stacked (robots x legs x joints).
+	def foot_height(self, angles):
+		alpha = -angles[..., 0]
+		beta = angles[..., 1] * self.lift_sign
+		gamma = -angles[..., 2] * self.lift_sign - pi/2
+		coxa, femur, tibia = self.segment_lengths
+		reach = femur*numpy.cos(beta) + tibia*numpy.cos(beta + gamma)
+		lift = femur*numpy.sin(beta) + tibia*numpy.sin(beta + gamma)
+		point = numpy.stack([(reach + coxa)*numpy.cos(alpha), (reach + coxa)*numpy.sin(alpha), lift], axis=-1)
+		return numpy.einsum('...ij,...ij->...i', self.height_row, point), reach
+
+	##	Advancing the plant by dt seconds.
+	def step(self, dt):
+		# the motors integrate the velocity commands of the active drives
+		self.input_position += self.velocity * self.activation * dt
+
+		# ground contact and load: the body rests on the lowest feet,
+		# the weight is shared by the legs on the ground
+		# (state arrays updated in place, they can be shared with stacked plants)
+		height, reach = self.foot_height(self.input_position)
+		lowest = height.min(axis=-1)
+		self.body_height = -lowest
+		self.contact[...] = height <= lowest[..., None] + self.contact_tolerance
+		torque = self.body_weight / numpy.count_nonzero(self.contact, axis=-1)[..., None] * numpy.abs(reach)
+		self.deflection[...] = numpy.where(self.contact, torque/self.spring_constant[..., 1], 0.)
+
+		# the output positions follow through the elastic elements (spring and damper)
+		target = self.input_position.copy()
+		target[..., 1] += self.lift_sign * self.deflection
+		decay = numpy.exp(-self.spring_constant / self.damping_constant * dt)
+		self.output_position[:] = target + (self.output_position - target) * decay
+		self.time += dt
+
+	def _phi_psi_transform(self, phi, psi, chi):
+		phi_trans = numpy.array([	(numpy.cos(phi), 0, numpy.sin(phi), 0),
+									(numpy.sin(phi), 0, -numpy.cos(phi), 0),
+									(0, 1, 0, 0),
+									(0, 0, 0, 1)])
+		psi_trans = numpy.array([	(numpy.cos(psi), 0, -numpy.sin(psi), 0),
+									(numpy.sin(psi), 0, numpy.cos(psi), 0),
+									(0, -1, 0, 0),
+									(0, 0, 0, 1)])
+		chi_trans = numpy.array([	(numpy.cos(chi), -numpy.sin(chi), 0, 0),
+									(numpy.sin(chi), numpy.cos(chi), 0, 0),
+									(0, 0, 1, 0),
+									(0, 0, 0, 1)])
+		return phi_trans.dot(psi_trans).dot(chi_trans)
+
+##
+#	Client without a drive (e.g. the inertial measurement unit): the values
+#	are kept as attributes.
+##
+class BfbClient:
+
+	def __init__(self, bus_id, plant):
+		self._bus_id = bus_id
+		self._plant = plant
+
+	def GetBioFlexBusId(self):
+		return self._bus_id
+
+	def GetValue(self, name):
+		return (getattr(self, name, 0),)
+
+	def SetValue(self, name, value):
+		setattr(self, name, value)
+
+	##	The values of the plant are always up to date.
+	def UpdateValue(self, name):
+		pass
+
+	def UpdateValueIfTooOld(self, name):
+		pass
+
+	def ClearErrorState(self):
+		pass
+
+##
+#	Client of the simulator server: the geometry is read by the plant,
+#	setting relTimerMs advances the plant (in seconds, as set by the SimulatorTimerModule).
+##
+class SimServClient(BfbClient):
+
+	@property
+	def geometryXml(self):
+		return self._geometry_xml
+
+	@geometryXml.setter
+	def geometryXml(self, value):
+		self._geometry_xml = value
+		self._plant.load_geometry(value)
+
+	@property
+	def relTimerMs(self):
+		return self._rel_timer
+
+	@relTimerMs.setter
+	def relTimerMs(self, value):
+		self._rel_timer = value
+		self._plant.step(value)
+
+##
+#	Client of a rotatory drive: the values are read from and written to the plant.
+#	The simulated drives have no errors.
+##
+class RotatoryDriveClient(BfbClient):
+
+	def __init__(self, bus_id, plant, index):
+		BfbClient.__init__(self, bus_id, plant)
+		self._index = index
+		self.errorState = 0
+		self.resetState = 0
+
+	@property
+	def inputPosition(self):
+		return float(self._plant.input_position[self._index])
+
+	@property
+	def outputPosition(self):
+		return float(self._plant.output_position[self._index])
+
+	@property
+	def desiredValue_ISC(self):
+		return float(self._plant.velocity[self._index])
+
+	@desiredValue_ISC.setter
+	def desiredValue_ISC(self, value):
+		self._plant.velocity[self._index] = value
+
+	@property
+	def driveActivation(self):
+		return int(self._plant.activation[self._index])
+
+	@driveActivation.setter
+	def driveActivation(self, value):
+		self._plant.activation[self._index] = value
+
+	@property
+	def springConstant(self):
+		return float(self._plant.spring_constant[self._index])
+
+	@springConstant.setter
+	def springConstant(self, value):
+		self._plant.spring_constant[self._index] = value
+
+	@property
+	def dampingConstant(self):
+		return float(self._plant.damping_constant[self._index])
+
+	@dampingConstant.setter
+	def dampingConstant(self, value):
+		self._plant.damping_constant[self._index] = value
+
+	@property
+	def torsion(self):
+		return self.outputPosition - self.inputPosition
+
+	##	A restart (3) is acknowledged immediately, the error flags are 0.
+	def SetValue(self, name, value):
+		if name == 'resetState' and value == 3:
+			value = 1
+		BfbClient.SetValue(self, name, value)
+
+##
+#	Reader of the positions of many drives at once (see Hector/SensorSnapshot.py).
+##
+class JointPositionReader:
+
+	##	@param bus_ids BioFlexBus ids of the drives (legs x joints)
+	def __init__(self, plant, bus_ids):
+		self._plant = plant
+		indices = numpy.array([[plant.drive_index(bus_id) for bus_id in leg_ids] for leg_ids in bus_ids])
+		self._rows, self._columns = indices[..., 0], indices[..., 1]
+
+	##	Input and output positions of the drives written to positions (legs x joints x 2).
+	def read(self, positions):
+		positions[..., 0] = self._plant.input_position[self._rows, self._columns]
+		positions[..., 1] = self._plant.output_position[self._rows, self._columns]
+
+##
+#	Replacement of comminter.CommunicationInterface running the kinematic plant.
+##
+class CommunicationInterface:
+
+	def __init__(self, plant=None):
+		self.plant = plant if plant is not None else KinematicPlant()
+		self.clients = {}
+
+	##	The protocols are part of the plant.
+	def ParseProtocolXmls(self, protocol_xmls):
+		pass
+
+	##	Clients are created once for each id (as the simulator serves one client per id).
+	def CreateBfbClient(self, bus_id, protocols):
+		if bus_id not in self.clients:
+			index = self.plant.drive_index(bus_id)
+			if bus_id == SIMSERV_ID:
+				self.clients[bus_id] = SimServClient(bus_id, self.plant)
+			elif index is not None:
+				self.clients[bus_id] = RotatoryDriveClient(bus_id, self.plant, index)
+			else:
+				self.clients[bus_id] = BfbClient(bus_id, self.plant)
+		return self.clients[bus_id]
+
+	##	All positions of the given drives are read from the plant in one batch.
+	def CreateJointPositionReader(self, bus_ids):
+		return JointPositionReader(self.plant, bus_ids)
+
+	def NotifyOfNextIteration(self):
+		pass
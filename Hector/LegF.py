@@ -29,6 +29,9 @@ class Leg(Freezable):
 		self.gamma = communication_interface.CreateBfbClient(bfb_client_ids[2], ["BIOFLEX_1_PROT", "BIOFLEX_ROTATORY_1_PROT", "BIOFLEX_ROTATORY_CONTROL_1_PROT", "BIOFLEX_ROTATORY_ERROR_PROT"])
 
 		self.joints=(self.alpha, self.beta, self.gamma)
+		# Input and output positions of the joints (3 x 2) of the current step,
+		# view on the sensor snapshot of the robot (see Hector/SensorSnapshot.py)
+		self.joint_positions = numpy.zeros((3, 2))
 
 			
 
@@ -90,6 +93,11 @@ class Leg(Freezable):
 		for joint in self.joints:
 			joint.UpdateValueIfTooOld('inputPosition')
 			joint.UpdateValueIfTooOld('outputPosition')
+		self.clearSensorDependentValues()
+
+	##	The values computed from the joint positions have to be computed again
+	#	(after the update of the sensors).
+	def clearSensorDependentValues(self):
 		self._input_foot_position = None
 		self._output_foot_position=None
 		self._center_of_mass=None
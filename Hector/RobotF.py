@@ -5,6 +5,7 @@ import numpy
 from ProcessOrganisation.ProcessModule.ProcessingModule import ProcessingModule
 from tools.FreezableF import Freezable as Freezable
 from Hector.DriveSafetyCheck import DriveSafetyCheck
+from Hector.SensorSnapshot import SensorSnapshot
 import time
 ##
 #	Robot object - encapsulating access to variables of robot 
@@ -42,6 +43,10 @@ class Robot(ProcessingModule, Freezable):
 			legs.append(temp_leg)
 			self.relative_leg_onsets.append(geometryData[leg_name]['relative_onset'])
 		self.legs=tuple(legs)
+		# Joint positions of all legs, requested once per control step (legs x joints x 2)
+		self.sensors = SensorSnapshot(self.legs, communication_interface)
+		for leg, joint_positions in zip(self.legs, self.sensors.positions):
+			leg.joint_positions = joint_positions
 		
 		# Body segments
 		self.front_body = Body("front_body")
@@ -73,9 +78,10 @@ class Robot(ProcessingModule, Freezable):
 	# 	the server is asked to provide new sensor data.
 	def pre_processing_step(self, timeStamp):
 		self.driveSafetyCheck.safetyCheck(timeStamp)
+		self.sensors.update([leg.leg_enabled for leg in self.legs])
 		for leg in self.legs:
 			if leg.leg_enabled:
-				leg.updateJointSensorInformation()
+				leg.clearSensorDependentValues()
 				
 	def restartClients(self):
 		clients=[]
@@ -0,0 +1,58 @@
+import numpy
+
+##
+#	Snapshot of the joint sensors of the robot, taken once per control step
+#	(Robot.pre_processing_step).
+#
+#	The input positions (motor) and output positions (after the elastic
+#	element) of all joints are kept in one contiguous array positions
+#	(legs x joints x 2: [..., 0] input, [..., 1] output position); the legs
+#	hold views on their rows (Leg.joint_positions), so the controllers read
+#	the positions of a step from the snapshot instead of asking the drives
+#	again.
+#
+#	If the communication interface provides a reader for the positions of
+#	many drives (CreateJointPositionReader, e.g. the kinematic plant), all
+#	positions are requested in one batch. Otherwise each drive is updated
+#	(UpdateValueIfTooOld) and read once, as before by the legs.
+#
+#	Freshness: updated holds for each leg the number of the update in which
+#	its positions were requested last (-1: never), fresh(leg_nr) tells if
+#	they were requested in the current step. The drives of legs that are
+#	switched off are not updated (their positions are the values the drives
+#	had last, as read by the legs before).
+##
+class SensorSnapshot:
+
+	##	Initialisation
+	#	@param legs legs of the robot (in the order of the rows)
+	#	@param communication_interface reference to the active communication
+	def __init__(self, legs, communication_interface):
+		self.legs = legs
+		self.positions = numpy.zeros((len(legs), 3, 2))
+		self.updated = numpy.full(len(legs), -1, dtype=int)
+		self.step = 0
+		self.reader = None
+		if hasattr(communication_interface, 'CreateJointPositionReader'):
+			bus_ids = [[joint.GetBioFlexBusId() for joint in leg.joints] for leg in legs]
+			self.reader = communication_interface.CreateJointPositionReader(bus_ids)
+
+	##	Request the positions of the legs for the current step.
+	#	@param requested for each leg if its positions are requested (e.g. if it is switched on)
+	def update(self, requested):
+		self.step += 1
+		if self.reader is not None:
+			self.reader.read(self.positions)
+		else:
+			for leg, positions, request in zip(self.legs, self.positions, requested):
+				for joint, joint_positions in zip(leg.joints, positions):
+					if request:
+						joint.UpdateValueIfTooOld('inputPosition')
+						joint.UpdateValueIfTooOld('outputPosition')
+					joint_positions[0] = joint.inputPosition
+					joint_positions[1] = joint.outputPosition
+		self.updated[numpy.asarray(requested, dtype=bool)] = self.step
+
+	##	Whether the positions of the leg have been requested in the current step.
+	def fresh(self, leg_nr):
+		return self.updated[leg_nr] == self.step
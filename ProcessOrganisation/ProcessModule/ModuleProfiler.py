@@ -0,0 +1,109 @@
+'''
+Timing profiler of the modules of the process execution.
+'''
+import json
+import math
+import time
+from array import array
+
+##	Percentile (nearest rank) of sorted values, 0 for no values.
+def percentile(values, percent):
+	if not values:
+		return 0
+	rank = max(int(math.ceil(percent / 100. * len(values))), 1)
+	return values[rank - 1]
+
+##
+#	Times of one phase (pre, processing or post) of one module.
+#
+#	Kept are the count, sum and maximum of all calls, a histogram with
+#	power of two buckets (bucket k: durations of k bits, i.e. below 2^k ns)
+#	and the durations of the last calls in a ring buffer of fixed size
+#	(for the percentiles of the recent calls). Adding a duration does not
+#	allocate.
+##
+class PhaseTimes:
+
+	__slots__ = ('ring', 'capacity', 'index', 'total', 'max', 'histogram')
+
+	def __init__(self, capacity):
+		self.ring = array('q', [0]) * capacity
+		self.capacity = capacity
+		self.index = 0
+		self.total = 0
+		self.max = 0
+		self.histogram = array('q', [0]) * 64
+
+	##	Add the duration (in nanoseconds) of a call.
+	def add(self, duration):
+		index = self.index
+		self.ring[index] = duration
+		index += 1
+		self.index = index if index < self.capacity else 0
+		self.total += duration
+		if duration > self.max:
+			self.max = duration
+		self.histogram[duration.bit_length()] += 1
+
+	##	Number of calls.
+	@property
+	def count(self):
+		return sum(self.histogram)
+
+	##	Statistics as a dict (times in microseconds).
+	def summary(self):
+		count = self.count
+		recent = sorted(self.ring[:min(count, self.capacity)])
+		return {"count": count,
+				"mean_us": self.total / max(count, 1) * 1e-3,
+				"max_us": self.max * 1e-3,
+				"recent": len(recent),
+				"recent_p50_us": percentile(recent, 50) * 1e-3,
+				"recent_p95_us": percentile(recent, 95) * 1e-3,
+				"recent_p99_us": percentile(recent, 99) * 1e-3,
+				# calls per bucket, keyed by the upper bound of the bucket in microseconds
+				"histogram_us": {"%g" % ((1 << bucket) * 1e-3): count
+								 for bucket, count in enumerate(self.histogram) if count}}
+
+##
+#	The ModuleProfiler collects the time of each phase of each module in the
+#	complete steps of a ProcessModuleExecution (measured with perf_counter_ns)
+#	and of the complete steps themselves (processing phase of the module STEP).
+#
+#	The statistics are kept per module name in PhaseTimes of fixed size, so
+#	the profiler can stay on in long runs. The summary can be taken at any
+#	time (summary, dump) and is written as JSON, e.g. at the end of a run.
+##
+class ModuleProfiler:
+
+	PHASES = ("pre", "processing", "post")
+	STEP = "complete_step"
+
+	##	Initialisation
+	#	@param capacity number of recent calls kept per module and phase
+	def __init__(self, capacity=1024):
+		self.capacity = capacity
+		self.modules = {}
+		self.clock = time.perf_counter_ns
+
+	##	Times of the phases of a module (list in the order of PHASES).
+	#	@param name name of the module
+	def phases(self, name):
+		times = self.modules.get(name)
+		if times is None:
+			times = self.modules[name] = [PhaseTimes(self.capacity) for _ in self.PHASES]
+		return times
+
+	##	Statistics of all modules as a dict: module: phase: statistics.
+	def summary(self):
+		return {name: {phase: times.summary() for phase, times in zip(self.PHASES, phases) if times.count}
+				for name, phases in self.modules.items()}
+
+	##	Statistics of all modules as JSON.
+	#	@param path file for the JSON output (not written if None)
+	def dump(self, path=None):
+		output = json.dumps(self.summary(), indent=2)
+		if path is not None:
+			with open(path, "w") as output_file:
+				output_file.write(output)
+		return output
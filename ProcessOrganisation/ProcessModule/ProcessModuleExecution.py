@@ -3,7 +3,7 @@ Created on 14.11.2012
 
 @author: mschilling
 '''
-import time
+from .ModuleProfiler import ModuleProfiler
 
 ##
 #	A ProcessModuleExecution 
@@ -14,10 +14,14 @@ class ProcessModuleExecution:
 	
 	##	Initialisation
 	# 	@param debug_time Providing information on the timing of the individual modules.
-	def __init__(self, debug_time = False):
+	#	@param profiler ModuleProfiler collecting the timing of the modules (debug_time: a new one)
+	def __init__(self, debug_time = False, profiler = None):
 		self.registered_module_names = []
 		self.registered_modules = []
-		self.time_debug_output = debug_time
+		if profiler is None and debug_time:
+			profiler = ModuleProfiler()
+		self.profiler = profiler
+		self.profiled_phases = None
 
 
 	##	Inits all registered modules before the execution is started.
@@ -32,6 +36,7 @@ class ProcessModuleExecution:
 	def add_module(self, newMod):
 		self.registered_module_names.append(newMod.name)
 		self.registered_modules.append(newMod)
+		self.profiled_phases = None
 
 	##	Remove a module from the main execution.
 	#	@param name of the module which shall be removed
@@ -39,36 +44,20 @@ class ProcessModuleExecution:
 		index=self.registered_module_names.index(name)
 		del self.registered_modules[index]
 		del self.registered_module_names[index]
+		self.profiled_phases = None
 		
 	##	Execute a complete time step.
 	#	Iterate over all modules, first over all for the pre-processing step;
 	#	followed by calls to all modules for the processing step and
 	#	finally the post-processing step for all modules is called.
 	#
-	#	If timing should be output each module is timed during the execution.
+	#	If a profiler is given each module is timed during the execution
+	#	(see ModuleProfiler).
 	#
 	#	@param timeStamp current simulation time
 	def execute_complete_step(self, timeStamp):
-		if __debug__ and self.time_debug_output:
-			time_pre_step = [0.] * len(self.registered_modules)
-			time_processing_step = [0.] * len(self.registered_modules)
-			time_post_step = [0.] * len(self.registered_modules)
-			for mod_nr, mod in enumerate(self.registered_modules):
-				time_pre_step[mod_nr] = time.time()
-				mod.pre_processing_step(timeStamp)
-				time_pre_step[mod_nr] = time.time() - time_pre_step[mod_nr]
-			for mod_nr, mod in enumerate(self.registered_modules):
-				time_processing_step[mod_nr] = time.time()
-				mod.processing_step(timeStamp)
-				time_processing_step[mod_nr] = time.time() - time_processing_step[mod_nr]
-			for mod_nr, mod in enumerate(self.registered_modules):
-				time_post_step[mod_nr] = time.time()
-				mod.post_processing_step(timeStamp)
-				time_post_step[mod_nr] = time.time() - time_post_step[mod_nr]
-			# Print out times of the individual modules
-			for mod_nr, mod_name in enumerate(self.registered_module_names):
-				print('t=%(t)4.2f - %(name)20s pre=%(pre)4.3f   process=%(process)4.3f   post=%(post)4.3f' %\
-					{'t': timeStamp,'name': mod_name[:20], 'pre': time_pre_step[mod_nr], 'process': time_processing_step[mod_nr], 'post': time_post_step[mod_nr]})
+		if self.profiler is not None:
+			self.execute_profiled_step(timeStamp)
 		else:
 			for mod in self.registered_modules:
 				mod.pre_processing_step(timeStamp)
@@ -76,3 +65,27 @@ class ProcessModuleExecution:
 				mod.processing_step(timeStamp)
 			for mod in self.registered_modules:
 				mod.post_processing_step(timeStamp)
+
+	##	Execute a complete time step and record the time of each phase of each
+	#	module and of the complete step in the profiler.
+	#	@param timeStamp current simulation time
+	def execute_profiled_step(self, timeStamp):
+		profiler = self.profiler
+		clock = profiler.clock
+		if self.profiled_phases is None:
+			# (module, its phase times), rebuilt when the registered modules change
+			self.profiled_phases = [(mod, profiler.phases(mod.name)) for mod in self.registered_modules]
+		step_start = clock()
+		for mod, phases in self.profiled_phases:
+			start = clock()
+			mod.pre_processing_step(timeStamp)
+			phases[0].add(clock() - start)
+		for mod, phases in self.profiled_phases:
+			start = clock()
+			mod.processing_step(timeStamp)
+			phases[1].add(clock() - start)
+		for mod, phases in self.profiled_phases:
+			start = clock()
+			mod.post_processing_step(timeStamp)
+			phases[2].add(clock() - start)
+		profiler.phases(profiler.STEP)[1].add(clock() - step_start)
@@ -5,8 +5,7 @@ Created on 10.3.2014
 '''
 from .ProcessModuleExecution import ProcessModuleExecution
 from .ControllerModule import ControllerModule as ControllerModule
-from decimal import Decimal as Decimal
-from ..SimulatorModule.SimulatorTimerModule import SimulatorTimerModule
+from ..SimulatorModule.TickClock import TickClock
 
 ##
 #	The execution program for the Process Module execution.
@@ -19,38 +18,41 @@ from ..SimulatorModule.SimulatorTimerModule import SimulatorTimerModule
 #	The main process is calling all modules - first the pre, then the main processing and
 #	at last the post processing step. The order of the calls in these steps is not 
 #	defined in the ProcessingModuleExecution.
+#
+#	The time is counted by a TickClock (one tick per complete step), the
+#	end times of the queued control modules are computed in ticks when they
+#	are switched to. The clock can be shared with the other modules (e.g.
+#	SimulatorTimerModule, RealtimeScheduler) that read it; it is advanced
+#	only here, after each complete step.
 ##
 class ProcessModuleQueuedExecution(ProcessModuleExecution):
 	
 	##	Initialisation
 	# 	@param debug_time Providing information on the timing of the individual modules.
-	def __init__(self, debug_time = False):
-		ProcessModuleExecution.__init__(self, debug_time)
+	#	@param clock TickClock of the control loop (default: a clock at 100 Hz)
+	#	@param profiler ModuleProfiler collecting the timing of the modules
+	def __init__(self, debug_time = False, clock = None, profiler = None):
+		ProcessModuleExecution.__init__(self, debug_time, profiler)
 		self.control_module_queue = []
-		self.current_control_module_end_time = Decimal('0')
+		self.current_control_module_end_tick = 0
 		self.current_control_module = None
-		self.time_precision=SimulatorTimerModule.time_precision
+		self.clock = clock if clock is not None else TickClock()
 
 	##	Inits all registered modules before the execution is started.
 	def init_all_modules(self):
 		ProcessModuleExecution.init_all_modules(self)
 		if len(self.control_module_queue) > 0:
-			self.__switch_to_next_queued_control_module(Decimal('0'))
+			self.__switch_to_next_queued_control_module()
 		
 
 	##	Add a module to the Execution - the different time
 	#	steps of this module will be called alongside the other modules.
 	#	@param newMod the module which shall be added
+	#	@param duration duration in seconds (inf: until it has completed)
 	def add_control_module_to_queue(self, newMod, duration):
-		duration_decimal=Decimal('0')
-		if duration==float('inf'):
-			duration_decimal=Decimal('Inf')
-		else:
-			duration_decimal=Decimal(duration).quantize(self.time_precision)
-			
-		self.control_module_queue.append( (newMod, duration_decimal) )
+		self.control_module_queue.append( (newMod, self.clock.ticks(duration)) )
 
-	def __switch_to_next_queued_control_module(self, timestamp_decimal):
+	def __switch_to_next_queued_control_module(self):
 		if len(self.control_module_queue) > 0:
 			if self.current_control_module != None:
 				self.remove_module(self.current_control_module.name)
@@ -60,18 +62,22 @@ class ProcessModuleQueuedExecution(ProcessModuleExecution):
 			print("Switched to next control module: ", self.current_control_module.name)
 			self.current_control_module.init_module()
 			
-			self.current_control_module_end_time = timestamp_decimal + duration
+			self.current_control_module_end_tick = self.clock.tick + duration
 			
 	def forwardMessageToCurrentController(self, message):
 		self.current_control_module.handleMessage(message)
 			
-	def execute_complete_step(self, timestamp):
-		timestamp_decimal=Decimal(timestamp).quantize(self.time_precision)
+	##	Execute a complete time step and advance the clock.
+	#	@param timestamp current simulation time (default: time of the clock)
+	def execute_complete_step(self, timestamp = None):
+		if timestamp is None:
+			timestamp = self.clock.time()
 		
 		controller_has_completed=False
 		if isinstance(self.current_control_module, ControllerModule):
 			controller_has_completed=self.current_control_module.hasCompleted()
 			
-		if (timestamp_decimal > self.current_control_module_end_time or controller_has_completed):
-			self.__switch_to_next_queued_control_module(timestamp_decimal)
+		if (self.clock.tick > self.current_control_module_end_tick or controller_has_completed):
+			self.__switch_to_next_queued_control_module()
 		ProcessModuleExecution.execute_complete_step(self, timestamp)
+		self.clock.advance()
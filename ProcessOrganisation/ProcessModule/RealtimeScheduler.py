@@ -0,0 +1,117 @@
+'''
+Pacing of the main loop in real time.
+'''
+import time
+from ..SimulatorModule.TickClock import TickClock
+from .ModuleProfiler import PhaseTimes, percentile
+
+##
+#	The RealtimeScheduler owns the main loop: it calls the control step
+#	every period (in seconds) at absolute deadlines on a monotonic clock
+#	(start + k * period), so that the time of the steps does not drift.
+#	A step is late (an overrun) when it finishes after its deadline, i.e.
+#	after the start of the next period. The policy decides what follows:
+#
+#	catch-up	the following steps are started immediately, until the loop
+#				is back on schedule (simulation time stays in step with the
+#				real time, the steps come in bursts)
+#	drop		the periods that have passed are dropped and the next step
+#				waits for the next deadline in the future (regular cadence,
+#				the simulation time falls behind the real time)
+#	none		no pacing, the steps run as fast as possible (only measured)
+#
+#	The duration of each step and the lateness of the overruns are recorded
+#	for the summary at the end of the run in PhaseTimes of fixed size (count,
+#	mean and maximum of the whole run, percentiles of the recent steps), so
+#	the scheduler can run for hours without growing.
+##
+class RealtimeScheduler:
+
+	POLICIES = ("catch-up", "drop", "none")
+
+	##	Initialisation
+	#	@param period time between two control steps in seconds (1/controllerFrequency)
+	#	@param policy handling of the overruns (see POLICIES)
+	#	@param clock monotonic clock in nanoseconds
+	#	@param sleep sleep function in seconds
+	#	@param capacity number of recent steps kept for the percentiles
+	def __init__(self, period, policy="catch-up", clock=time.monotonic_ns, sleep=time.sleep, capacity=10000):
+		if policy not in self.POLICIES:
+			raise Exception("Unknown policy of the realtime scheduler '" + str(policy) + "' (" + ", ".join(self.POLICIES) + ")")
+		self.period = period
+		self.period_ns = int(round(period * 1e9))
+		self.policy = policy
+		self.clock = clock
+		self.sleep = sleep
+		# Statistics (nanoseconds)
+		self.durations = PhaseTimes(capacity)
+		self.lateness = PhaseTimes(capacity)
+		self.dropped = 0
+		self.wall_time = 0
+
+	##	Run the control steps until the simulation time exceeds the duration.
+	#	@param step function called with the simulation time of the step
+	#	@param duration duration of the simulation in seconds (simulation time)
+	#	@param simulationClock TickClock of the simulation time, advanced by the step
+	#		(e.g. by ProcessModuleQueuedExecution.execute_complete_step); without
+	#		a clock the scheduler counts the steps with its own clock
+	def run(self, step, duration=float('inf'), simulationClock=None):
+		owns_clock = simulationClock is None
+		if owns_clock:
+			simulationClock = TickClock(1. / self.period)
+		end_tick = simulationClock.ticks(duration)
+		start = self.clock()
+		tick = 0
+		try:
+			while simulationClock.tick <= end_tick:
+				release = start + tick * self.period_ns
+				now = self.clock()
+				if self.policy != "none" and now < release:
+					self.sleep((release - now) * 1e-9)
+					now = self.clock()
+				step(simulationClock.time())
+				end = self.clock()
+				self.durations.add(end - now)
+				deadline = release + self.period_ns
+				if self.policy != "none" and end > deadline:
+					self.lateness.add(end - deadline)
+				if owns_clock:
+					simulationClock.advance()
+				tick += 1
+				if self.policy == "drop" and end > start + tick * self.period_ns:
+					# next deadline in the future
+					missed = (end - start) // self.period_ns + 1 - tick
+					self.dropped += missed
+					tick += missed
+		finally:
+			self.wall_time += self.clock() - start
+
+	##	Summary of the run as a dict (times in milliseconds; the percentiles
+	#	of the step duration are those of the recent steps).
+	def summary(self):
+		steps = self.durations.count
+		overruns = self.lateness.count
+		recent = sorted(self.durations.ring[:min(steps, self.durations.capacity)])
+		return {"policy": self.policy,
+				"period_ms": self.period * 1e3,
+				"steps": steps,
+				"wall_time_s": self.wall_time * 1e-9,
+				"overruns": overruns,
+				"dropped_periods": self.dropped,
+				"max_lateness_ms": self.lateness.max * 1e-6,
+				"mean_lateness_ms": self.lateness.total / max(overruns, 1) * 1e-6,
+				"mean_ms": self.durations.total / max(steps, 1) * 1e-6,
+				"max_ms": self.durations.max * 1e-6,
+				"recent": len(recent),
+				"p50_ms": percentile(recent, 50) * 1e-6,
+				"p95_ms": percentile(recent, 95) * 1e-6,
+				"p99_ms": percentile(recent, 99) * 1e-6}
+
+	##	Summary of the run as text (for the end of the main loop).
+	def report(self):
+		summary = self.summary()
+		return ("%(steps)d control steps in %(wall_time_s).2f s (period %(period_ms).1f ms, policy %(policy)s)\n"
+				"step duration: mean %(mean_ms).2f ms, max %(max_ms).2f ms; last %(recent)d steps: "
+				"p50 %(p50_ms).2f ms, p95 %(p95_ms).2f ms, p99 %(p99_ms).2f ms\n"
+				"overruns: %(overruns)d (lateness mean %(mean_lateness_ms).2f ms, max %(max_lateness_ms).2f ms), "
+				"dropped periods: %(dropped_periods)d" % summary)
@@ -2,7 +2,7 @@
 #Tools
 from ..ProcessModule.ProcessingModule import ProcessingModule
 from tools.FreezableF import Freezable as Freezable
-from decimal import Decimal
+from .TickClock import TickClock
 
 import time
 
@@ -14,21 +14,26 @@ def getCurrentTime():
 #    i.e. the difference to a real environment.
 #    In the simulator case the simulation has to be advanced after each control
 #    step (meaning in the post control step).
+#    The time is read from the TickClock of the control loop.
 ##
 class SimulatorTimerModule (ProcessingModule, Freezable):
-    __current_time=Decimal('0')
-    time_precision=Decimal('0.0001')
+    __clock=TickClock()
     
     ##
     #    Init
     #    @param name for the module
     #    @param    the Hector robot structure (to access data and communication protocol)
     #     @controllerFrequency frequency of the controller
-    def __init__(self, name, robot, controllerFrequency):
+    #    @param clock TickClock of the control loop, advanced by the process execution
+    #        (without a clock the module counts the control steps with its own clock)
+    def __init__(self, name, robot, controllerFrequency, clock=None):
         self.name = name
         self.robot = robot
         self.communication_interface = robot.communication_interface
         self.controllerFrequency = controllerFrequency
+        self.owns_clock = clock is None
+        self.clock = TickClock(controllerFrequency) if clock is None else clock
+        SimulatorTimerModule.__clock = self.clock
         ProcessingModule.__init__(self, name)
 
         #import os
@@ -53,7 +58,7 @@ class SimulatorTimerModule (ProcessingModule, Freezable):
       
     @classmethod
     def getCurrentTime(cls):
-        return cls.__current_time
+        return cls.__clock.time()
       
     ## 
     #   Post processing: Sending data to the Simulator after the control values
@@ -67,7 +72,8 @@ class SimulatorTimerModule (ProcessingModule, Freezable):
         self.it += 1
         # Let the simulation run for a given time.
         self.timer.relTimerMs=1/self.controllerFrequency
-        SimulatorTimerModule.__current_time+=Decimal(1/self.controllerFrequency ).quantize(self.time_precision)
+        if self.owns_clock:
+            self.clock.advance()
 #      self.timer.robotTransparency = 0.59181716
 #      self.timer.internalModelGlobalPosition = str([[2., 1.],\
 #            [2., 1.],\
@@ -0,0 +1,42 @@
+## -*- coding: utf-8 -*-
+'''
+Integer clock of the control loop.
+
+The time of the control loop is counted in ticks (e.g. control steps at the
+controller frequency, or network iterations at the neuron rate). The tick
+counter is the only state: times in seconds are computed from it when they
+are read (tick / frequency), durations are converted once into ticks. The
+bookkeeping of each step is an integer increment and integer compares, and
+the time does not drift as a sum of float or quantized increments would
+over long runs.
+'''
+
+##
+#    Tick counter with a fixed frequency (ticks per second).
+##
+class TickClock:
+
+    ##
+    #    Init
+    #    @param frequency ticks per second (e.g. the controller frequency)
+    def __init__(self, frequency=100):
+        self.frequency = frequency
+        self.tick = 0
+
+    ##
+    #    Advance the clock by a number of ticks (one step by default).
+    def advance(self, ticks=1):
+        self.tick += ticks
+
+    ##
+    #    Current time in seconds.
+    def time(self):
+        return self.tick / self.frequency
+
+    ##
+    #    Duration in seconds as number of ticks (rounded to the nearest tick);
+    #    an infinite duration stays infinite (larger than any tick).
+    def ticks(self, duration):
+        if duration == float('inf'):
+            return float('inf')
+        return int(round(duration * self.frequency))
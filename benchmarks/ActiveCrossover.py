@@ -0,0 +1,97 @@
+'''
+Activity of the leg networks and crossover of the active set propagation
+(controller/neuro_common/ActiveSynapses.py).
+
+First the controller walks on the kinematic plant with the active store and
+the average fraction of active neurons (g > 0) is reported per leg, together
+with the fraction of the steps that used the active set for WE and WI.
+Then the propagation of the leg network weights is timed for an increasing
+fraction of active neurons (random sparse activity, the sparse-activity
+configuration the active set is meant for), with the active set and with the
+product over all neurons: the crossover is the fraction up to which the active
+set is faster (ActiveSynapses.CROSSOVER). The two are timed alternately and the
+median of the ratios is reported, so that changes of the clock frequency during
+the measurement affect both alike.
+
+Run: python3 -m benchmarks.ActiveCrossover [--variant neuro_walknet_2022] [--steps 200] [--velocity 0]
+'''
+import io, sys, timeit, random, contextlib, importlib
+import numpy
+
+from controller.neuro_common import ActiveSynapses
+from tools.HeadlessControlLoop import ControlLoop
+
+##  Getting the command line arguments.
+def _args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Activity of the leg networks and crossover of the active set propagation")
+    parser.add_argument("-v", "--variant", action="store", default="neuro_walknet_2022",
+        choices=["neuro_walknet", "neuro_walknet_2022"], dest="variant", help="Controller.")
+    parser.add_argument("-e", "--engine", action="store", default="vectorized", choices=["vectorized", "batched"],
+        dest="engine", help="Implementation of the neuron update.")
+    parser.add_argument("-n", "--steps", action="store", default=200, type=int,
+        dest="steps", help="Number of control steps for the activity statistics.")
+    parser.add_argument("-r", "--repeat", action="store", default=200, type=int,
+        dest="repeat", help="Number of propagations per measurement.")
+    parser.add_argument("-m", "--measurements", action="store", default=30, type=int,
+        dest="measurements", help="Number of alternating measurements per fraction of active neurons.")
+    parser.add_argument("--velocity", action="store", default=None, type=float,
+        dest="velocity", help="Walking velocity (default: velocity in NeuroWNSettings, 0 to stand).")
+    return parser.parse_args()
+
+def walking_activity(args):
+    WNParams = importlib.import_module("controller." + args.variant + ".NeuroWNSettings")
+    WNParams.engine, WNParams.synapses = args.engine, "active"
+    if args.velocity is not None:
+        WNParams.velocity = args.velocity
+    random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):   # status output of the controller
+        loop = ControlLoop(args.variant)
+        for _ in range(args.steps):
+            loop.step()
+    legs = [leg for leg in loop.controller.controller_objs if leg]
+    activity = []
+    print("%-18s %10s %14s %14s" % ("leg", "active", "active set WE", "active set WI"))
+    for row, leg in enumerate(legs):
+        stores = (loop.controller.network_batch.WE_store, loop.controller.network_batch.WI_store) \
+            if loop.controller.network_batch else (leg.WE_store, leg.WI_store)
+        (fraction, used_WE), (_, used_WI) = [store.statistics() for store in stores]
+        if loop.controller.network_batch:
+            fraction = fraction[row]
+        print("%-18s %10.3f %14.3f %14.3f" % (leg.leg.name, fraction, used_WE, used_WI))
+        activity.append(fraction)
+    return legs[0], min(activity)
+
+##  Time per propagation (in microseconds) with the given crossover (0: all neurons, 1: active set).
+def time_propagation(store, g, crossover, repeat):
+    out = numpy.zeros(g.shape)
+    store.crossover = crossover
+    return timeit.timeit(lambda: store.dot(g, out), number=repeat) / repeat * 1e6
+
+def main(args):
+    leg, activity = walking_activity(args)
+    store = ActiveSynapses.ActiveSynapses(leg.WE, leg.dynamic_weights_WE)
+    rng = numpy.random.default_rng(0)
+    print("\n%10s %14s %14s %8s" % ("active", "all [us]", "active [us]", "ratio"))
+    crossover, faster = 0., True
+    for fraction in (0.01, 0.02, 0.03, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5):
+        g = numpy.zeros(leg.n)
+        active = rng.choice(leg.n, int(round(fraction*leg.n)), replace=False)
+        g[active] = rng.uniform(0.1, 50., len(active))
+        times = numpy.array([(time_propagation(store, g, 0., args.repeat), time_propagation(store, g, 1., args.repeat))
+                             for _ in range(args.measurements)])
+        all_time, active_time = numpy.median(times, axis=0)
+        ratio = numpy.median(times[:, 1] / times[:, 0])
+        # the crossover ends at the first fraction for which the product over all neurons is faster
+        faster = faster and ratio < 1.
+        if faster:
+            crossover = fraction
+        print("%10.2f %14.2f %14.2f %8.3f" % (fraction, all_time, active_time, ratio))
+    print("Crossover: active set faster up to about %.2f active neurons (ActiveSynapses.CROSSOVER = %.2f)."
+          % (crossover, ActiveSynapses.CROSSOVER))
+    if activity > crossover:
+        print("The least active leg has %.3f active neurons: the active set does not pay off in this "
+              "configuration, the store computes the product over all neurons." % activity)
+
+if __name__ == "__main__":
+    sys.exit(main(_args()))
@@ -0,0 +1,125 @@
+'''
+Micro- and macro-benchmarks of the hot paths of the neuroWalknet controller.
+
+The controller runs on the kinematic plant (Hector/KinematicPlantF.py) instead
+of the simulator, all random inputs are seeded, and the controller walks for a
+number of warm up steps before the measurements start, so the measured
+states are reproducible from run to run.
+Micro-benchmarks: single leg network update, band pass filter, coordination
+rules, kinematics of a leg and center of mass of the robot.
+Macro-benchmarks: NeuroWalknet.processing_step (10 network iterations of all
+legs) and the complete control loop step (robot, controller and plant).
+Start up: construction of the controller and of the complete control loop
+(e.g. for each worker of a parameter study, without the imports).
+
+The results are printed as JSON (time per call in microseconds) together
+with the git revision, so that the throughput can be compared across commits.
+
+Run: python3 -m benchmarks.ControllerBenchmarks [--variant neuro_walknet_2022] [--engine batched] [--dtype float32] [--compact-state] [-o results.json]
+'''
+import io, json, time, timeit, random, platform, contextlib, importlib
+import numpy
+
+from tools.HeadlessControlLoop import ControlLoop
+from tools.GitRevision import git_revision
+
+##  Getting the command line arguments.
+def _args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmarks of the neuroWalknet controller")
+    parser.add_argument("-v", "--variant", action="store", default="neuro_walknet_2022",
+        choices=["neuro_walknet", "neuro_walknet_2022"], dest="variant", help="Controller to benchmark.")
+    parser.add_argument("-e", "--engine", action="store", default=None, choices=["scalar", "vectorized", "batched"],
+        dest="engine", help="Implementation of the neuron update (default: engine in NeuroWNSettings).")
+    parser.add_argument("-s", "--synapses", action="store", default=None, choices=["dense", "sparse", "compact", "active"],
+        dest="synapses", help="Store of the synaptic weights (default: synapses in NeuroWNSettings).")
+    parser.add_argument("-d", "--dtype", action="store", default=None, choices=["float64", "float32"],
+        dest="dtype", help="Numeric type of the network state and weights (default: dtype in NeuroWNSettings).")
+    parser.add_argument("--compact-state", action="store_true", default=None,
+        dest="compact_state", help="Compute the network phase on the live neurons only (default: compact_state in NeuroWNSettings).")
+    parser.add_argument("-w", "--warmup", action="store", default=100, type=int,
+        dest="warmup", help="Number of control steps before the measurements.")
+    parser.add_argument("-r", "--repeat", action="store", default=5, type=int,
+        dest="repeat", help="Number of measurements per benchmark (the fastest one is reported).")
+    parser.add_argument("-o", "--output", action="store", default=None,
+        dest="output", help="File for the JSON results (default: standard output).")
+    return parser.parse_args()
+
+##  Time per call (in microseconds), fastest of the measurements.
+def measure(function, repeat):
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return {"us_per_call": min(timer.repeat(repeat=repeat, number=number)) / number * 1e6, "number": number}
+
+def benchmarks(loop, variant):
+    leg_controller = loop.controller.controller_objs[0]
+    leg = loop.robot.legs[0]
+    angles = numpy.array(leg.getInputAngles())
+
+    def center_of_mass():
+        for robot_leg in loop.robot.legs:
+            robot_leg._center_of_mass = None    # computed once per control step (as after a sensor update)
+        return loop.robot.getCenterOfMass()
+
+    return [
+        ("NeuroLegMovement.update_leg_controller", lambda: leg_controller.update_leg_controller(loop.simulationTime)),
+        ("NeuroLegMovement.applyBandPassFilter", lambda: leg_controller.applyBandPassFilter(3, 0.05, 0.1)),
+        ("NeuroCoordinationRules.update_coordination_rules", lambda: loop.controller.coordination_rules.update_coordination_rules(loop.simulationTime)),
+        ("Leg.computeForwardKinematics", lambda: leg.computeForwardKinematics(angles)),
+        ("Leg.computeJacobian", lambda: leg.computeJacobian(angles)),
+        ("Robot.getCenterOfMass", center_of_mass),
+        ("NeuroWalknet.processing_step", lambda: loop.controller.processing_step(loop.simulationTime)),
+        ("control_loop_step", loop.step),
+        # start up (new objects, the measured loop is not changed)
+        ("NeuroWalknet.__init__", lambda: type(loop.controller)("neuro_walknet", loop.robot)),
+        ("ControlLoop.__init__", lambda: ControlLoop(variant)),
+    ]
+
+def main(args):
+    settings = importlib.import_module("controller." + args.variant + ".NeuroWNSettings")
+    if args.engine is not None:
+        settings.engine = args.engine
+    if args.synapses is not None:
+        settings.synapses = args.synapses
+    if args.dtype is not None:
+        settings.dtype = args.dtype
+    if args.compact_state is not None:
+        settings.compact_state = args.compact_state
+    random.seed(0)
+    numpy.random.seed(0)
+
+    with contextlib.redirect_stdout(io.StringIO()):   # status output of the controller
+        loop = ControlLoop(args.variant)
+        for _ in range(args.warmup):
+            loop.step()
+        results = {}
+        for name, function in benchmarks(loop, args.variant):
+            results[name] = measure(function, args.repeat)
+            results[name]["calls_per_s"] = 1e6 / results[name]["us_per_call"]
+
+    neurons = sum(leg_controller.n for leg_controller in loop.controller.controller_objs if leg_controller)
+    report = {
+        "revision": git_revision(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "machine": platform.machine(),
+        "variant": args.variant,
+        "engine": settings.engine,
+        "synapses": settings.synapses,
+        "dtype": settings.dtype,
+        "compact_state": settings.compact_state,
+        "neurons": neurons,
+        # neuron updates per second of the complete controller (10 network iterations per control step)
+        "neuron_updates_per_s": results["NeuroWalknet.processing_step"]["calls_per_s"] * 10 * neurons,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+
+if __name__ == "__main__":
+    main(_args())
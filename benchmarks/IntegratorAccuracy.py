@@ -0,0 +1,83 @@
+'''
+Accuracy and throughput of the integrators of the membrane equation with
+longer time steps (integrator and substeps in NeuroWNSettings).
+
+The controller walks on the kinematic plant with the reference (forward
+Euler, 10 iterations of 1 ms per control step) and with each configuration
+(integrator, network iterations per control step). After each control step
+the joint angles and the swing/stance state (v[122] > v[123]) of all legs are
+recorded. Reported are the control steps per second, the deviation of the
+joint angles from the reference (RMS and maximum, in degrees), the fraction of
+the control steps with the same swing/stance state as the reference and the
+number of swing phases (steps) per leg.
+
+Run: python3 -m benchmarks.IntegratorAccuracy [--variant neuro_walknet_2022] [--steps 1000]
+'''
+import io, sys, time, random, contextlib, importlib
+import numpy
+
+from tools.HeadlessControlLoop import ControlLoop
+
+REFERENCE = ("euler", 10)
+CONFIGURATIONS = [("exponential", 10), ("euler", 5), ("exponential", 5), ("exponential", 2)]
+
+##  Getting the command line arguments.
+def _args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Accuracy of the integrators of the membrane equation")
+    parser.add_argument("-v", "--variant", action="store", default="neuro_walknet_2022",
+        choices=["neuro_walknet", "neuro_walknet_2022"], dest="variant", help="Controller.")
+    parser.add_argument("-e", "--engine", action="store", default="vectorized", choices=["scalar", "vectorized", "batched"],
+        dest="engine", help="Implementation of the neuron update.")
+    parser.add_argument("-n", "--steps", action="store", default=1000, type=int,
+        dest="steps", help="Number of control steps (10 ms each).")
+    parser.add_argument("-c", "--configuration", action="append", default=None, metavar="INTEGRATOR:SUBSTEPS",
+        dest="configurations", help="Configuration to compare with the reference, e.g. exponential:5 (can be given several times).")
+    return parser.parse_args()
+
+##  Joint angles (legs x steps x 3, degrees), swing states (legs x steps) and run time of a configuration.
+def walk(variant, engine, integrator, substeps, steps):
+    WNParams = importlib.import_module("controller." + variant + ".NeuroWNSettings")
+    WNParams.engine, WNParams.integrator, WNParams.substeps = engine, integrator, substeps
+    random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):   # status output of the controller
+        loop = ControlLoop(variant)
+        legs = [leg for leg in loop.controller.controller_objs if leg]
+        angles = numpy.zeros((len(legs), steps, 3))
+        swing = numpy.zeros((len(legs), steps), dtype=bool)
+        duration = 0.
+        for step in range(steps):
+            start = time.perf_counter()
+            loop.step()
+            duration += time.perf_counter() - start
+            for row, leg in enumerate(legs):
+                angles[row, step] = leg.alpha, leg.beta, leg.gamma
+                swing[row, step] = leg.v[122] > leg.v[123]
+    return numpy.degrees(angles), swing, duration
+
+def swing_phases(swing):
+    return numpy.count_nonzero(swing[:, 1:] & ~swing[:, :-1], axis=1)
+
+def main(args):
+    configurations = CONFIGURATIONS
+    if args.configurations:
+        configurations = [(integrator, int(substeps)) for integrator, substeps in
+                          (configuration.split(":") for configuration in args.configurations)]
+    reference_angles, reference_swing, reference_duration = walk(args.variant, args.engine, *REFERENCE, args.steps)
+    print("%-12s %8s %6s %10s %8s %10s %10s %8s  %s" % ("integrator", "substeps", "dt", "steps/s", "speedup",
+          "RMS [deg]", "max [deg]", "phase", "swing phases per leg"))
+    rows = [(REFERENCE, reference_angles, reference_swing, reference_duration)]
+    for integrator, substeps in configurations:
+        rows.append(((integrator, substeps),) + walk(args.variant, args.engine, integrator, substeps, args.steps))
+    for (integrator, substeps), angles, swing, duration in rows:
+        deviation = angles - reference_angles
+        if not numpy.isfinite(deviation).all():
+            rms = maximum = float('nan')
+        else:
+            rms, maximum = numpy.sqrt(numpy.mean(deviation**2)), numpy.abs(deviation).max()
+        print("%-12s %8d %4d ms %10.1f %8.2f %10.3f %10.3f %7.1f%%  %s" % (integrator, substeps, 10 // substeps,
+              args.steps / duration, reference_duration / duration, rms, maximum,
+              100 * numpy.mean(swing == reference_swing), " ".join(str(count) for count in swing_phases(swing))))
+
+if __name__ == "__main__":
+    sys.exit(main(_args()))
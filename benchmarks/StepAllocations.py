@@ -0,0 +1,122 @@
+'''
+Allocations of the update of the leg controllers (tracemalloc).
+
+The vectorized and the batched engine compute the network phase (synapses,
+membrane update, band pass filters) in preallocated buffers. After some warm
+up steps on the kinematic plant, the network phase and the complete step of
+the leg controllers (input phase, network phase and output phase of all legs,
+as update_leg_controller) are repeated under tracemalloc and the peak of the
+traced memory per network iteration is reported (together with the memory
+still held after the iterations).
+Temporary arrays of the size of the network (n floats) or of the filter bank
+show up as a peak of hundreds to thousands of bytes; the remaining peak of the
+in place path comes from Python objects of the calls (well below the budget).
+The input and output phases are scalar Python code: they replace Python
+numbers (e.g. the time counter, the summed motor outputs) in every iteration,
+so their held memory varies by some bytes with the free lists of the
+interpreter; for the complete step the held memory is checked against the
+budget instead of 0. The coordination rules are not part of the step: the
+coupling operator adds with numpy.add.at, which allocates temporary buffers
+(some kB per call).
+
+The script exits with 1 if an engine with dense or compacted synapses exceeds the
+budget (the sparse store allocates the row sums of numpy.bincount, the active store
+the active set; these are only reported).
+
+Run: python3 -m benchmarks.StepAllocations [--variant neuro_walknet_2022] [--budget 1024]
+'''
+import os, gc, sys, random, tracemalloc, contextlib, importlib
+
+from tools.HeadlessControlLoop import ControlLoop
+
+ENGINES = [("vectorized", "dense"), ("batched", "dense"), ("vectorized", "compact"), ("batched", "compact"),
+           ("vectorized", "sparse"), ("batched", "sparse"), ("vectorized", "active"), ("batched", "active")]
+
+##  Getting the command line arguments.
+def _args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Allocations of the network phase of the leg controllers")
+    parser.add_argument("-v", "--variant", action="append", default=None,
+        choices=["neuro_walknet", "neuro_walknet_2022"], dest="variants", help="Controller (can be given several times, default: both).")
+    parser.add_argument("-w", "--warmup", action="store", default=20, type=int,
+        dest="warmup", help="Number of control steps before the measurement.")
+    parser.add_argument("-n", "--iterations", action="store", default=100, type=int,
+        dest="iterations", help="Number of measured network iterations.")
+    parser.add_argument("-b", "--budget", action="store", default=1024, type=int,
+        dest="budget", help="Allowed peak of the traced memory per network iteration in bytes.")
+    return parser.parse_args()
+
+##  Network phase of all legs (as in NeuroWalknet.processing_step).
+def network_phase(controller):
+    if controller.network_batch:
+        return controller.network_batch.update_networks
+    legs = [leg for leg in controller.controller_objs if leg]
+    def update_networks():
+        for leg in legs:
+            leg.update_network()
+    return update_networks
+
+##  Step of all leg controllers: input, network and output phase (update_leg_controller,
+#   resp. the phases of the batched engine as in NeuroWalknet.processing_step).
+def leg_step(controller, timeStamp):
+    legs = [leg for leg in controller.controller_objs if leg]
+    update_networks = network_phase(controller)
+    def step():
+        for leg in legs:
+            leg.update_inputs(timeStamp)
+        update_networks()
+        for leg in legs:
+            leg.update_outputs(timeStamp)
+    return step
+
+##  Peak and held traced memory (bytes) of the function over the iterations.
+def traced_memory(function, iterations):
+    function()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        function()   # first call under tracemalloc (fills the caches of tracemalloc)
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(iterations):
+            function()
+        end, _ = tracemalloc.get_traced_memory()
+        peak = 0
+        for _ in range(iterations):
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            function()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        return peak, end - start
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+
+def measure(variant, engine, synapses, args):
+    WNParams = importlib.import_module("controller." + variant + ".NeuroWNSettings")
+    importlib.reload(WNParams)
+    WNParams.engine, WNParams.synapses = engine, synapses
+    random.seed(0)
+    # status output of the controller (discarded, a buffer would grow during the measurement)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        loop = ControlLoop(variant)
+        for _ in range(args.warmup):
+            loop.step()
+        result = {"network": traced_memory(network_phase(loop.controller), args.iterations),
+                  "step": traced_memory(leg_step(loop.controller, loop.simulationTime), args.iterations)}
+    importlib.reload(WNParams)
+    return result
+
+def main(args):
+    passed = True
+    for variant in (args.variants or ["neuro_walknet", "neuro_walknet_2022"]):
+        for engine, synapses in ENGINES:
+            for phase, (peak, held) in measure(variant, engine, synapses, args).items():
+                checked = synapses in ("dense", "compact")
+                ok = not checked or (peak <= args.budget and held <= (0 if phase == "network" else args.budget))
+                passed = passed and ok
+                print("%-20s %-10s %-7s %-7s peak %6d bytes/iteration, held %6d bytes %s" %
+                      (variant, engine, synapses, phase, peak, held, ("ok" if ok else "ALLOCATES") if checked else "(not checked)"))
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main(_args()))
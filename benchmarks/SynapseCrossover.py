@@ -0,0 +1,81 @@
+'''
+Benchmark of the synaptic propagation: dense matrix product against the sparse
+synapse store (controller/neuro_common/SparseSynapses.py).
+
+For a network of n neurons the number of synapses is increased until the
+sparse store becomes slower than the dense product (crossover point).
+The line for the real leg network shows where the controller is located
+(together with the compacted store, controller/neuro_common/CompactSynapses.py).
+
+Run: python3 -m benchmarks.SynapseCrossover [-n 328] [--repeat 2000]
+'''
+import sys, timeit
+import numpy
+
+from controller.neuro_common.SparseSynapses import SparseSynapses
+from controller.neuro_common.CompactSynapses import CompactSynapses
+
+##  Getting the command line arguments.
+def _args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Crossover of dense and sparse synaptic propagation")
+    parser.add_argument("-n", "--neurons", action="store", default=328, type=int,
+        dest="neurons", help="Number of neurons of the network.")
+    parser.add_argument("-r", "--repeat", action="store", default=2000, type=int,
+        dest="repeat", help="Number of propagations per measurement.")
+    return parser.parse_args()
+
+##  Time per propagation (in microseconds) for dense and sparse store of W.
+def time_propagation(W, dynamic, repeat):
+    g = numpy.random.uniform(0., 50., W.shape[0])
+    sparse = SparseSynapses(W, dynamic)
+    dense_time = min(timeit.repeat(lambda: W.dot(g), number=repeat, repeat=3)) / repeat * 1e6
+    sparse_time = min(timeit.repeat(lambda: sparse.dot(g), number=repeat, repeat=3)) / repeat * 1e6
+    return dense_time, sparse_time
+
+def leg_network_weights():
+    import io, contextlib
+    import controller.neuro_walknet_2022.NeuroWNSettings as WNParams
+    from controller.neuro_walknet_2022.NeuroLegMovement import NeuroLegMovement
+    from tools.EmptyObject import EmptyObject
+    leg = EmptyObject()
+    leg.name, leg.left_leg = "front_left_leg", True
+    with contextlib.redirect_stdout(io.StringIO()):
+        leg_controller = NeuroLegMovement("leg", leg)
+    return leg_controller.WE
+
+def main(args):
+    n = args.neurons
+    rng = numpy.random.default_rng(0)
+    dynamic = [(53, 54), (172, 22), (260, 169)] if n > 260 else []
+    print("%10s %10s %12s %12s %8s" % ("synapses", "density", "dense [us]", "sparse [us]", "faster"))
+    crossover = None
+    synapses = 64
+    while synapses <= n*n:
+        W = numpy.zeros((n, n))
+        flat = rng.choice(n*n, synapses, replace=False)
+        W.flat[flat] = rng.uniform(0.1, 5., synapses)
+        dense_time, sparse_time = time_propagation(W, dynamic, args.repeat)
+        faster = "sparse" if sparse_time < dense_time else "dense"
+        if crossover is None and faster == "dense":
+            crossover = synapses
+        print("%10d %10.4f %12.2f %12.2f %8s" % (synapses, synapses/(n*n), dense_time, sparse_time, faster))
+        synapses *= 2
+    if crossover is None:
+        print("No crossover: sparse store is faster up to full connectivity.")
+    else:
+        print("Crossover: dense product is faster from about %d synapses (density %.3f)." % (crossover, crossover/(n*n)))
+
+    if n == 328:
+        WE = leg_network_weights()
+        dynamic = [(53, 54), (172, 22), (260, 169)]
+        dense_time, sparse_time = time_propagation(WE, dynamic, args.repeat)
+        print("Leg network WE (%d synapses): dense %.2f us, sparse %.2f us" % (numpy.count_nonzero(WE), dense_time, sparse_time))
+        g = numpy.random.uniform(0., 50., WE.shape[0])
+        compact = CompactSynapses(WE, dynamic)
+        out = numpy.zeros(WE.shape[0])
+        compact_time = min(timeit.repeat(lambda: compact.dot(g, out), number=args.repeat, repeat=3)) / args.repeat * 1e6
+        print("Leg network WE (%d of %d neurons with synaptic input): compact %.2f us" % (len(compact.targets), WE.shape[0], compact_time))
+
+if __name__ == "__main__":
+    main(_args())
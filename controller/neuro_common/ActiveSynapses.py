@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+'''
+Store of the synaptic weights that propagates only the active neurons.
+
+The synapses transmit the rectified conductance g = min(max(v - Erest, 0), 50),
+which is zero for the silent neurons: during walking only about a third of
+the neurons of a leg are active in a millisecond. Besides the rows of the
+neurons with synaptic input (targets x neurons, as in CompactSynapses) the
+store keeps the weights transposed (neurons x targets), so that the weights
+of the active neurons can be gathered and only their contributions are
+accumulated.
+
+Gathering costs time as well, so the store switches in each step between the
+active set and the product over all neurons, depending on the fraction of
+active neurons: up to the crossover (measured with benchmarks/ActiveCrossover.py)
+the active set is propagated. For the leg networks (328 neurons) the
+product over all neurons takes only a part of the step, the active set is
+faster for sparse activity only, up to about 2% active neurons. While walking
+about 30% of the neurons are active (standing about 23%), so these networks
+use the product over all neurons in every step: the active set pays off for
+sparse-activity configurations (e.g. the random sparse activity timed in
+benchmarks/ActiveCrossover.py, or larger networks with few active neurons). The store counts the active neurons per leg and
+the use of the active set (statistics), to tune the crossover for a network.
+The summation of the active contributions differs in order from the dense
+product, deviations are in the range of rounding errors (as in SparseSynapses).
+As in the other stores, the dense matrix stays the reference and the dynamic
+weights are read from it in each step. Stacked weight matrices (legs x n x n)
+use the union of the active neurons of all legs.
+'''
+import numpy
+
+# Fraction of active neurons up to which the active set is propagated (benchmarks/ActiveCrossover.py)
+CROSSOVER = 0.02
+
+class ActiveSynapses:
+
+    def __init__(self, W, dynamic=(), crossover=CROSSOVER):
+        """
+        W is the finished dense weight matrix (shared, not copied) or a stack of these,
+        dynamic a list of (row, column) of weights that change during walking.
+        """
+        self.W = W
+        self.n = W.shape[-1]
+        self.crossover = crossover
+        self.dynamic = list(dynamic)
+        self.dyn_rows = numpy.array([row for row, _ in dynamic], dtype=numpy.intp)
+        self.dyn_cols = numpy.array([col for _, col in dynamic], dtype=numpy.intp)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Collect the weights of the neurons with synaptic input from the dense matrix.
+        Has to be called again when a static weight is changed after construction.
+        """
+        blocks = self.W.reshape((-1, self.n, self.n))
+        connected = (blocks != 0.).any(axis=(0, 2))
+        connected[self.dyn_rows] = True
+        # remap tables: original numbers of the targets (neurons with synaptic input),
+        # compact index of each neuron (-1 without synaptic input)
+        self.targets = numpy.flatnonzero(connected)
+        target_index = numpy.full(self.n, -1, dtype=numpy.intp)
+        target_index[self.targets] = numpy.arange(len(self.targets))
+
+        self.stack = self.W.shape[:-2]
+        n_targets = len(self.targets)
+        offset = numpy.arange(len(blocks))[:, None]
+        compact = blocks[:, self.targets]
+        # targets x neurons for the product over all neurons, neurons x targets for the active set
+        self.compact = numpy.ascontiguousarray(compact).reshape(self.stack + (n_targets, self.n))
+        self.transposed = numpy.ascontiguousarray(compact.transpose(0, 2, 1)).reshape(self.stack + (self.n, n_targets))
+        # positions of the dynamic weights in the flattened dense and compacted matrices
+        self.dyn_flat = ((offset*self.n + self.dyn_rows)*self.n + self.dyn_cols).ravel()
+        self.dyn_compact = ((offset*n_targets + target_index[self.dyn_rows])*self.n + self.dyn_cols).ravel()
+        self.dyn_transposed = ((offset*self.n + self.dyn_cols)*n_targets + target_index[self.dyn_rows]).ravel()
+        self.dyn_weights = numpy.zeros(len(self.dyn_flat), dtype=self.W.dtype)
+        # positions of the targets and of the unconnected neurons in the flattened result
+        self.target_flat = (offset*self.n + self.targets).ravel()
+        self.unconnected_flat = (offset*self.n + numpy.flatnonzero(~connected)).ravel()
+        self.unconnected_zeros = numpy.zeros(len(self.unconnected_flat), dtype=self.W.dtype)
+        self.sums = numpy.zeros(self.stack + (n_targets,), dtype=self.W.dtype)
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        self.calls = 0
+        self.active_calls = 0
+        self.active_count = numpy.zeros(self.stack, dtype=numpy.int64)   # sum of the active neurons of each leg
+
+    def statistics(self):
+        """
+        Average fraction of active neurons (per leg for stacked matrices)
+        and fraction of the steps that used the active set.
+        """
+        calls = max(self.calls, 1)
+        return self.active_count / (calls * self.n), self.active_calls / calls
+
+    def dot(self, g, out=None):
+        """
+        Synaptic input W.dot(g) of all neurons (g stacked like W),
+        written to out (contiguous) if given.
+        """
+        numpy.take(self.W, self.dyn_flat, out=self.dyn_weights, mode='clip')
+        self.calls += 1
+        if g.ndim == 1:
+            active = numpy.count_nonzero(g)
+            self.active_count += active
+        else:
+            self.active_count += numpy.count_nonzero(g, axis=-1)
+            union = g.any(axis=0)   # union of the active neurons of all legs
+            active = numpy.count_nonzero(union)
+        if active <= self.crossover * self.n:
+            self.active_calls += 1
+            numpy.put(self.transposed, self.dyn_transposed, self.dyn_weights)
+            indices = numpy.flatnonzero(g if g.ndim == 1 else union)
+            if g.ndim == 1:
+                numpy.dot(g[indices], self.transposed[indices], out=self.sums)
+            else:
+                numpy.matmul(g[:, None, indices], self.transposed[:, indices], out=self.sums[:, None, :])
+        else:
+            numpy.put(self.compact, self.dyn_compact, self.dyn_weights)
+            if g.ndim == 1:
+                numpy.dot(self.compact, g, out=self.sums)
+            else:
+                numpy.matmul(self.compact, g[..., None], out=self.sums[..., None])
+        if out is None:
+            out = numpy.empty(g.shape, dtype=self.W.dtype)
+        numpy.put(out, self.target_flat, self.sums)
+        numpy.put(out, self.unconnected_flat, self.unconnected_zeros)
+        return out
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+'''
+Adaptive number of network iterations per control step.
+
+NeuroWalknet.processing_step computes 10 network iterations (substeps, one
+millisecond each) per control step, as no new sensor data arrive in between.
+In the adaptive mode the convergence of the network of each leg is measured
+in every computed substep: the largest change max|vn - v| of the activations
+over the substep (vn: result of the network phase, v: result of the network
+phase of the previous substep). The input of the network phase itself is not
+compared, as the coordination rules add their influences to the activations
+in every substep and the membrane update takes them away again. The band pass
+filters are covered by their outputs (the activations of the filtered
+neurons); their integrators keep changing while the outputs are steady. If the
+change is at most the threshold, the network of the leg has settled and the
+remaining substeps of the control step are extrapolated for this leg instead
+of computed: the input, network and output phases are
+left out, the motor outputs summed over the substeps (alphaHvelout,
+betaHvelout, gammaHvelout) get the increments of the last computed substep,
+the time counter of the leg advances, and the state after the last computed
+substep (activations, filter states) is held. Holding the activations
+replaces the changes of the coordination rules, as the membrane update does;
+the coordination rules are still updated in every substep, so the first
+substep of the next control step (which is always computed, new sensor data)
+gets their influence. The extrapolated substeps draw no noise of the motor
+output (noisefct) and the experiments of the leg act again with the next
+computed substep.
+
+With the batched engine the network phase is computed for all legs at once
+as long as one leg has not converged, the held legs leave out their input and
+output phases and their state is restored after the network phase; if all
+legs have converged the network phase is left out as well.
+The counters (substeps of the legs computed and extrapolated) show how many
+substeps were saved.
+'''
+import numpy
+
+class LegConvergence:
+    """
+    Convergence of the network of one leg controller (NeuroLegMovement) and its held state.
+    """
+
+    # Arrays of the leg controller that form the state of the network
+    state_names = ('v', 'outHPF', 'outHPF2', 'auxHPF', 'auxHPFold')
+
+    def __init__(self, leg):
+        self.leg = leg
+        n, dtype = leg.n, leg.v.dtype
+        self.previous = numpy.zeros(n, dtype=dtype)   # result of the previous network phase
+        self.difference = numpy.zeros(n, dtype=dtype)
+        self.held = {name: numpy.zeros(n, dtype=dtype) for name in self.state_names}
+        self.outputs = (0., 0., 0.)
+        self.increments = (0., 0., 0.)
+        self.start_step()
+
+    def start_step(self):
+        """
+        New control step: new sensor data, the network has to be computed again.
+        """
+        self.converged = False
+
+    def change(self):
+        """
+        After the network phase: largest change of the activations since the network phase
+        of the previous substep.
+        """
+        leg, difference = self.leg, self.difference
+        numpy.subtract(leg.v, self.previous, out=difference)
+        numpy.absolute(difference, out=difference)
+        numpy.copyto(self.previous, leg.v)
+        return difference.max()
+
+    def before_outputs(self):
+        leg = self.leg
+        self.outputs = (leg.alphaHvelout, leg.betaHvelout, leg.gammaHvelout)
+
+    def after_outputs(self, converged):
+        """
+        After the output phase of a computed substep: if the network has converged,
+        increments of the motor outputs and state that are held for the rest of the control step.
+        """
+        if not converged:
+            return
+        leg = self.leg
+        self.increments = (leg.alphaHvelout - self.outputs[0], leg.betaHvelout - self.outputs[1],
+                           leg.gammaHvelout - self.outputs[2])
+        for name, held in self.held.items():
+            numpy.copyto(held, getattr(leg, name))
+        self.converged = True
+
+    def hold(self):
+        """
+        Extrapolated substep: time counter, motor outputs and the held state.
+        """
+        leg = self.leg
+        leg.count = leg.count + leg.dt
+        leg.alphaHvelout += self.increments[0]
+        leg.betaHvelout += self.increments[1]
+        leg.gammaHvelout += self.increments[2]
+        for name, held in self.held.items():
+            numpy.copyto(getattr(leg, name), held)
+
+class AdaptiveSubsteps:
+    """
+    Adaptive substeps of the leg controllers of NeuroWalknet.
+    """
+
+    def __init__(self, leg_controllers, threshold):
+        """
+        leg_controllers is the list of NeuroLegMovement objects (missing legs are None),
+        threshold the largest change max|vn - v| over a substep of a settled network.
+        """
+        self.threshold = threshold
+        self.legs = [LegConvergence(leg) for leg in leg_controllers if leg]
+        self.by_controller = {id(observed.leg): observed for observed in self.legs}
+        self.computed = 0
+        self.skipped = 0
+
+    def start_step(self):
+        for observed in self.legs:
+            observed.start_step()
+
+    def update_leg(self, controller, timeStamp):
+        """
+        Substep of one leg controller (scalar and vectorized engine).
+        """
+        observed = self.by_controller[id(controller)]
+        if observed.converged:
+            observed.hold()
+            self.skipped += 1
+            return
+        controller.update_inputs(timeStamp)
+        controller.update_network()
+        converged = observed.change() <= self.threshold
+        observed.before_outputs()
+        controller.update_outputs(timeStamp)
+        observed.after_outputs(converged)
+        self.computed += 1
+
+    def update_batch(self, network_batch, timeStamp):
+        """
+        Substep of all leg controllers with the batched engine.
+        """
+        active = [observed for observed in self.legs if not observed.converged]
+        if active:
+            for observed in active:
+                observed.leg.update_inputs(timeStamp)
+            network_batch.update_networks()
+        for observed in self.legs:
+            if observed.converged:
+                observed.hold()
+        for observed in active:
+            converged = observed.change() <= self.threshold
+            observed.before_outputs()
+            observed.leg.update_outputs(timeStamp)
+            observed.after_outputs(converged)
+        self.computed += len(active)
+        self.skipped += len(self.legs) - len(active)
+
+    def saved(self):
+        """
+        Fraction of the substeps of the legs that were extrapolated.
+        """
+        return self.skipped / max(self.computed + self.skipped, 1)
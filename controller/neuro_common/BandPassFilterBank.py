@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+'''
+Bank of the nonlinear high pass filters of a leg network.
+
+Some units of the leg network (CPG, swing, coordination rules) have to pass a
+nonlinear high pass filter after the membrane update, thereby forming a
+bandpassfilter. The bank updates all filtered units at once (instead of calling
+NeuroLegMovement.applyBandPassFilter neuron by neuron) and works on the filter
+state arrays of the leg, so both versions can be used on the same state.
+The state arrays can also be stacked (legs x neurons), then the leak values
+are given per leg (one row for each leg).
+For integration time steps longer than 1 ms (dt), the filter state integrates
+the filter output over the time step.
+The filtered activations can be numbered differently from the filter state
+(see remapped, used for the compacted activations of CompactNetwork).
+'''
+import copy
+import numpy
+
+class BandPassFilterBank:
+
+    def __init__(self, leaks, auxHPF, auxHPFold, outHPF, outHPF2):
+        """
+        leaks is a list of (neuron, leak_1, leak_2) entries: leak_1 is used while the
+        filter state is increasing, leak_2 otherwise. The leak values are resolved
+        once (e.g. for the walking mode) by the leg controller.
+        The state arrays are shared with the leg controller (not copied).
+        """
+        self.neurons = numpy.array([neuron for neuron, _, _ in leaks], dtype=numpy.intp)
+        self.leak_1 = numpy.array([leak_1 for _, leak_1, _ in leaks], dtype=float)
+        self.leak_2 = numpy.array([leak_2 for _, _, leak_2 in leaks], dtype=float)
+        self.dt = 1.   # integration time step (ms)
+        self.bind(auxHPF, auxHPFold, outHPF, outHPF2)
+
+    def bind(self, auxHPF, auxHPFold, outHPF, outHPF2):
+        """
+        Use the given arrays as filter state (e.g. after the state of a leg has been moved).
+        """
+        self.auxHPF, self.auxHPFold = auxHPF, auxHPFold
+        self.outHPF, self.outHPF2 = outHPF, outHPF2
+        # positions of the filtered units in the flattened state arrays (one row per leg if stacked)
+        rows = numpy.arange(auxHPF.size // auxHPF.shape[-1]).reshape(auxHPF.shape[:-1] + (1,))
+        self.index = rows*auxHPF.shape[-1] + self.neurons
+        self.units = self.index   # positions of the filtered units in the flattened activations
+        # scratch buffers, the filters are applied without allocations
+        self.aux = numpy.zeros(self.index.shape, dtype=auxHPF.dtype)
+        self.out = numpy.zeros(self.index.shape, dtype=auxHPF.dtype)
+        self.leak = numpy.zeros(self.index.shape, dtype=auxHPF.dtype)
+        self.increasing = numpy.zeros(self.index.shape, dtype=bool)
+
+    @classmethod
+    def stack(cls, banks, auxHPF, auxHPFold, outHPF, outHPF2):
+        """
+        Filter bank for stacked state arrays (legs x neurons), combining
+        the banks of the individual legs (which have to filter the same neurons).
+        """
+        stacked = cls([], auxHPF, auxHPFold, outHPF, outHPF2)
+        stacked.neurons = banks[0].neurons
+        if any(not numpy.array_equal(bank.neurons, stacked.neurons) for bank in banks):
+            raise Exception("The filter banks of the legs act on different neurons.")
+        stacked.leak_1 = numpy.array([bank.leak_1 for bank in banks])
+        stacked.leak_2 = numpy.array([bank.leak_2 for bank in banks])
+        stacked.dt = banks[0].dt
+        stacked.bind(auxHPF, auxHPFold, outHPF, outHPF2)
+        return stacked
+
+    def remapped(self, positions, width):
+        """
+        Copy of the bank on the same filter state for activations with another numbering:
+        positions of the filtered units in a row of the activations, width of the rows.
+        """
+        bank = copy.copy(self)
+        rows = numpy.arange(self.index.size // len(self.neurons)).reshape(self.index.shape[:-1] + (1,))
+        bank.units = rows*width + numpy.asarray(positions, dtype=numpy.intp)
+        return bank
+
+    def apply(self, vn):
+        """
+        Application of the high pass filter to all filtered units of vn (in place).
+        Same operations as applyBandPassFilter for each of the neurons,
+        computed in the scratch buffers of the bank.
+        """
+        index, aux, out, leak = self.index, self.aux, self.out, self.leak
+        numpy.take(self.auxHPF, index, out=aux, mode='clip')
+        numpy.take(self.outHPF, index, out=out, mode='clip')
+        if self.dt != 1.:
+            numpy.multiply(out, self.dt, out=out)
+        numpy.add(aux, out, out=aux)
+        numpy.take(self.auxHPFold, index, out=out, mode='clip')
+        numpy.less(out, aux, out=self.increasing)
+        numpy.copyto(leak, self.leak_2)
+        numpy.copyto(leak, self.leak_1, where=self.increasing)
+        numpy.take(vn, self.units, out=out, mode='clip')
+        numpy.multiply(aux, leak, out=leak)
+        numpy.subtract(out, leak, out=out)
+        numpy.put(self.auxHPF, index, aux)
+        numpy.put(self.auxHPFold, index, aux)
+        numpy.put(self.outHPF, index, out)
+        numpy.maximum(out, 0., out=out)
+        numpy.put(self.outHPF2, index, out)
+        numpy.put(vn, self.units, out)
+        return vn
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+'''
+Dead-neuron elimination and index compaction for the network phase of the leg networks.
+
+The leg networks are numbered in blocks (20 neurons per muscle, 40 per joint,
+13 units per ring net, ...), and many numbers inside the blocks are not used:
+of the 328 neurons of a leg about 90 have neither synaptic input nor output.
+The analysis pass (rebuild) finds the dead neurons: no synapse in WE or WI
+(including the weights that change during walking), not at rest at the start
+(v = Erest and Iapp = 0), no band pass filter and not written outside of the
+network phase (external, e.g. the load recordings of the output phase). Such a
+neuron stays at rest forever and does not act on any other neuron.
+The live neurons are copied into a dense smaller index space with a remap
+table (live: original number of each compact neuron, index: compact number of
+each neuron, -1 for dead ones): compacted activations, inputs, membrane
+constants and weight matrices (live x live). The whole network phase (synapses,
+membrane update, band pass filters) is computed in the compact space.
+
+The arrays of the leg (v, vn, Iapp, ...) keep the original numbering and are the
+view layer for all other code: the input and output phases, the coordination
+rules, the experiments and the visualizations address v[122], v[123], etc. as
+before. Before the network phase the live neurons are gathered from them,
+afterwards the new activations are scattered back; the dead neurons keep their
+resting potential, which is also the result of the full computation. The
+filter states stay in the arrays of the leg (the filters act on a few neurons
+only), the synaptic sums (g, Sumg, Sumgex, Sumgin) of the leg are not updated.
+A dead neuron that is changed outside of the network phase would not be
+computed: with __debug__ (not under python -O) this is checked in every
+iteration and reported, the neuron has to be added to the external neurons.
+
+Only the columns of the dead neurons (zero conductance) are left out of the
+synaptic sums, but the matrix products sum up in a different order, so the
+results differ from the full computation in the range of rounding errors.
+Stacked state (legs x neurons, batched engine) is compacted with the union of
+the live neurons of all legs.
+'''
+import numpy
+
+from controller.neuro_common import NeuronKernels
+
+class CompactNetwork:
+
+    def __init__(self, network, dynamic_WE=(), dynamic_WI=(), external=()):
+        """
+        network is a leg controller (NeuroLegMovement) or LegNetworkBatch, its state
+        arrays (v, vn, Iapp, Cmem_step, WE, WI) are the view layer (shared, not copied),
+        dynamic_WE and dynamic_WI the lists of (row, column) of the weights that change
+        during walking, external the neurons written outside of the network phase.
+        """
+        self.network = network
+        self.n = network.v.shape[-1]
+        self.dynamic = {'WE': list(dynamic_WE), 'WI': list(dynamic_WI)}
+        self.external = numpy.array(external, dtype=numpy.intp)
+        self.rebuild()
+
+    def live_neurons(self):
+        """
+        Analysis pass: mask of the live neurons (over all legs if stacked).
+        """
+        network, n = self.network, self.n
+        live = numpy.zeros(n, dtype=bool)
+        for name in ('WE', 'WI'):
+            blocks = getattr(network, name).reshape((-1, n, n)) != 0.
+            live |= blocks.any(axis=(0, 2))   # synaptic input
+            live |= blocks.any(axis=(0, 1))   # synaptic output
+            for row, column in self.dynamic[name]:
+                live[row] = live[column] = True
+        rest = (network.v.reshape((-1, n)) == network.Erest) & (network.Iapp.reshape((-1, n)) == 0.)
+        live |= ~rest.all(axis=0)
+        live[network.band_pass.neurons] = True
+        live[self.external] = True
+        return live
+
+    def rebuild(self):
+        """
+        Analysis of the network and compaction of the live neurons. Has to be called again
+        when a static weight or the time step is changed after construction.
+        """
+        network, n = self.network, self.n
+        stack = network.v.shape[:-1]
+        live = self.live_neurons()
+        # remap tables: original numbers of the compact neurons, compact number of each neuron
+        self.live = numpy.flatnonzero(live)
+        self.dead = numpy.flatnonzero(~live)
+        self.index = numpy.full(n, -1, dtype=numpy.intp)
+        self.index[self.live] = numpy.arange(len(self.live))
+        m = len(self.live)
+
+        offset = numpy.arange(int(numpy.prod(stack, dtype=int)))[:, None]
+        # positions of the live and dead neurons in the flattened state arrays (shaped like the compact state)
+        self.live_flat = (offset*n + self.live).reshape(stack + (m,))
+        self.dead_flat = (offset*n + self.dead).reshape(stack + (len(self.dead),))
+        # compacted weights (live x live) and positions of the dynamic weights
+        self.weights, self.dyn_flat, self.dyn_compact = {}, {}, {}
+        for name in ('WE', 'WI'):
+            blocks = getattr(network, name).reshape((-1, n, n))
+            self.weights[name] = numpy.ascontiguousarray(blocks[:, self.live][:, :, self.live]).reshape(stack + (m, m))
+            rows = numpy.array([row for row, _ in self.dynamic[name]], dtype=numpy.intp)
+            cols = numpy.array([col for _, col in self.dynamic[name]], dtype=numpy.intp)
+            self.dyn_flat[name] = ((offset*n + rows)*n + cols).ravel()
+            self.dyn_compact[name] = ((offset*m + self.index[rows])*m + self.index[cols]).ravel()
+        self.dyn_weights = {name: numpy.zeros(len(self.dyn_flat[name]), dtype=network.v.dtype) for name in self.dyn_flat}
+
+        # compacted constants and state
+        dtype = network.v.dtype
+        self.Cmem = network.Cmem_step.take(self.live_flat, mode='clip').reshape(stack + (m,))
+        self.limits = NeuronKernels.upper_limits(network.v.shape, dtype).take(self.live_flat, mode='clip').reshape(stack + (m,))
+        for name in ('v', 'vn', 'Iapp', 'g', 'Sumgex', 'Sumgin', 'Sumg'):
+            setattr(self, name, numpy.zeros(stack + (m,), dtype=dtype))
+        self.band_pass = network.band_pass.remapped(self.index[network.band_pass.neurons], m)
+        self.dead_values = numpy.zeros(self.dead_flat.shape, dtype=dtype)
+
+    def check_dead(self):
+        """
+        The dead neurons have to be at rest (debug check, they are not computed).
+        """
+        network = self.network
+        for name, rest in (('v', network.Erest), ('Iapp', 0.)):
+            getattr(network, name).take(self.dead_flat, out=self.dead_values, mode='clip')
+            changed = numpy.flatnonzero(self.dead_values != rest)
+            if len(changed):
+                neuron = self.dead[changed[0] % len(self.dead)]
+                raise Exception("Neuron %d of the leg network has no synapses, but %s was changed outside of the "
+                                "network phase: it has to be added to the external neurons (see CompactNetwork)." % (neuron, name))
+
+    def update(self):
+        """
+        Network phase in the compact space: same computation as NeuroLegMovement.update_network
+        (vectorized engine), resp. LegNetworkBatch.update_networks, on the live neurons.
+        """
+        network = self.network
+        probe = network.probe   # timing of the phases (see PhaseProbes)
+        if __debug__:
+            self.check_dead()
+            if probe: probe.start()
+        # gather the live neurons from the view layer
+        network.v.take(self.live_flat, out=self.v, mode='clip')
+        network.Iapp.take(self.live_flat, out=self.Iapp, mode='clip')
+        # piecewise linear synapses
+        numpy.subtract(self.v, network.Erest, out=self.g)
+        numpy.maximum(self.g, 0., out=self.g)
+        numpy.minimum(self.g, 50., out=self.g)
+        for name, sums in (('WE', self.Sumgex), ('WI', self.Sumgin)):
+            weights = self.weights[name]
+            getattr(network, name).take(self.dyn_flat[name], out=self.dyn_weights[name], mode='clip')
+            weights.put(self.dyn_compact[name], self.dyn_weights[name])
+            if self.g.ndim == 1:
+                numpy.dot(weights, self.g, out=sums)
+            else:
+                numpy.matmul(weights, self.g[..., None], out=sums[..., None])
+        numpy.minimum(self.Sumgex, 80., out=self.Sumgex)
+        numpy.multiply(self.Sumgin, -1., out=self.Sumgin)
+        numpy.maximum(self.Sumgin, -80., out=self.Sumgin)
+        numpy.add(self.Sumgex, self.Sumgin, out=self.Sumg)
+        if __debug__:
+            if probe: probe.lap("synapses")
+
+        # simplified Hodgkin Huxley differential equation and band pass filters
+        NeuronKernels.update_membrane(self.v, self.vn, self.Sumg, self.Iapp, self.Cmem, network.Erest, self.limits)
+        if __debug__:
+            if probe: probe.lap("neurons")
+        self.band_pass.apply(self.vn)
+        if __debug__:
+            if probe: probe.lap("band_pass")
+        # scatter the new activations back, self.v is required as input for the next iteration
+        network.v.put(self.live_flat, self.vn)
+        network.vn.put(self.live_flat, self.vn)
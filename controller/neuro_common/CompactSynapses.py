@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+'''
+Compacted store of the synaptic weights of a leg network.
+
+The leg networks are numbered in blocks (20 neurons per muscle, 40 per joint,
+13 units per ring net, ...), and many numbers inside the blocks are not
+connected: of the 328 neurons of a leg, only about 180 receive excitatory and
+about 130 inhibitory synapses. The analysis pass (rebuild) finds the rows of
+the weight matrix without any synapse (neurons without synaptic input) and
+copies the other rows into a smaller dense matrix. The propagation computes
+the product with the compacted rows only and scatters the result back to
+the neurons, the synaptic input of the unconnected neurons is zero.
+
+Each row of the product is summed up exactly as in the dense product,
+therefore the results are identical to those of the dense matrices.
+(Compacting the columns as well would change the order of the summation in
+the matrix product, the results would only agree up to rounding errors.)
+
+The state of the leg network (v, Iapp, Sumg, ...) keeps the original
+numbering, the remap tables (targets and target_index) are only used inside
+the store: the leg controller, the coordination rules and the visualizations
+address the neurons by their numbers as before.
+As in the sparse store, the dense matrix stays the reference and the weights
+that are rewritten during walking (dynamic weights) are read from it in each
+step. Stacked weight matrices (legs x n x n) are compacted with the union of
+the connected neurons of all legs, so all legs are computed in one product.
+'''
+import numpy
+
+class CompactSynapses:
+
+    def __init__(self, W, dynamic=()):
+        """
+        W is the finished dense weight matrix (shared, not copied) or a stack of these,
+        dynamic a list of (row, column) of weights that change during walking.
+        """
+        self.W = W
+        self.n = W.shape[-1]
+        self.dynamic = list(dynamic)
+        self.dyn_rows = numpy.array([row for row, _ in dynamic], dtype=numpy.intp)
+        self.dyn_cols = numpy.array([col for _, col in dynamic], dtype=numpy.intp)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Analysis of the neurons with synaptic input and compaction of the weights.
+        Has to be called again when a static weight is changed after construction.
+        """
+        blocks = self.W.reshape((-1, self.n, self.n))
+        connected = (blocks != 0.).any(axis=(0, 2))
+        connected[self.dyn_rows] = True
+        # remap tables: original numbers of the compact rows,
+        # and compact row of each neuron (-1 without synaptic input)
+        self.targets = numpy.flatnonzero(connected)
+        self.target_index = numpy.full(self.n, -1, dtype=numpy.intp)
+        self.target_index[self.targets] = numpy.arange(len(self.targets))
+
+        stack = self.W.shape[:-2]
+        offset = numpy.arange(len(blocks))[:, None]
+        self.compact = numpy.ascontiguousarray(blocks[:, self.targets]).reshape(stack + (len(self.targets), self.n))
+        # positions of the dynamic weights in the flattened dense and compact matrices
+        self.dyn_flat = ((offset*self.n + self.dyn_rows)*self.n + self.dyn_cols).ravel()
+        self.dyn_compact = ((offset*len(self.targets) + self.target_index[self.dyn_rows])*self.n + self.dyn_cols).ravel()
+        self.dyn_weights = numpy.zeros(len(self.dyn_flat), dtype=self.W.dtype)
+        # positions of the targets and of the unconnected neurons in the flattened result
+        unconnected = numpy.flatnonzero(~connected)
+        self.target_flat = (offset*self.n + self.targets).ravel()
+        self.unconnected_flat = (offset*self.n + unconnected).ravel()
+        self.unconnected_zeros = numpy.zeros(len(self.unconnected_flat), dtype=self.W.dtype)
+        self.sums = numpy.zeros(stack + (len(self.targets),), dtype=self.W.dtype)
+
+    def dot(self, g, out=None):
+        """
+        Synaptic input W.dot(g) of all neurons (g stacked like W),
+        written to out (contiguous) if given. All steps use the buffers of the store.
+        """
+        numpy.take(self.W, self.dyn_flat, out=self.dyn_weights, mode='clip')
+        numpy.put(self.compact, self.dyn_compact, self.dyn_weights)
+        if g.ndim == 1:
+            numpy.dot(self.compact, g, out=self.sums)
+        else:
+            numpy.matmul(self.compact, g[..., None], out=self.sums[..., None])
+        if out is None:
+            out = numpy.empty(g.shape, dtype=self.W.dtype)
+        numpy.put(out, self.target_flat, self.sums)
+        numpy.put(out, self.unconnected_flat, self.unconnected_zeros)
+        return out
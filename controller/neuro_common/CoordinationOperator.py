@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+'''
+Coordination rules as a coupling operator between the leg networks.
+
+The rules are given as a table of couplings (target leg, target neuron,
+source leg, source neuron, rule): the activation of the source neuron,
+scaled with the strength of the rule, is added to the target neuron.
+The table is compiled once into index and strength arrays over the stacked
+activations of all legs (legs x neurons), the operator is then applied with
+one gather, scaling and scatter-add, followed by the upper limits.
+Couplings from or to missing legs and couplings of rules with strength zero
+are left out. The rules act once per network iteration, with longer time steps
+of the integrator the couplings are scaled with the time step (dt in ms), so
+that the coupling per millisecond does not depend on the time step.
+'''
+import numpy
+
+class CoordinationOperator:
+
+    def __init__(self, table, strengths, rows, n, limits=(), dt=1):
+        """
+        Parameters
+        ----------
+        table : list
+            Couplings (target leg, target neuron, source leg, source neuron, rule),
+            in the order in which they are applied.
+        strengths : dict
+            Strength of each rule (e.g. WNParams.coord_rules), a copy is kept.
+        rows : list
+            Row of each leg in the stacked activations, None for missing legs.
+        n : int
+            Number of neurons of a leg network.
+        limits : list
+            (neuron, upper limit) applied in all legs after the coupling.
+        dt : int
+            Integration time step (ms) of the networks, the strengths are scaled with it.
+        """
+        self.strengths = dict(strengths)
+        couplings = [(rows[target_leg]*n + target, rows[source_leg]*n + source, self.strengths[rule]*dt)
+                     for target_leg, target, source_leg, source, rule in table
+                     if rows[target_leg] is not None and rows[source_leg] is not None
+                     and self.strengths[rule] != 0.]
+        self.targets = numpy.array([target for target, _, _ in couplings], dtype=numpy.intp)
+        self.sources = numpy.array([source for _, source, _ in couplings], dtype=numpy.intp)
+        self.scale = numpy.array([strength for _, _, strength in couplings], dtype=float)
+        present = [row for row in rows if row is not None]
+        self.limited = numpy.array([row*n + neuron for neuron, _ in limits for row in present], dtype=numpy.intp)
+        self.limits = numpy.array([limit for _, limit in limits for row in present], dtype=float)
+
+    @classmethod
+    def concatenate(cls, operators):
+        """
+        One operator for several groups of legs in the same stacked activations
+        (e.g. the individuals of a population, compiled with their own rows and strengths).
+        """
+        combined = cls([], {}, [], 0)
+        for name in ('targets', 'sources', 'scale', 'limited', 'limits'):
+            setattr(combined, name, numpy.concatenate([getattr(operator, name) for operator in operators]))
+        combined.strengths = [operator.strengths for operator in operators]
+        return combined
+
+    def apply(self, activations):
+        """
+        Apply the coupling to the stacked activations (legs x neurons, in place).
+        The sources are never targets, so all couplings read the activations
+        from before the update (as the rules applied one after the other).
+        """
+        flat = activations.view()
+        flat.shape = (-1,)   # raises if the activations are not one contiguous block
+        # unbuffered: several couplings to one target are added in table order
+        numpy.add.at(flat, self.targets, flat[self.sources]*self.scale)
+        flat[self.limited] = numpy.minimum(flat[self.limited], self.limits)
+        return activations
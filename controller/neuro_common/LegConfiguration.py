@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+'''
+Experimental configuration of a single leg controller.
+
+Most experimental parameters of the settings (NeuroWNSettings) are dictionaries
+with one entry per leg (e.g. pep, intraleg, pilo, loadsign). The leg controller
+reads them in every network iteration, so the entries of its leg are resolved
+once into slotted attributes: the hot path reads plain values instead of
+looking up a module attribute and a string keyed dictionary.
+Changes of the settings after the construction of the controller are taken
+over explicitly by reconfigure().
+'''
+
+class LegConfiguration:
+
+    # Per-leg dictionaries of the settings (not every controller has all of them)
+    parameters = ('aep', 'pep', 'aepload', 'loadthr', 'loadsign', 'offset', 'offset_el', 'alpha_offset',
+                  'gammamorphAEP', 'gammamorphPEPBW', 'fovelstance', 'fovelswingFW', 'fovelswingBW',
+                  'CPGfrequ', 'SwingSetpoint', 'SwingWeight', 'SwingTau', 'SwingBetaFactor', 'shiftHl',
+                  'intraleg', 'pilo', 'pilointraleg', 'Deaffonly', 'frictW', 'standL',
+                  'standLalpha', 'standLbeta', 'standLgamma', 'disturb', 'SplitBelt')
+    __slots__ = ('settings', 'leg_name') + parameters
+
+    def __init__(self, settings, leg_name):
+        """
+        settings is the settings module of the controller (shared, read again
+        by reconfigure), leg_name the key of the leg in its dictionaries.
+        """
+        self.settings = settings
+        self.leg_name = leg_name
+        self.reconfigure()
+
+    def reconfigure(self):
+        """
+        Resolve the values of the leg from the settings again (e.g. after an
+        experiment has changed them). Only the values read by the leg controller
+        during walking are affected, the weights of the network are set up from
+        the settings when the controller is constructed.
+        """
+        for name in self.parameters:
+            values = getattr(self.settings, name, None)
+            if values is not None:
+                setattr(self, name, values[self.leg_name])
@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+'''
+Experimental conditions of a leg controller as exchangeable strategies.
+
+Experiments (pilocarpine, treadmill friction, standing legs, disturbance,
+intraleg stimulation, curve walking, running) change the update of a leg
+controller at fixed points of its input and output phase (the hooks). Most of
+them are constant for a whole run, so they are selected once per leg when the
+controller is constructed: the leg controller only calls the hooks of its
+selected experiments, and a leg walking without experiment runs the base
+update alone.
+
+The registry EXPERIMENTS is shared by both controllers (neuro_walknet and
+neuro_walknet_2022); an experiment lists the controllers it is written for.
+The hooks of several experiments are called in registry order, which is the
+order of the conditions in the original update.
+New experiments are added with the register decorator:
+
+    @register
+    class MyExperiment(LegExperiment):
+        @classmethod
+        def applies(cls, leg, settings):
+            return leg.config.pilo == 1.
+        def motor(self, leg):
+            leg.alphaHvelout = 0.
+'''
+from controller.neuro_common import StimulusProtocols
+
+# Hooks, in the order in which the leg controller calls them
+#   inputs:      input phase, after the thresholds of the coordination rules
+#   sensors:     input phase, after the joint positions have been converted to inputs
+#   cpg:         end of the input phase
+#   activations: output phase, directly after the network update (before the limits of the units)
+#   outputs:     output phase, after the limits of the units
+#   premotor:    after the force velocity gain
+#   motor:       after the motor output has been summed up
+#   stance_end:  forward walking, after the PEP position threshold during stance
+#   stance_load: forward walking, after the load signal during stance
+#   forward:     end of the forward walking transitions
+#   backward:    end of the backward walking transitions
+HOOKS = ('inputs', 'sensors', 'cpg', 'activations', 'outputs', 'premotor', 'motor',
+         'stance_end', 'stance_load', 'forward', 'backward')
+
+CONTROLLERS = ('neuro_walknet', 'neuro_walknet_2022')
+
+def reached(leg, time):
+    """
+    Whether the time counter of the leg (ms) reaches the given time in the current
+    iteration, also for integration time steps longer than 1 ms.
+    """
+    return leg.count - leg.dt < time <= leg.count
+
+class LegExperiment:
+    """
+    Base class of the experiments: all hooks do nothing.
+
+    The hooks get the leg controller (NeuroLegMovement) and act on its state
+    (e.g. leg.Iapp, leg.v, leg.WE), as the code of the leg controller itself.
+    """
+    controllers = CONTROLLERS
+
+    @classmethod
+    def applies(cls, leg, settings):
+        """
+        Whether the experiment is active for the leg controller (with the given settings).
+        """
+        return False
+
+    def __init__(self, leg, settings, controller):
+        pass
+
+    def setup(self, leg):
+        """
+        Values of the leg controller that are constant during the experiment.
+        """
+        pass
+
+    def inputs(self, leg): pass
+    def sensors(self, leg): pass
+    def cpg(self, leg): pass
+    def activations(self, leg): pass
+    def outputs(self, leg): pass
+    def premotor(self, leg): pass
+    def motor(self, leg): pass
+    def stance_end(self, leg): pass
+    def stance_load(self, leg): pass
+    def forward(self, leg): pass
+    def backward(self, leg): pass
+
+# Registry of the experiments, in the order of application
+EXPERIMENTS = []
+
+def register(experiment):
+    """
+    Adds an experiment (subclass of LegExperiment) to the registry.
+    """
+    EXPERIMENTS.append(experiment)
+    return experiment
+
+class ExperimentHooks:
+    """
+    Experiments selected for one leg controller: for each hook the tuple of the
+    hooks of the experiments that implement it (empty for most legs).
+    """
+
+    def __init__(self, leg, settings, controller):
+        """
+        leg is the leg controller, settings the settings module of the controller
+        and controller its name (one of CONTROLLERS).
+        """
+        self.experiments = [experiment(leg, settings, controller) for experiment in EXPERIMENTS
+                            if controller in experiment.controllers and experiment.applies(leg, settings)]
+        for experiment in self.experiments:
+            experiment.setup(leg)
+        for hook in HOOKS:
+            setattr(self, hook, tuple(getattr(experiment, hook) for experiment in self.experiments
+                                      if getattr(type(experiment), hook) is not getattr(LegExperiment, hook)))
+
+    def names(self):
+        return [type(experiment).__name__ for experiment in self.experiments]
+
+    def timed(self, probe):
+        """
+        Wraps the hooks to record their time in the phase experiments of probe (see PhaseProbes).
+        """
+        for hook in HOOKS:
+            setattr(self, hook, tuple(probe.timed("experiments", function) for function in getattr(self, hook)))
+
+##########################
+# Walking modes
+##########################
+
+@register
+class RunningLimits(LegExperiment):
+    """
+    Running: version with hard mechanical limits, CPG is running, but output interrupted.
+    """
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return leg.Run == 1
+
+    def activations(self, leg):
+        if leg.v[8] > 45.: leg.v[1] = 0. # mechanical stop AEP, no influence to CPG
+        if leg.v[8] < 10.: leg.v[21] = 0. # mechanical stop PEP    # alpha
+        if leg.v[48] < 20.: leg.v[61] = 0. # limit Depr           # beta
+        if leg.v[88] > 36.: leg.v[81] = 0. # limit Flexor        # gamma
+
+##########################
+# Experimental settings
+##########################
+
+@register
+class TreadmillFriction(LegExperiment):
+    """
+    "Standing legs in walking insect": leg walking on treadmill.
+    """
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return leg.config.frictW == 1.
+
+    def inputs(self, leg):
+        leg.WE[172][22] = 1.
+        if leg.v[8] > 25. and leg.v[123] > leg.v[122]: #  # front position range during Stance
+            leg.WE[172][22] = 15. # 40. #high load to overcome threshold of 20. strong load due to friction
+
+    def premotor(self, leg):
+        # strong activation of premotor unit, due to friction, should not provid velocities above a given threshold
+        if leg.v[22] > 0.2*leg.vel: leg.v[21] = 0.2*leg.vel
+
+@register
+class Pilocarpine(LegExperiment):
+    """
+    Pilocarpine application (neuro_walknet): CPGs on, legs are deafferented, therefore motor output off.
+    """
+    controllers = ('neuro_walknet',)
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return leg.config.pilo == 1.
+
+    def cpg(self, leg):
+        #  CPGs on if Stance  >  Swing and after 10 ms. For "All legs deafferented" and "Intact walking legs and deafferented legs"
+        if leg.v[123] > leg.v[122] and leg.count >= 10:
+            leg.Iapp[2] = 40.  # pilocarpine  protractor
+            leg.Iapp[22] = 25. # pilocarpine  retractor
+            leg.Iapp[44] = 40.  # pilocarpine levator
+            leg.Iapp[64] = 25.  # pilocarpine depressor
+            leg.Iapp[82] = 50.  # pilocarpine flexor
+            leg.Iapp[102] = 50. # pilocarpine extensor
+            leg.v[123] = 50.  # Stance on
+
+    def activations(self, leg):
+        leg.v[4] = 0.   # inhibits sensory influences via ring net
+        leg.v[24] = 0.  #
+        if reached(leg, 10):
+            leg.v[2] += 2. # disturbance for symmetry breaking
+            leg.v[82] += 2
+
+    def motor(self, leg):
+        leg.alphaHvelout = 0. # CPG
+        leg.betaHvelout = 0. # CPG
+        leg.gammaHvelout = 0. # CPG
+
+@register
+class Pilocarpine2022(LegExperiment):
+    """
+    Pilocarpine application (neuro_walknet_2022): CPGs on, legs are deafferented
+    (unless they receive intraleg input), therefore motor output off.
+    """
+    controllers = ('neuro_walknet_2022',)
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return leg.config.pilo == 1.
+
+    def __init__(self, leg, settings, controller):
+        # new version: intraleg input is now possible, then the leg is not deafferented
+        self.deafferented = not leg.config.intraleg == 1
+
+    def cpg(self, leg):
+        #  CPGs on if Stance  >  Swing and after 10 ms. For "All legs deafferented" and "Intact walking legs and deafferented legs"
+        if leg.v[123] > leg.v[122] and leg.count >= 10:
+            leg.pilo2 =     3. #40. #40. #neu # klass
+            leg.Iapp[22] =  6. #30. #25. #neu # klass  # pilocarpine  retractor
+            leg.Iapp[44] = 13. #8. #15. #40. #neu # klass  # pilocarpine levator
+            leg.Iapp[64] =  3. #6. #30. #25. #neu # klass  # pilocarpine depressor
+            leg.Iapp[82] =  5.#  20. #30. #50. #neu # klass  # pilocarpine flexor
+            leg.Iapp[102] = 5. #30. #50. #neu # klass # pilocarpine extensor
+
+    def activations(self, leg):
+        if self.deafferented: # leg deafferented  L859   #######intraleg  Y3
+            leg.v[4], leg.v[24] = 0., 0.  # = 0.   # inhibits sensory influences via ring net
+            leg.v[45], leg.v[65] = 0., 0.
+            leg.v[84], leg.v[104] = 0., 0.
+            if reached(leg, 12):
+                leg.v[4] += 5.
+                leg.v[64] += 5.
+                leg.v[84] += 5.
+
+    def motor(self, leg):
+        leg.alphaHvelout = 0. # CPG
+        leg.betaHvelout = 0. # CPG
+        leg.gammaHvelout = 0. # CPG
+
+    def forward(self, leg):
+        leg.Iapp[2] = leg.pilo2  # L 1035  ####piloneu
+        # pilocarpine: legs are deafferented, therefore: motor output off L1030
+        leg.alphaHvelout = 0. # CPG
+        leg.betaHvelout = 0. # CPG
+        leg.gammaHvelout = 0. # CPG
+
+@register
+class Disturbance(LegExperiment):
+    """
+    Disturbance of a specific leg during normal walking: prolongation of swing duration.
+    """
+    # Iteration after which the first swing is disturbed
+    start = {'neuro_walknet': 3000, 'neuro_walknet_2022': 5000} #23000:   # example: right hind leg, vel 20
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return leg.config.disturb == 1.
+
+    def __init__(self, leg, settings, controller):
+        self.start = Disturbance.start[controller]
+
+    def outputs(self, leg):
+        if leg.disturbduration > 0.:
+            if leg.disturbstart == 0 and leg.count > self.start:
+                if leg.forward == 1:
+                    if leg.v[122] > leg.v[123] and leg.v[8] > 25.:  # SW > ST
+                        # first swing after leg.count and alpha > 25 (i.e. swing beginn + ca 1000 ms)
+                        leg.countdisturbtime += leg.dt
+                        leg.v[1] = 0.  # protractor stop
+                        leg.v[61] = 0. # depressor stop
+                        leg.disturb = 10.
+                        # or: leg.v[1] += HPF; leg.v[41] += HPF # for levator reflex
+                        if leg.countdisturbtime > leg.disturbduration: leg.disturbstart = 1 # end of disturbance
+                if leg.backward == 1:
+                    if leg.v[122] > leg.v[123] and leg.v[8] < 25.:  # SW > ST  # 1059
+                        # first swing after leg.count and alpha > 25 (i.e. swing beginn + ca 1000 ms)
+                        leg.countdisturbtime += leg.dt
+                        leg.v[21] = 0.  # retractor stop
+                        leg.v[41] = 0. # levator stop
+                        leg.disturb = 10.
+                        # or: leg.v[1] += HPF; leg.v[41] += HPF # for levator reflex
+                        if leg.countdisturbtime > leg.disturbduration: leg.disturbstart = 1 # end of disturbance
+
+@register
+class IntralegStimulation(LegExperiment):
+    """
+    Novel intraleg studies (setting only FR): the leg is fixed, therefore there
+    is no movement from this leg. Stimulus: campaniform sensilla (Akay) or
+    chordotonal organ (Hellekes and Hess).
+    """
+    controllers = ('neuro_walknet_2022',)
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return leg.config.intraleg == 1.
+
+    def __init__(self, leg, settings, controller):
+        self.akay = settings.Akay == 1          # CS
+        self.hellhess = settings.HellHess == 1  # ChO
+        # Waveforms of the stimulus for forward and backward walking (see NeuroWNSettings.stimulus_protocols)
+        #### to Fig 2 - 5: period 6000, stance: 4000, sw 2000
+        #### to Fig 6:  period 10800, stance: 6800, sw 4000
+        #### to Fig 6:  period 3600, stance: 1800, sw 1800
+        #### to Fig  7: period 7000, stance: 4000, sw 3000
+        #### to Figs 7: period 3600, stance: 1800, sw 1800
+        #### gamma  period 3800, ext 1800,  flex 2000  sehr schnell  L1079
+        self.tables = {direction: StimulusProtocols.StimulusTable(protocols, settings.stimulus_cycles, leg.min)
+                       for direction, protocols in settings.stimulus_protocols.items()}
+
+    def sensors(self, leg):
+        leg.Iapp[8] = 35. #20.  #   L 649 #######intraleg ,fix alpha position
+        if leg.v[125] > leg.v[124]: leg.Iapp[8] = 35. # BW
+
+    def outputs(self, leg):
+        leg.v[1],leg.v[21],leg.v[41],leg.v[61],leg.v[81],leg.v[101] = 0.,0.,0.,0.,0.,0. # output FR = 0
+
+    def stance_load(self, leg):
+        leg.Iapp[170] = 0.    #######intraleg, no load input during stance, L1017
+
+    def forward(self, leg):
+        self.stimulate(leg, self.tables["forward"])
+
+    def backward(self, leg):
+        self.stimulate(leg, self.tables["backward"])
+
+    def stimulate(self, leg, table):
+        leg.start = 2. #
+        if leg.count < leg.start:
+            leg.countStim = 0.
+            leg.CS, leg.ChOvel = 0.,0.
+            leg.Iapp[170] = 0.
+            leg.Iapp[171] = 50. # rechanged from 170 to 171
+        if leg.count >= leg.start:    # start Stimulus CS, ChO
+            leg.countStim = leg.count - leg.start
+
+        tick = table.tick(leg.countStim)
+        leg.mod1 = table.phase[tick]
+        leg.period, leg.stim_duration = table.period[tick], table.duration[tick]
+        if not table.active[tick]:
+            return
+        # stimulus on: load on (Iapp[170]), SW off (Iapp[171]); stimulus off: load off, SW on
+        if self.akay:   # CS
+            leg.CS = table.load[tick]
+            leg.Iapp[170] = leg.CS
+            leg.Iapp[171] = table.swing[tick]
+        if self.hellhess:  # ChO, startpos 15 - 35 mV
+            leg.ChOpos = table.ChOpos[tick]
+            if table.on[tick]:
+                leg.Iapp[88] = leg.ChOpos
+            leg.ChOvel = table.load[tick] # elong = flexion
+            leg.Iapp[170] = leg.ChOvel
+            leg.Iapp[171] = table.swing[tick]
+            ##output Hellekes 2, 22, 82, 102  output Hess:  42, 62
+            # graphicoutput f. Hellekes, Hess for illustration only ChOpos, ChOvel
+            # amplitude used here larger than normal step
+
+@register
+class ChordotonalPosition(LegExperiment):
+    """
+    Hellekes and Hess experimental condition: the gamma position input of all
+    legs is given by the chordotonal organ stimulus (ChOpos).
+    """
+    controllers = ('neuro_walknet_2022',)
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return settings.HellHess == 1
+
+    def sensors(self, leg):
+        leg.Iapp[88] = leg.ChOpos   #
+
+@register
+class StandingLeg(LegExperiment):
+    """
+    "Standing legs in walking insect": leg standing on force transducer, leg position fixed.
+    """
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return leg.config.standL == 1
+
+    def inputs(self, leg):
+        leg.WE[172][22] = 2.
+
+    def sensors(self, leg):
+        # Definition of leg position
+        leg.Iapp[8] = leg.config.standLalpha
+        leg.Iapp[48] = leg.config.standLbeta
+        leg.Iapp[88] = leg.config.standLgamma
+
+    def motor(self, leg):
+        # motor output (velocity) = 0
+        leg.alphaHvelout = 0. # alpha joint
+        leg.betaHvelout = 0. # beta joint
+        leg.gammaHvelout = 0. # gamma joint
+        # retractor output shown only if above threshold,
+        #  thr = 7. For Graphics to show strong output only.
+        #  SaxA: 5.8 - 19.2, SaxB: 5.8 - 7.28, SaxC: 6.0 - 8.8, 19.5
+        if leg.v[22] < 7: leg.v[21] = 0.
+
+@register
+class RunningStart(LegExperiment):
+    """
+    Running: activation of depressor premotor neuron to reach sensible starting configuration
+    for all legs, during about the first 500 ms.
+    """
+    # Duration of the activation (iterations)
+    duration = {"front_left_leg": 200, "middle_right_leg": 210, "hind_left_leg": 220,
+                "front_right_leg": 400, "middle_left_leg": 420, "hind_right_leg": 410}
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return leg.Run > 0.5
+
+    def __init__(self, leg, settings, controller):
+        self.duration = RunningStart.duration[leg.config.leg_name]
+
+    def inputs(self, leg):
+        if leg.count < self.duration: leg.v[62] = 10.
+
+@register
+class CurveWalking(LegExperiment):
+    """
+    Curve walking, currently set for one specific example (only detailed experiment):
+    adapted swing set points, local velocities and directions of the legs, and
+    AEP and PEP thresholds of the inner front leg (and a hind leg).
+    The local velocities differentiate the individual legs (from higher control level).
+    This could be replaced in the future through a simple NN that determines these
+    values (it puts the different leg contributions to curve walking into relation -
+    this requires a form of global perspective on the legs and might form a kind of
+    internal model).
+    """
+    # Swing set points (forward): protractor and flexor of the inner (right) and outer (left) front leg
+    swing_protractor = {"front_right_leg": 20., "front_left_leg": 50.}
+    swing_flexor = {"front_right_leg": 20., "front_left_leg": 45.}
+    # Local leg velocity, depends on leg# and on theta # 764
+    vellocal = {"front_right_leg": .75, "middle_right_leg": .35, "hind_right_leg": 0.1,  # Inner legs
+                "front_left_leg": 1., "middle_left_leg": 1., "hind_left_leg": 1.}    # Outer legs
+    # Individual leg direction for stance movements: selected example for theta and leg#,
+    # in box local(theta) and box spatial coding, approximated to Duerr, Ebeling 2005
+    theta = {"front_right_leg": 5.+1., "front_left_leg": -5.*0.4}
+    # Legs with a lower alpha position beyond which load can stop swing
+    aep_load = {'neuro_walknet': {"front_right_leg": 20., "hind_left_leg": 20.},
+                'neuro_walknet_2022': {"front_right_leg": 20., "hind_right_leg": 20.}}   # corr 6.Aug
+
+    @classmethod
+    def applies(cls, leg, settings):
+        return getattr(settings, 'curve_walking', False)
+
+    def __init__(self, leg, settings, controller):
+        self.aep_load = CurveWalking.aep_load[controller]
+
+    def setup(self, leg):
+        name = leg.config.leg_name
+        leg.swing_protractor = self.swing_protractor.get(name, leg.swing_protractor)
+        leg.swing_flexor = self.swing_flexor.get(name, leg.swing_flexor)
+        leg.vellocal = self.vellocal[name]
+        leg.theta = self.theta.get(name, leg.theta)
+        leg.aep_load = self.aep_load.get(name, leg.aep_load)
+        self.inner_front = (name == "front_right_leg")
+
+    def stance_end(self, leg):
+        # inner front leg position threshold
+        if self.inner_front:
+            if (leg.Iapp[8] < leg.config.pep) or (leg.v[88] > 40.):
+                leg.Iapp[171] = 50.   # 171 activates Swing, inhibits stance
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+'''
+Batched computation of the networks of all leg controllers.
+
+The state of the leg networks (activations, inputs, membrane constants,
+filter states and weights) is stacked into arrays with one row per leg
+(legs x neurons, legs x neurons x neurons). The leg controllers keep their
+attributes, but these are views on the rows of the stacked arrays: the input
+and output phases of the legs and the coordination rules are unchanged and
+the visualizations can read the state of the individual legs as before.
+The network phase (synapses, membrane update, band pass filters) is computed
+for all legs at once. Parameters that differ between the legs (membrane
+constants, leak of the swing filter) are per row values; the integration time
+step has to be set in the legs before (NeuroLegMovement.set_time_step).
+Without stacked weights (stack_weights False, e.g. for a population, see
+tools/Population.py) the legs keep their own weight matrices and the network
+phase propagates with the stores given to use_stores.
+'''
+import numpy
+
+from controller.neuro_common import NeuronKernels
+from controller.neuro_common.BandPassFilterBank import BandPassFilterBank
+from controller.neuro_common.SynapseStores import synapse_store
+from controller.neuro_common.CompactNetwork import CompactNetwork
+
+class LegNetworkBatch:
+
+    # Arrays of a leg controller that are moved into the stacked state
+    state_names = ('v', 'vn', 'Iapp', 'Cmem', 'Cmem_step', 'g', 'Sumg', 'Sumgex', 'Sumgin', 'Iself', 'LeakSwing',
+                   'outHPF', 'outHPF2', 'auxHPF', 'auxHPFold')
+    weight_names = ('WE', 'WI')
+
+    def __init__(self, leg_controllers, stack_weights=True):
+        """
+        leg_controllers is the list of NeuroLegMovement objects (missing legs are None),
+        stack_weights whether the weight matrices are stacked as well (otherwise stores
+        of the weights have to be given with use_stores).
+        """
+        self.legs = [leg for leg in leg_controllers if leg]
+        self.Erest = self.legs[0].Erest
+        self.probe = None   # timing of the phases (see PhaseProbes)
+        self.compact_network = None   # network phase on the live neurons only (see compact)
+        for name in self.state_names + (self.weight_names if stack_weights else ()):
+            stacked = numpy.array([getattr(leg, name) for leg in self.legs])
+            setattr(self, name, stacked)
+            for row, leg in enumerate(self.legs):
+                setattr(leg, name, stacked[row])
+        for leg in self.legs:
+            leg.band_pass.bind(leg.auxHPF, leg.auxHPFold, leg.outHPF, leg.outHPF2)
+            if stack_weights and leg.synapses != "dense":
+                leg.WE_store = synapse_store(leg.synapses, leg.WE, leg.dynamic_weights_WE)
+                leg.WI_store = synapse_store(leg.synapses, leg.WI, leg.dynamic_weights_WI)
+        self.band_pass = BandPassFilterBank.stack([leg.band_pass for leg in self.legs],
+                                                  self.auxHPF, self.auxHPFold, self.outHPF, self.outHPF2)
+        self.synapses = self.legs[0].synapses if stack_weights else "stores"
+        if self.synapses not in ("dense", "stores"):
+            # one store for the synapses of all legs (block sparse, resp. compacted with the union of the connected neurons)
+            self.WE_store = synapse_store(self.synapses, self.WE, self.legs[0].dynamic_weights_WE)
+            self.WI_store = synapse_store(self.synapses, self.WI, self.legs[0].dynamic_weights_WI)
+
+    def compact(self):
+        """
+        Dead-neuron elimination for all legs (union of the live neurons, see CompactNetwork).
+        """
+        leg = self.legs[0]
+        self.compact_network = CompactNetwork(self, leg.dynamic_weights_WE, leg.dynamic_weights_WI, leg.external_neurons)
+
+    def use_stores(self, WE_store, WI_store):
+        """
+        Propagate the activations of all legs with the given stores of the stacked
+        weights (e.g. PopulationSynapses), in place of the stores of the settings.
+        """
+        self.WE_store, self.WI_store = WE_store, WI_store
+        self.synapses = "stores"
+
+    def update_networks(self):
+        """
+        Network phase of all legs: same computation as NeuroLegMovement.update_network
+        (vectorized engine), but on the stacked state.
+        """
+        if self.compact_network:
+            self.compact_network.update()
+            return
+        if __debug__:
+            if self.probe: self.probe.start()
+        # piecewise linear synapses
+        numpy.subtract(self.v, self.Erest, out=self.g)
+        numpy.maximum(self.g, 0., out=self.g)
+        numpy.minimum(self.g, 50., out=self.g)
+        if self.synapses != "dense":
+            self.WE_store.dot(self.g, out=self.Sumgex)
+            self.WI_store.dot(self.g, out=self.Sumgin)
+        else:
+            numpy.matmul(self.WE, self.g[..., None], out=self.Sumgex[..., None])
+            numpy.matmul(self.WI, self.g[..., None], out=self.Sumgin[..., None])
+        numpy.minimum(self.Sumgex, 80., out=self.Sumgex)
+        numpy.multiply(self.Sumgin, -1., out=self.Sumgin)
+        numpy.maximum(self.Sumgin, -80., out=self.Sumgin)
+        numpy.add(self.Sumgex, self.Sumgin, out=self.Sumg)
+        if __debug__:
+            if self.probe: self.probe.lap("synapses")
+
+        # simplified Hodgkin Huxley differential equation and band pass filters
+        NeuronKernels.update_membrane(self.v, self.vn, self.Sumg, self.Iapp, self.Cmem_step, self.Erest)
+        if __debug__:
+            if self.probe: self.probe.lap("neurons")
+        self.band_pass.apply(self.vn)
+        if __debug__:
+            if self.probe: self.probe.lap("band_pass")
+        self.v[:] = self.vn
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+'''
+Connections of the leg network of the neuroWalknet controllers.
+
+The wiring of a leg (see article and figure in repository, which include the
+neuron numbers) is given as a list of connections: matrix (excitatory WE or
+inhibitory WI), postsynaptic neuron, presynaptic neuron, weight, and the
+conditions under which the connection is set. The list is shared by both
+controllers (neuro_walknet and neuro_walknet_2022) and is compiled into the
+weight matrices by NetworkCompiler.
+
+    E(target, source, weight, **conditions)   excitatory synapse, WE[target][source]
+    I(target, source, weight, **conditions)   inhibitory synapse, WI[target][source]
+
+The conditions are compared with the parameters of the leg (see
+NetworkCompiler.leg_parameters): the experimental parameters of the leg
+(LegConfiguration, e.g. pilo=1.), the controller (variant), the name of the
+leg (leg) and the running mode (running). A weight given as Scaled(parameter,
+factor) is factor times the value of a parameter of the leg.
+The connections are set in the order of the list, a later connection to the
+same synapse replaces the earlier one.
+'''
+import math
+from collections import namedtuple
+
+# One synapse: matrix ('WE' or 'WI'), target and source neuron, weight (number or Scaled)
+# and conditions ((parameter, value), ...), all have to be met
+Connection = namedtuple('Connection', 'matrix target source weight conditions')
+# Weight depending on a parameter of the leg: factor * value of the parameter
+Scaled = namedtuple('Scaled', 'parameter factor')
+
+def E(target, source, weight, **conditions):
+    return Connection('WE', target, source, weight, tuple(sorted(conditions.items())))
+
+def I(target, source, weight, **conditions):
+    return Connection('WI', target, source, weight, tuple(sorted(conditions.items())))
+
+# Define strength of excitatory weights
+we = 1.
+# Define strength of inhibitory weights
+wi = 1.
+
+LEGS = ("front_left_leg", "front_right_leg", "middle_left_leg", "middle_right_leg", "hind_left_leg", "hind_right_leg")
+
+# For running mode only: specific output strengths for each motor neuron and each leg
+# Pro, Lev, Flex, Ret, Dep, Ext
+RUNNING_MOTOR_WEIGHTS = {
+    "front_left_leg":   (0.23*0.85, 2.3*2, 0.3, 1.2*.57*0.85, 1.33*5., 0.26),
+    "front_right_leg":  (0.35*1.4, 2.8*4, 0.31, 1.8*.55*1.4, 1.4*10, 0.6),
+    "middle_left_leg":  (0.27*1.35, 2.5*4, 0.22, 0.8*.6*1.35*1.5, 1.33*10, .42),
+    "middle_right_leg": (0.22*1.3*1.2, 2.5*4, 0.21, 1.*.55*1.3, 1.33*10, 0.45),
+    "hind_left_leg":    (0.2*1.15, 3.5*1.5, 0.17, 1.1*.6*1.15, 1.4*5, 0.35),
+    "hind_right_leg":   (0.21*1.05, 3.5*1.8, 0.18, 1.1*.6*1.05, 1.33*5, 0.38),
+}
+
+def joint_controller(joint_nr):
+    """
+    General structure of the individual joint controller, repeated for every joint.
+    """
+    j = 40*joint_nr
+    return [
+        #  protractor  1 - 19, levator 41 - 59,  flexor 81 - 99,
+        E(j+1, j+2, we), E(j+2, j+4, we), E(j+3, j+2, 2.),
+        E(j+4, j+5, we), E(j+5, j+7, we),
+        E(j+7, j+10, we),
+        E(j+4, j+11, we),
+        I(j+22, j+3, 5.), I(j+7, j+8, wi),
+        #  retractor  21 - 39, depressor 61 - 79, extensor 101 - 119
+        E(j+21, j+22, we), E(j+22, j+24, we), E(j+23, j+22, 2.),
+        E(j+24, j+25, we), E(j+25, j+27, we),
+        E(j+27, j+30, we),
+        E(j+24, j+31, we),
+        I(j+2, j+23, 5.), I(j+27, j+28, wi),
+    ]
+
+def running_motor_weights():
+    """
+    Output strengths of the motor neurons in running mode (Pro, Lev, Flex, Ret, Dep, Ext).
+    """
+    connections = []
+    for leg in LEGS:
+        for (target, source), weight in zip(((1, 2), (41, 42), (81, 82), (21, 22), (61, 62), (101, 102)),
+                                            RUNNING_MOTOR_WEIGHTS[leg]):
+            connections.append(E(target, source, weight, running=1., leg=leg))
+    return connections
+
+def ring_net():
+    """
+    Ring net (see Fig 10), i: number of unit in Ring net, one unit represents 15 degrees.
+    """
+    connections = []
+    for i in range(13):
+        connections += [E(190, 8, 4./50.),
+                        E(221+i, 201+i, 1.)]
+        if i > 0: connections.append(I(221+i-1, 201+i, 2.))
+        connections += [I(241+i, 221+i, 1.),
+                        I(261+i, 241+i, 20.),
+                        I(281+i, 241+i, 20.),
+                        E(241+i, 120, 1./50.)]
+    for i in range(13):
+        connections += [E(261+i, 260, math.fabs(math.sin(i*3.14/12.))*0.2),   # sin
+                        E(281+i, 260, math.fabs(math.cos(i*3.14/12.))*0.2),   # cos
+                        E(192, 261+i, 1.),  # alpha Retractor
+                        E(191, 261+i, 0.)]  # alpha Protractor
+    # zero position of hind leg is shifted rearwards
+    for i in range(13):
+        connections += [E(261+i, 260, math.fabs(math.sin((i-1)*3.14/12.))*0.2, shiftHl=1),
+                        E(281+i, 260, math.fabs(math.cos((i-1)*3.14/12.))*0.2, shiftHl=1)]
+    connections.append(E(273, 260, 0., shiftHl=1))
+    connections += [E(194, 281+i, 1.) for i in range(7)]       # gamma Extensor
+    connections += [E(193, 281+i, 1.) for i in range(7, 12)]   # gamma Flexor
+    return connections
+
+CONNECTIONS = [
+    #### Weights controlling stance - swing and forward - backward
+    E(121, 122, we), E(122, 121, we), E(121, 123, we), E(123, 121, we),   # WTA net swing - stance
+    E(126, 122, we), E(127, 123, we),   # WTA net swing - stance
+    I(123, 126, 10.), I(122, 127, 10.),   # WTA net swing - stance
+    E(121, 124, we), E(124, 121, we), E(121, 125, we), E(125, 121, we),   # WTA net forward-backward
+    E(133, 124, we), E(132, 125, we),   # WTA net forward-backward
+    I(124, 132, 10.), I(125, 133, 10.),   # WTA net forward-backward
+    E(134, 123, 20.),   # inhibit swing
+    E(135, 122, we),   # inhibit stance
+
+    #### Coordination rules
+    E(120, 121, we),   # bias to coordin rules and short step
+    I(137, 126, wi),   # to coordination rules
+    E(171, 141, we), E(122, 171, we), E(142, 171, we),   # for coordination rules 1 - 3 input
+    E(123, 170, we), E(170, 140, we),   # input to stance
+    I(123, 142, wi),   # input to stance
+    E(155, 122, we),   # rule 1a
+    I(143, 126, 10.),   # rule 1b,, 2i
+    E(143, 143, 0.9999),   # rule 1b 2i
+    E(143, 121, 0.0001),   # rule 1b,2i
+    I(144, 120, 0.004),   # rule 1b, 2i
+    I(144, 162, 1.),   # vel to 1b, 2i
+    E(144, 143, 1.),   # ruli 2i, 1b
+    E(153, 144, 40.),   # rule 1b
+    E(146, 143, 40.),   # rule 1b
+    I(146, 153, 5.),   # rule 1b
+    E(154, 155, 1.), E(158, 155, 1.), E(158, 154, 1.),   # rule 1a-1b
+    E(145, 144, 90.), E(160, 145, 90.),   # rule 2i
+    I(149, 147, 25.),   # rule 3i
+    I(147, 8, wi), E(149, 148, 2.),   # rule 3i
+    I(164, 8, wi),   # rule 3i
+    E(148, 164, 10.),   # rule 3i
+    I(164, 126, 5.), I(147, 126, 5.),   # rule 3i
+    I(156, 8, wi), E(166, 156, 90.),   # rule 2c
+    E(166, 159, 90.),   # rule 2c Backward
+    E(167, 166, we), E(157, 167, 10.),   # rule 2c
+    I(167, 120, 0.18),   # rule 2c
+    I(150, 8, wi), I(165, 8, wi), I(150, 126, 5.), I(165, 126, 5.),   # rule 3c
+    I(152, 168, 80.), I(151, 165, 50.),   # rule 3c
+    E(151, 150, 5.), E(152, 151, 5.),   # rule 3c
+
+    # intraleg studies: switch off rule 1-3 input (legs deaff, therefore no input from other legs,
+    # for Hellekes, see Methods); stimulus 170 inhibits 126 inhibitor of ST
+    E(171, 141, 0., variant="neuro_walknet_2022", intraleg=1.), E(170, 140, 0., variant="neuro_walknet_2022", intraleg=1.),
+    E(171, 141, 0., variant="neuro_walknet_2022", pilo=1.), E(170, 140, 0., variant="neuro_walknet_2022", pilo=1.),
+    I(126, 170, 10., variant="neuro_walknet_2022", intraleg=1.),
+
+    E(169, 180, 1.),   # input to box local(theta)
+    I(137, 169, 1.),
+
+    # Rule 3i
+    E(164, 180, 2.4/4.3),   # 0.56 # rule 3i, input: velocity
+    I(164, 137, 0.25),   # rule 3i, input: 50 - velocity
+    E(147, 180, 0.4/4.3),   # rule 3i, input: velocity
+    I(137, 169, 1.),   # rule 1, 2i, 3i, input: velocity
+    # Rule 2i
+    E(162, 161, 0.75 * 0.04*3./(5.*0.85)),   # 0.021 # rule 1, 2i input: velocity
+    # Rule 2c
+    I(156, 8, 1.), E(159, 8, 1.),   # input: alpha position
+    I(156, 132, 10.), I(159, 133, 10.),   # inhibition during backward, resp. forward
+    # rule 5  retractor-protractor
+    # in:
+    E(179, 173, 1.),   # input from rule 5i
+    E(179, 174, 1.),   # input from rule 5c
+    E(178, 175, 1.),   # input, from rule 5ch
+    E(22, 179, 0.3),   # to retractor
+    E(177, 179, 1.), I(2, 177, 2.),   # to protractor
+    E(176, 178, 1.), I(22, 176, 0.3),   # to retractor
+    E(2, 178, 1.),   # rule 5ch, to protractor
+    I(179, 126, 30.),   # rule 5c, inhibitory input during Swing
+    I(178, 134, 30.),   # inhibition of input during Stance, antiphase influence only during swing
+    E(179, 174, 0., Deaffonly=1.),   # rule 5c input off
+    # leg treated with pilocarpine
+    I(179, 126, 0., pilo=1.),   # rule 5c, inhibitory input during Swing, off
+    I(178, 134, 0., pilo=1.),   # inhibition of input during Stance, off
+    # out:
+    E(172, 22, 1),   # rule 5, output
+    # Rule 5  Levator - Depressor # All legs deafferented
+    # in:
+    E(309, 303, 1.),   # input from rule 5i
+    E(309, 304, 1.),   # input from rule 5c
+    E(308, 305, 1.),   # input, from rule 5ch
+    E(62, 309, 0.3),   # to depressor
+    E(307, 309, 1.), I(42, 307, 2.),   # to levator
+    E(306, 308, 1.), I(62, 306, 0.3),   # to depressor
+    E(42, 308, 1.),   # rule 5ch, to levator
+    I(309, 126, 30.),   # rule 5c, inhibitory input during Swing
+    I(308, 134, 30.),   # inhibition of input during Stance, antiphase influence only during swing
+    E(309, 304, 0., Deaffonly=1.),   # rule 5c input off
+    # leg treated with pilocarpine
+    I(309, 126, 0., pilo=1.),   # rule 5c, inhibitory input during Swing, off
+    I(308, 134, 0., pilo=1.),   # inhibition of input during Stance, off
+    # out:
+    E(302, 62, 1.),   # rule 5, output
+    # required for rule 5 off: Akay, Hess, also for Curve if treated (Hellekes, see Methods),
+    # but not for free curve walking
+    E(62, 309, 0., variant="neuro_walknet_2022", intraleg=1.), E(307, 309, 0., variant="neuro_walknet_2022", intraleg=1.),
+    E(42, 308, 0., variant="neuro_walknet_2022", intraleg=1.), E(306, 308, 0., variant="neuro_walknet_2022", intraleg=1.),
+    E(2, 178, 0., variant="neuro_walknet_2022", intraleg=1.), E(176, 178, 0., variant="neuro_walknet_2022", intraleg=1.),
+    E(177, 179, 0., variant="neuro_walknet_2022", intraleg=1.), E(22, 179, 0., variant="neuro_walknet_2022", intraleg=1.),
+
+    # short steps at PEP
+    E(46, 66, 1.),
+    I(46, 120, 0.9),
+    I(138, 46, 80.),
+
+    # During state "Run", coordination rules 1 - 3 and 5 are not active, due to sensory delay
+    # instead, rule 5 P (Pearson) is activated, sensory input is not required
+    # Rule 5 P weights inhibit levation of neighboring legs during levation of sender leg
+    # Fig 2:  bright-yellow units, pink lines
+    # weights for Rule 5 P (Pearson)
+    E(301, 42, 1.),   # output from levator premotor neuron
+    E(312, 310, 1.),   # input from ipsilateral legs
+    E(312, 311, 1.),   # input from contralateral leg
+    E(318, 312, 1.),
+    I(42, 318, 4.),   # inhibits levator premotor neuron
+    E(63, 312, .2),   # activates inihibitory unit
+    E(319, 312, 5.),
+    E(320, 319, 4.),
+    I(42, 320, 4.),   # inhibits levator premotor neuron
+    E(322, 121, 1.),
+    I(312, 322, 10.), I(322, 321, 5.),   # disinhibiton of rule 5P through Run[321]
+
+    # sensor input off, coactivation on activate CPG
+    I(172, 321, 10.), I(302, 321, 10.),   # rule 5, 5D off
+    I(140, 321, 10.), I(141, 321, 10.),   # rule 1-3 in: off
+    I(4, 321, 10.), I(24, 321, 10.),   # sensory input alpha branch: off
+    I(84, 321, 10.), I(104, 321, 10.),   # sensory input gamma branch: off
+    I(44, 321, 10.), I(64, 321, 10.),   # sensory input beta branch: off
+    E(2, 321, 6./50.), E(22, 321, 4./50.),   # coactivation of premotor units alpha
+    E(82, 321, 2./50.), E(102, 321, 1./50.),   # coactivation of premotor units gamma
+    E(42, 321, 3./50.), E(62, 321, 2./50.),   # coactivation of premotor units beta
+
+    # SRP,  intraleg coupling: from beta to alpha and to gamma
+    E(313, 325, .05), E(314, 313, 1.), E(313, 313, 0.9),
+    E(22, 314, 100.), I(314, 120, .015),   # output to retractor
+    E(315, 325, 1.), E(316, 314, 1.), I(315, 316, 20.),
+    E(317, 324, 20.), E(102, 324, 20),   # output to extensor
+    E(82, 325, 20.), E(2, 317, 3.), E(2, 315, 20.),   # output to flexor, protractor
+    E(324, 42, 1.), E(325, 62, 1.),   # input from levator, depressor
+    I(324, 326, 10.), I(325, 326, 10.),
+    I(326, 321, 10.), E(326, 121, 1.),   # disinhibition through Run[321]
+
+    # Intact walking legs and deafferented legs, Standing legs in walking insect
+    E(172, 22, 2., standL=1.),   # leg standing on force transducer
+] + joint_controller(0) + joint_controller(1) + joint_controller(2) + running_motor_weights() + [
+    # control swing - stance branches, input from WTA net Swing - Stance
+    E(10, 13, we), E(10, 14, we),   # input set points, swing, protractor
+    I(11, 135, wi),   # inhibit stance, protractor
+    I(31, 135, wi),   # inhibit stance, retractor
+    E(30, 33, we), E(30, 34, we),   # input set points, swing, retractor
+    E(90, 93, we), E(90, 94, we),   # input set points, swing, flexor
+    I(91, 135, wi),   # inhibit stance, flexor
+    I(111, 135, wi),   # inhibit stance, extensor
+    E(110, 113, we), E(110, 114, we),   # input set points, swing, extensor
+
+    #  swing branch protractor, retractor, flexor, extensor,
+    E(6, 7, 100.), E(4, 6, 0.2),
+    E(86, 87, 100.), E(84, 86, 0.2),
+    E(26, 27, 100.), E(24, 26, 0.2),
+    E(106, 107, 100.), E(104, 106, 0.2),
+    I(7, 134, 10.), I(87, 134, 10.),   # inhibit stance, protractor, flexor
+    I(27, 134, 10.), I(107, 134, 10.),   # inhibit stance, retractor, extensor
+
+    #   Connections from Ring net to set points
+    E(11, 15, we), E(11, 36, we),
+    E(31, 35, we), E(31, 16, we),
+    E(15, 191, we), E(16, 191, we),
+    E(35, 192, we), E(36, 192, we),
+
+    # control of set points by forward, backward for alpha joint and gamma joint
+    I(13, 132, 10.), I(14, 133, 10.), I(33, 132, 10.), I(34, 133, 10.),
+    I(93, 132, 10.), I(94, 133, 10.), I(113, 132, 10.), I(114, 133, 10.),
+
+    # control of ring input by forward, backward for alpha joint and gamma joint
+    I(15, 132, 10.), I(36, 133, 10.), I(35, 132, 10.), I(16, 133, 10.),
+    I(95, 132, 10.), I(116, 133, 10.), I(115, 132, 10.), I(96, 133, 10.),
+    E(95, 193, we), E(96, 193, we),
+    E(115, 194, we), E(116, 194, we),
+    E(91, 95, we), E(91, 116, we),
+    E(111, 115, we), E(111, 96, we),
+] + ring_net() + [
+    # Motor weights for lat. inhibition for alpha joint, beta joint and gamma joint
+    # are overwritten here to influence CPG frequency
+    E(3, 2, Scaled('CPGfrequ', 2.)), E(23, 22, Scaled('CPGfrequ', 2.)),   # alpha joint, for test CPG different frequencies per leg
+    E(43, 42, 2.), E(63, 62, 2.),   # beta joint
+    E(83, 82, 0.5), E(103, 102, 0.5),   # gamma joint
+
+    #################
+    # Control of beta joint: Height net
+    E(53, 54, we), E(78, 54, we),
+    E(50, 58, we), E(70, 78, we),
+    E(79, 58, we), E(58, 55, we), E(58, 59, we),
+    I(59, 53, wi), I(78, 79, wi), I(59, 122, wi), I(55, 123, wi),
+
+    # HPF Swing lift
+    E(138, 122, we), E(139, 138, we),   # HPF for Swing levator
+    E(45, 138, Scaled('SwingWeight', 0.4)),   # swing lift amplitude
+    I(65, 139, 10.),   # swing lift to depressor
+    E(104, 138, 3.),   # swing lift to extensor
+]
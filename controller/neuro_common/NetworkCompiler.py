@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+'''
+Compiler of the connection lists of the leg networks (see LegNetworkDefinition)
+into the weight matrices WE and WI.
+
+Most connections are the same for all legs and settings (static). They are
+compiled once into the two matrices, which are cached on disk in
+NETWORK_CACHE, keyed by the hash of the static connections and the size of the
+network. A leg controller maps the cached matrices into memory (copy on write,
+so the legs share the unchanged pages and each leg can change its own weights)
+and sets the connections that depend on the parameters of its leg (conditions,
+scaled weights) on top: startup of a controller is a memory map plus the
+per-leg overrides. Without cache (NETWORK_CACHE None, or a read only file
+system) the static connections are compiled for each leg.
+'''
+import os, hashlib, tempfile
+import numpy
+
+## Directory of the compiled weight matrices, None to compile them for each leg.
+NETWORK_CACHE = os.path.join(tempfile.gettempdir(), "neuro_walknet_network_cache")
+
+# Connection lists split into static connections and overrides (by id of the list)
+_compiled = {}
+
+def leg_parameters(config, **parameters):
+    """
+    Parameters of a leg for the conditions and scaled weights of the connections:
+    the experimental parameters of the leg (LegConfiguration, missing ones are None)
+    and the given parameters (e.g. variant, leg, running).
+    """
+    values = {name: getattr(config, name, None) for name in config.parameters}
+    values.update(parameters)
+    return values
+
+def split(connections):
+    """
+    Static connections and overrides of a connection list, and the hash of the static connections.
+    An override has conditions or a scaled weight, it is set after all static connections,
+    therefore no static connection may follow an override of the same synapse.
+    """
+    if id(connections) not in _compiled:
+        static, overrides, overridden = [], [], set()
+        for connection in connections:
+            synapse = (connection.matrix, connection.target, connection.source)
+            if connection.conditions or not isinstance(connection.weight, (int, float)):
+                overrides.append(connection)
+                overridden.add(synapse)
+            elif synapse in overridden:
+                raise Exception("Static connection %s[%d][%d] after an override of the same synapse" % synapse)
+            else:
+                static.append((connection.matrix, connection.target, connection.source, float(connection.weight)))
+        key = hashlib.sha1(repr(static).encode()).hexdigest()
+        _compiled[id(connections)] = (connections, static, overrides, key)
+    return _compiled[id(connections)][1:]
+
+def override_weight(connection, parameters):
+    """
+    Weight of an override for the parameters of a leg, None if its conditions do not hold.
+    """
+    if not all(parameters.get(name) == value for name, value in connection.conditions):
+        return None
+    weight = connection.weight
+    if not isinstance(weight, (int, float)):
+        weight = weight.factor * parameters[weight.parameter]
+    return weight
+
+def override_synapses(connections, matrix):
+    """
+    (target, source) of the synapses of a weight matrix ('WE' or 'WI') that depend on
+    the parameters of a leg (overrides): all other weights are the same in all legs.
+    """
+    _, overrides, _ = split(connections)
+    return sorted({(connection.target, connection.source) for connection in overrides if connection.matrix == matrix})
+
+def synapse_weights(connections, matrix, synapses, parameters):
+    """
+    Weights of the given synapses (list of (target, source)) of a weight matrix ('WE' or 'WI')
+    of a leg, as compiled by compile_network, without the matrices.
+    """
+    static, overrides, _ = split(connections)
+    weights = {(target, source): weight for name, target, source, weight in static if name == matrix}
+    for connection in overrides:
+        weight = override_weight(connection, parameters) if connection.matrix == matrix else None
+        if weight is not None:
+            weights[connection.target, connection.source] = weight
+    return [weights.get(synapse, 0.) for synapse in synapses]
+
+def compile_static(static, n):
+    """
+    Weight matrices (2 x n x n: WE, WI) of the static connections.
+    """
+    weights = numpy.zeros((2, n, n))
+    for matrix, target, source, weight in static:
+        weights[0 if matrix == 'WE' else 1, target, source] = weight
+    return weights
+
+def load_static(static, key, n):
+    """
+    Weight matrices of the static connections from the cache (copy on write memory map),
+    compiled and written to the cache first if necessary.
+    """
+    if NETWORK_CACHE is None:
+        return compile_static(static, n)
+    filename = os.path.join(NETWORK_CACHE, "%s_%d.npy" % (key, n))
+    if os.path.exists(filename):
+        try:
+            return numpy.load(filename, mmap_mode='c')
+        except (OSError, ValueError):
+            pass  # incomplete file, compiled and written again
+    weights = compile_static(static, n)
+    # written under a temporary name, so that parallel runs never read an incomplete file
+    try:
+        os.makedirs(NETWORK_CACHE, exist_ok=True)
+        temporary = "%s.%d.tmp" % (filename, os.getpid())
+        with open(temporary, "wb") as cache_file:
+            numpy.save(cache_file, weights)
+        os.replace(temporary, filename)
+    except OSError:
+        pass  # no cache (e.g. read only file system)
+    return weights
+
+def compile_network(connections, n, parameters):
+    """
+    Weight matrices WE and WI (n x n) of a leg for the connection list,
+    parameters are those of the leg (see leg_parameters).
+    """
+    static, overrides, key = split(connections)
+    weights = load_static(static, key, n)
+    # plain arrays (views on the memory map)
+    WE, WI = numpy.asarray(weights[0]), numpy.asarray(weights[1])
+    for connection in overrides:
+        weight = override_weight(connection, parameters)
+        if weight is not None:
+            (WE if connection.matrix == 'WE' else WI)[connection.target, connection.source] = weight
+    return WE, WI
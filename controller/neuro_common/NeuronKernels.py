@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+'''
+Whole-array kernels for the neurons of the neuroWalknet leg networks.
+
+The kernels are shared by both controllers (neuro_walknet and neuro_walknet_2022)
+and act on the last axis of the given arrays, i.e. on the neurons of a leg network.
+'''
+import numpy
+
+# Units that are limited from above directly after the membrane update
+# (neuron number, upper limit in mV)
+OUTPUT_CLIPS = ((152, 25.),   # clip 3c output
+                (157, 30.))   # clip 2c output
+
+# Arrays of the state and the weights of a leg network, of the numeric type
+# given in the settings (dtype, see NeuroLegMovement)
+STATE_ARRAYS = ('v', 'vn', 'Iapp', 'Cmem', 'g', 'Sumg', 'Sumgex', 'Sumgin', 'Iself', 'LeakSwing',
+                'outHPF', 'outHPF2', 'auxHPF', 'auxHPFold', 'WE', 'WI')
+
+# Integrators of the membrane equation, see membrane_constants
+INTEGRATORS = ("euler", "exponential")
+
+_upper_limits = {}
+
+def upper_limits(shape, dtype=float):
+    """
+    Upper limits of OUTPUT_CLIPS for activations of the given shape (and numeric type)
+    as one array (infinite for the units without a limit), created once for each shape.
+    """
+    key = (shape, numpy.dtype(dtype))
+    if key not in _upper_limits:
+        limits = numpy.full(shape, numpy.inf, dtype=dtype)
+        for neuron, limit in OUTPUT_CLIPS:
+            limits[..., neuron] = limit
+        limits.flags.writeable = False
+        _upper_limits[key] = limits
+    return _upper_limits[key]
+
+def membrane_constants(Cmem, dt=1., integrator="euler"):
+    """
+    Membrane constants for an integration time step of dt ms, to be used in
+    update_membrane in place of Cmem (tau = Cmem ms).
+
+    "euler": forward Euler step, Cmem/dt (Cmem itself for the original 1 ms step,
+        the results are identical). Unstable for time steps above 2*Cmem.
+    "exponential": exponential Euler step, exact for inputs that are constant during
+        the step: the voltage decays towards Erest + Sumg + Iapp with the decay factor
+        of dt original steps, (1 - 1/Cmem)**dt, i.e. vn = v + (Erest - v + Sumg + Iapp)
+        * (1 - (1 - 1/Cmem)**dt). Same trajectories as "euler" for dt = 1 (up to rounding
+        errors), stable for all time steps.
+    """
+    if integrator == "euler":
+        return Cmem / dt
+    if integrator == "exponential":
+        return 1. / -numpy.expm1(dt * numpy.log1p(-1. / Cmem))
+    raise Exception("Unknown integrator '" + str(integrator) + "' (one of " + ", ".join(INTEGRATORS) + ")")
+
+def update_membrane(v, vn, Sumg, Iapp, Cmem, Erest, limits=None):
+    """
+    Simplified Hodgkin Huxley differential equation applied to all neurons at once.
+
+    Computes the new voltage vn = v + (Erest - v + Sumg + Iapp)/Cmem (exc, mV, ms),
+    rectifies it at 0 mV and applies the upper limits given in OUTPUT_CLIPS.
+    The floating point operations are done in the same order as in the loop
+    over the individual neurons, therefore the results are identical.
+
+    Parameters
+    ----------
+    v : numpy.ndarray
+        Current voltage of the neurons (not changed).
+    vn : numpy.ndarray
+        Output array for the new voltage of the neurons.
+    Sumg : numpy.ndarray
+        Sum of synaptic input.
+    Iapp : numpy.ndarray
+        External input.
+    Cmem : numpy.ndarray
+        Membrane constants (of the integration time step, see membrane_constants).
+    Erest : float
+        Resting potential.
+    limits : numpy.ndarray, optional
+        Upper limits of the units (default: OUTPUT_CLIPS, see upper_limits),
+        given for activations with another numbering (see CompactNetwork).
+    """
+    numpy.subtract(Erest, v, out=vn)  # Iself
+    vn += Sumg
+    vn += Iapp
+    vn /= Cmem
+    vn += v
+    numpy.maximum(vn, 0., out=vn)
+    # one pass over all units instead of single elements (no temporary arrays)
+    numpy.minimum(vn, upper_limits(vn.shape, vn.dtype) if limits is None else limits, out=vn)
+    return vn
+
+def limit_activations(v, lower=0., upper=50.):
+    """
+    Lower and upper limits for the activation of all units (in place).
+    """
+    numpy.maximum(v, lower, out=v)
+    return numpy.minimum(v, upper, out=v)
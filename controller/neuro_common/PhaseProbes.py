@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+'''
+Timing probes of the phases of the leg network update.
+
+The update of a leg controller is divided into named phases: inputs (input
+encoding), synapses (propagation through the weights), neurons (membrane
+update), band_pass (band pass filters), outputs (activation limits and
+disturbances), motor (summation of the motor outputs), switching (swing and
+stance switching, load signals) and experiments (hooks of the experimental
+conditions, see LegExperiments).
+The coordination rules and, with the batched engine, the network phase of
+all legs are probed as owners of their own.
+
+Each owner (leg controller, batch, coordination rules) gets a Probe. The
+code marks the start of a measured section (start) and the end of each phase
+(lap): the time since the previous mark is added to the phase. The
+experiment hooks are wrapped (timed) and their time is taken out of the
+enclosing phase. The probe points are written as
+
+    if __debug__:
+        if self.probe: self.probe.lap("synapses")
+
+so they are removed by the compiler under python -O and cost one attribute
+test when the probes are off (setting phase_probes).
+'''
+import time
+
+class Probe:
+    """
+    Cumulative time (nanoseconds) and number of calls of the phases of one owner.
+    """
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.phases = {}   # phase: [calls, time]
+        self.clock = time.perf_counter_ns
+        self.mark = 0
+        self.excluded = 0
+
+    def start(self):
+        self.mark = self.clock()
+        self.excluded = 0
+
+    def lap(self, phase):
+        """
+        End of a phase: the time since the previous mark (without the timed hooks in between).
+        """
+        now = self.clock()
+        self.record(phase, now - self.mark - self.excluded)
+        self.mark = now
+        self.excluded = 0
+
+    def record(self, phase, duration):
+        entry = self.phases.get(phase)
+        if entry is None:
+            entry = self.phases[phase] = [0, 0]
+        entry[0] += 1
+        entry[1] += duration
+
+    def timed(self, phase, function):
+        """
+        function wrapped to add its time to phase (and exclude it from the enclosing phase).
+        """
+        def probed(*args):
+            start = self.clock()
+            function(*args)
+            duration = self.clock() - start
+            self.record(phase, duration)
+            self.excluded += duration
+        return probed
+
+class PhaseProbes:
+    """
+    Probes of the owners of a controller and the report over all of them.
+    """
+
+    def __init__(self):
+        self.probes = {}
+
+    def probe(self, owner):
+        if owner not in self.probes:
+            self.probes[owner] = Probe(owner)
+        return self.probes[owner]
+
+    def totals(self):
+        """
+        Phases summed over the owners, ranked by time: list of (phase, calls, time, {owner: time}).
+        """
+        phases = {}
+        for owner, probe in self.probes.items():
+            for phase, (calls, duration) in probe.phases.items():
+                entry = phases.setdefault(phase, [0, 0, {}])
+                entry[0] += calls
+                entry[1] += duration
+                entry[2][owner] = duration
+        return sorted(((phase, calls, duration, owners) for phase, (calls, duration, owners) in phases.items()),
+                      key=lambda row: -row[2])
+
+    def report(self):
+        """
+        Table of the phases ranked by their time over all legs and the coordination rules.
+        """
+        rows = self.totals()
+        total = sum(duration for _, _, duration, _ in rows) or 1
+        owners = list(self.probes)
+        lines = ["%-12s %10s %6s %10s %10s  %s" % ("phase", "total [ms]", "share", "calls", "mean [us]",
+                 " ".join("%9s" % owner.replace("controller_", "") for owner in owners))]
+        for phase, calls, duration, by_owner in rows:
+            lines.append("%-12s %10.1f %5.1f%% %10d %10.2f  %s" % (phase, duration * 1e-6, 100. * duration / total,
+                         calls, duration * 1e-3 / calls,
+                         " ".join("%9.1f" % (by_owner[owner] * 1e-6) if owner in by_owner else "%9s" % "-"
+                                  for owner in owners)))
+        return "\n".join(lines)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+'''
+Store of the synaptic weights of a population of controllers (tools/Population.py).
+
+In a population the leg networks of many individuals are stacked (individuals
+x legs x neurons). The weight matrices of a leg are the same in all
+individuals, apart from the weights that change during walking (dynamic
+weights) and the weights that depend on the parameters of a leg or an
+individual (varying weights, the overrides of the connection list, e.g.
+CPGfrequ, see NetworkCompiler). Stacked per leg network (as in
+LegNetworkBatch), the population would hold and read the full weight
+matrices of every individual.
+
+This store keeps one shared matrix per leg (rows of the neurons with
+synaptic input, as in CompactSynapses) without the varying and dynamic
+weights, and of each individual only these weights (individuals x legs x
+varying). The activations of all individuals are propagated with one matrix
+product per leg (individuals x neurons times neurons x targets), the
+contributions of the varying weights are added on top. The leg controllers
+keep their own matrices (copy on write maps of the compiled network, see
+NetworkCompiler, which share the unchanged pages): the dynamic weights are
+read from them in each step, the varying weights are given (e.g. from the
+connection list, NetworkCompiler.synapse_weights) or read from them when the
+store is built.
+The summation order differs from the dense product, deviations are in the
+range of rounding errors (as in SparseSynapses).
+'''
+import numpy
+
+class PopulationSynapses:
+
+    def __init__(self, matrices, varying=(), dynamic=(), var_weights=None):
+        """
+        matrices are the dense weight matrices of the leg controllers of the population
+        (list of the individuals, each with the list of the matrices of its legs, shared,
+        not copied), varying a list of (row, column) of the weights that depend on the
+        parameters, dynamic a list of (row, column) of weights that change during walking,
+        var_weights the weights of varying in the legs (individuals x legs x varying, None:
+        read from the matrices). All other weights have to be the same in the matrices of
+        a leg in all individuals.
+        """
+        self.matrices = [list(legs) for legs in matrices]
+        self.given_weights = var_weights
+        self.individuals, self.legs = len(self.matrices), len(self.matrices[0])
+        self.n = self.matrices[0][0].shape[-1]
+        self.dtype = self.matrices[0][0].dtype
+        self.dynamic = list(dynamic)
+        self.varying = list(varying) + [synapse for synapse in self.dynamic if synapse not in varying]
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Collect the shared and the varying weights from the dense matrices.
+        Has to be called again when a static weight is changed after construction.
+        """
+        n, varying = self.n, self.varying
+        self.var_rows = numpy.array([row for row, _ in varying], dtype=numpy.intp)
+        self.var_cols = numpy.array([col for _, col in varying], dtype=numpy.intp)
+        # shared matrices of the legs (from the first individual) without the varying weights
+        shared = numpy.array(self.matrices[0])   # legs x n x n
+        shared[:, self.var_rows, self.var_cols] = 0.
+        connected = (shared != 0.).any(axis=(0, 2))
+        connected[self.var_rows] = True
+        self.targets = numpy.flatnonzero(connected)
+        # neurons x targets for each leg: product with the activations of all individuals
+        self.shared = numpy.ascontiguousarray(shared[:, self.targets].transpose(0, 2, 1))
+        # varying weights of each individual (individuals x legs x varying)
+        blocks = numpy.arange(self.individuals*self.legs).reshape(self.individuals, self.legs, 1)
+        self.var_weights = numpy.zeros((self.individuals, self.legs, len(varying)), dtype=self.dtype)
+        self.var_input = numpy.zeros(self.var_weights.shape, dtype=self.dtype)
+        if self.given_weights is not None:
+            # given for the synapses of varying, the dynamic weights are read in each step
+            self.var_weights[..., :numpy.shape(self.given_weights)[-1]] = self.given_weights
+        else:
+            var_flat = self.var_rows*n + self.var_cols
+            for individual, legs in enumerate(self.matrices):
+                for leg, W in enumerate(legs):
+                    W.take(var_flat, out=self.var_weights[individual, leg], mode='clip')
+        # dynamic weights: positions in the dense matrices and in the varying weights
+        self.dyn_flat = numpy.array([row*n + col for row, col in self.dynamic], dtype=numpy.intp)
+        positions = numpy.array([varying.index(synapse) for synapse in self.dynamic], dtype=numpy.intp)
+        self.dyn_var_flat = (blocks*len(varying) + positions).ravel()
+        self.dyn_weights = numpy.zeros((self.individuals, self.legs, len(self.dynamic)), dtype=self.dtype)
+        self.dyn_sources = [(W, self.dyn_weights[individual, leg]) for individual, legs in enumerate(self.matrices)
+                            for leg, W in enumerate(legs)]
+        # positions of the varying contributions in the flattened result
+        self.var_targets = (blocks*n + self.var_rows).ravel()
+        self.unconnected = numpy.flatnonzero(~connected)
+        # buffers: activations leg by leg (legs x individuals x n) and the sums (legs x individuals x targets)
+        self.activations = numpy.zeros((self.legs, self.individuals, n), dtype=self.dtype)
+        self.sums = numpy.zeros((self.legs, self.individuals, len(self.targets)), dtype=self.dtype)
+
+    def dot(self, g, out=None):
+        """
+        Synaptic input W.dot(g) of all neurons of the population (g stacked as
+        individuals x legs x n, or flattened to (individuals*legs) x n),
+        written to out (contiguous, same shape as g) if given.
+        """
+        if out is None:
+            out = numpy.empty(g.shape, dtype=self.dtype)
+        stacked = g.reshape((self.individuals, self.legs, self.n))
+        result = out.reshape((self.individuals, self.legs, self.n))
+        numpy.copyto(self.activations, stacked.transpose(1, 0, 2))
+        numpy.matmul(self.activations, self.shared, out=self.sums)
+        result[:, :, self.targets] = self.sums.transpose(1, 0, 2)
+        result[:, :, self.unconnected] = 0.
+        # varying weights of the individuals, with the current dynamic weights of the legs
+        for W, weights in self.dyn_sources:
+            W.take(self.dyn_flat, out=weights, mode='clip')
+        numpy.put(self.var_weights, self.dyn_var_flat, self.dyn_weights)
+        numpy.take(stacked, self.var_cols, axis=2, out=self.var_input, mode='clip')
+        numpy.multiply(self.var_weights, self.var_input, out=self.var_input)
+        numpy.add.at(result.reshape(-1), self.var_targets, self.var_input.ravel())
+        return out
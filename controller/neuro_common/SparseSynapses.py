@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+'''
+Sparse store of the synaptic weights of a leg network.
+
+The weight matrices WE and WI of a leg are built dense (n x n), but only a few
+hundred of the entries are non-zero. The store keeps the non-zero weights in
+row order (as in CSR) and computes the synaptic input with costs proportional
+to the number of synapses instead of n*n.
+The dense matrix stays the reference: weights that are rewritten by the leg
+controller during walking (dynamic weights) are read from it in each step.
+Stacked weight matrices (legs x n x n) are handled as one block diagonal matrix.
+'''
+import numpy
+
+class SparseSynapses:
+
+    def __init__(self, W, dynamic=()):
+        """
+        W is the finished dense weight matrix (shared, not copied) or a stack of these,
+        dynamic a list of (row, column) of weights that change during walking.
+        """
+        self.W = W
+        self.n = W.shape[-1]
+        self.dynamic = list(dynamic)
+        self.dyn_rows = numpy.array([row for row, _ in dynamic], dtype=numpy.intp)
+        self.dyn_cols = numpy.array([col for _, col in dynamic], dtype=numpy.intp)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Collect the static synapses from the dense matrix.
+        Has to be called again when a static weight is changed after construction.
+        """
+        blocks = self.W.reshape((-1, self.n, self.n))
+        static = (blocks != 0.)
+        static[:, self.dyn_rows, self.dyn_cols] = False
+        block, rows, cols = numpy.nonzero(static)   # row major, i.e. in CSR order
+        offset = numpy.arange(len(blocks))[:, None] * self.n  # of the blocks in the block diagonal matrix
+        self.n_static = len(rows)
+        self.rows = numpy.concatenate((block*self.n + rows, (offset + self.dyn_rows).ravel()))
+        self.cols = numpy.concatenate((block*self.n + cols, (offset + self.dyn_cols).ravel()))
+        self.weights = numpy.concatenate((blocks[block, rows, cols], blocks[:, self.dyn_rows, self.dyn_cols].ravel()))
+        # positions of the dynamic weights in the flattened dense matrix
+        self.dyn_flat = ((offset + self.dyn_rows)*self.n + self.dyn_cols).ravel()
+        self.gathered = numpy.zeros(len(self.rows), dtype=self.W.dtype)
+        self.products = numpy.zeros(len(self.rows), dtype=self.W.dtype)
+        self.size = len(blocks)*self.n
+
+    def dot(self, g, out=None):
+        """
+        Synaptic input W.dot(g) of all neurons (g stacked like W),
+        written to out if given. The gathers and products use the buffers
+        of the store, only the row sums (numpy.bincount) are a new array.
+        """
+        # fast path for the dynamic weights: only these are updated from the dense matrix
+        numpy.take(self.W, self.dyn_flat, out=self.weights[self.n_static:], mode='clip')
+        numpy.take(g, self.cols, out=self.gathered, mode='clip')
+        numpy.multiply(self.weights, self.gathered, out=self.products)
+        sums = numpy.bincount(self.rows, weights=self.products, minlength=self.size).reshape(g.shape)
+        if out is None:
+            return sums
+        out[...] = sums
+        return out
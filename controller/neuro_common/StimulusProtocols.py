@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+'''
+Stimulus protocols of the intraleg studies (Akay et al., Hellekes et al. and Hess).
+
+A protocol is a periodic stimulus given by its period and the duration of the
+stimulus within the period (in ms, one network iteration per ms). During the
+stimulus the load input (Iapp[170], campaniform sensilla CS or chordotonal
+organ velocity ChOvel) is on and the swing input (Iapp[171]) is off; the
+chordotonal organ position ChOpos rises from its minimum to minimum + 20 and
+falls back during the rest of the period.
+
+StimulusTable generates these waveforms once for a sequence of protocols
+(each applied for a number of periods, the sequence is repeated), so that
+several periods and duty cycles can be studied in one run. The leg controller
+only indexes into the tables with the time since the start of the stimulus.
+'''
+import argparse
+import numpy
+
+# Amplitudes of the stimulus (inputs of the network) and of the position ramp of the ChO
+LOAD_ON = 50.
+SWING_OFF = 50.
+RAMP = 20.
+
+def parse_protocol(text):
+    """
+    Protocol given as PERIOD:DUTY (period in ms, duty cycle as fraction of the period,
+    e.g. 3600:0.5), returns (period, duration) in ms.
+    Used as type of a command line argument: invalid protocols raise an
+    argparse.ArgumentTypeError (reported as usage error).
+    """
+    try:
+        period, duty = (float(value) for value in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("stimulus protocol '" + text + "' is not of the form PERIOD:DUTY (e.g. 3600:0.5)")
+    if not (period > 0 and period.is_integer()):
+        raise argparse.ArgumentTypeError("stimulus protocol '" + text + "': the period has to be a positive integer number of ms")
+    if not 0 < duty <= 1:
+        raise argparse.ArgumentTypeError("stimulus protocol '" + text + "': the duty cycle has to be in (0, 1]")
+    duration = float(round(period * duty))
+    if duration < 1:
+        raise argparse.ArgumentTypeError("stimulus protocol '" + text + "': the stimulus is shorter than 1 ms")
+    return period, duration
+
+class StimulusTable:
+    """
+    Waveforms of a sequence of stimulus protocols, one entry per millisecond.
+
+    For the time tick since the start of the stimulus, the entries are:
+    phase (time within the period, mod1), period, duration, active (the inputs
+    are set; not at the first tick of a period, as in the original protocol),
+    on (stimulus on), load (Iapp[170], CS, ChOvel), swing (Iapp[171]) and ChOpos.
+    """
+
+    def __init__(self, protocols, cycles=1, minimum=0.):
+        """
+        protocols is a list of (period, duration) in ms, each of them is applied for
+        cycles periods (a duration of the whole period is a permanent stimulus);
+        minimum is the start position of the ChO ramp.
+        """
+        if not protocols:
+            raise Exception("No stimulus protocol given")
+        phase, period, duration = [], [], []
+        for protocol_period, protocol_duration in protocols:
+            if protocol_period != int(protocol_period) or not 0 < protocol_duration <= protocol_period:
+                raise Exception("Invalid stimulus protocol: period %s, duration %s (an integer period in ms "
+                                "and a duration between 0 and the period are required)" % (protocol_period, protocol_duration))
+            ticks = int(protocol_period) * cycles
+            phase.append(numpy.arange(ticks, dtype=float) % protocol_period)
+            period.append(numpy.full(ticks, float(protocol_period)))
+            duration.append(numpy.full(ticks, float(protocol_duration)))
+        phase, period, duration = numpy.concatenate(phase), numpy.concatenate(period), numpy.concatenate(duration)
+
+        active = phase > 0
+        on = active & (phase < duration)
+        # ChO position: ramp up during the stimulus, ramp down during the rest of the period (if any)
+        rest = period - duration
+        falling = numpy.divide(phase - duration, rest, out=numpy.zeros_like(phase), where=rest > 0)
+        position = numpy.where(on, RAMP * (phase / duration) + minimum, RAMP - RAMP * falling + minimum)
+
+        self.protocols = list(protocols)
+        self.length = len(phase)
+        # lists of floats: indexing gives plain Python values for the network inputs
+        self.phase = phase.tolist()
+        self.period = period.tolist()
+        self.duration = duration.tolist()
+        self.active = active.tolist()
+        self.on = on.tolist()
+        self.load = numpy.where(on, LOAD_ON, 0.).tolist()
+        self.swing = numpy.where(on, 0., SWING_OFF).tolist()
+        self.ChOpos = position.tolist()
+
+    def tick(self, time):
+        """
+        Index of the tables for the time (ms) since the start of the stimulus.
+        """
+        return int(time) % self.length
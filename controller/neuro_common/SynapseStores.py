@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+'''
+Stores of the synaptic weights of the leg networks (setting synapses in NeuroWNSettings).
+
+"dense" uses the weight matrices WE and WI directly, the other stores keep
+them as reference and compute the synaptic input with the same interface
+(store.dot(g, out)).
+'''
+from controller.neuro_common.SparseSynapses import SparseSynapses
+from controller.neuro_common.CompactSynapses import CompactSynapses
+from controller.neuro_common.ActiveSynapses import ActiveSynapses
+
+STORES = {"sparse": SparseSynapses, "compact": CompactSynapses, "active": ActiveSynapses}
+
+def synapse_store(kind, W, dynamic=()):
+    """
+    Store of the given kind for the finished weight matrix W (or a stack of these),
+    dynamic is the list of (row, column) of weights that change during walking.
+    """
+    if kind not in STORES:
+        raise Exception("Unknown store of the synaptic weights: " + kind + " (dense, " + ", ".join(STORES) + ")")
+    return STORES[kind](W, dynamic)
@@ -12,6 +12,63 @@ walking_modes = {"forward" : 1, "backward" : 2, "running" : 3}
 w_mode = walking_modes["forward"]
 velocity = 30
 
+###########################
+# Computation of the neural networks
+###########################
+# engine: implementation of the membrane update of the leg networks
+#   "scalar": loop over the individual neurons (original reference version)
+#   "vectorized": numpy whole-array update, same trajectories as "scalar"
+#   "batched": as "vectorized", but the networks of all six legs are stacked
+#              and computed at once
+engine = "vectorized"
+# synapses: storage of the synaptic weights for the propagation of activations
+#   "dense": n x n weight matrices WE and WI
+#   "compact": only the rows of the neurons with synaptic input (see
+#              neuro_common/CompactSynapses.py), same results as "dense"
+#   "sparse": only the non-zero weights (summation order differs from "dense",
+#             deviations are in the range of rounding errors)
+#   "active": only the weights of the active neurons, if few are active (see
+#             neuro_common/ActiveSynapses.py), deviations as for "sparse"; pays
+#             off for sparse activity only (below 2%, walking: about 30%)
+synapses = "dense"
+# compact_state: dead-neuron elimination, the network phase ("vectorized" and
+#   "batched" engine) computes only the neurons with synapses (or external inputs)
+#   in a compact index space, the state arrays keep the original numbering (see
+#   neuro_common/CompactNetwork.py); replaces the store of the synaptic weights,
+#   deviations in the range of rounding errors as for "sparse"
+compact_state = False
+# dtype: numeric type of the state and the weights of the leg networks:
+#   "float64" (original version) or "float32" (half the memory traffic, e.g. for
+#   batched runs and populations; the trajectories diverge from "float64" over
+#   time, see 'python3 -m tools.GoldenTrace report --dtype float32')
+dtype = "float64"
+# integrator: integration of the membrane equation of the neurons
+#   "euler": forward Euler (original version), stable for time steps below
+#            twice the smallest membrane constant (3.5 ms)
+#   "exponential": exponential Euler with the decay factors of the membrane
+#            constants, stable for longer time steps (see neuro_common/NeuronKernels.py)
+integrator = "euler"
+# substeps: network iterations per control step (10 ms): 10 (time step 1 ms,
+#   original version), 5, 2 or 1 (time steps of 2, 5 or 10 ms, with "exponential");
+#   the influences of the coordination rules are scaled with the time step
+substeps = 10
+# adaptive_substeps: a leg network whose activations change by at most
+#   substep_threshold (mV) over a network iteration has settled: the remaining
+#   iterations of the control step are extrapolated for this leg (held state,
+#   summed motor outputs continued with the last increments), the first
+#   iteration of a control step is always computed (see
+#   neuro_common/AdaptiveSubsteps.py). With a threshold of 0 the results are
+#   unchanged. Forward walking, 0.05 mV: 25% of the iterations saved, RMS
+#   deviation of the activations 0.1 mV; 0.1 mV: 42% saved, RMS 0.25 mV (shifted
+#   swing and stance switching causes single deviations of several mV).
+adaptive_substeps = False
+substep_threshold = 0.05
+# phase_probes: timing of the phases of the leg network update (inputs, synapses,
+#   neurons, band pass filters, motor outputs, experiments) and of the coordination
+#   rules, reported ranked over all legs (see neuro_common/PhaseProbes.py).
+#   The probes are removed under python -O.
+phase_probes = False
+
 ###########################
 # Coordination Rule Strengths
 ###########################
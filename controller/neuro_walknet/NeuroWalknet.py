@@ -5,6 +5,10 @@ import numpy
 
 from controller.neuro_walknet.NeuroLegMovement import NeuroLegMovement
 from controller.neuro_walknet.NeuroCoordinationRules import NeuroCoordinationRules
+import controller.neuro_walknet.NeuroWNSettings as WNParams
+from controller.neuro_common.LegNetworkBatch import LegNetworkBatch
+from controller.neuro_common.AdaptiveSubsteps import AdaptiveSubsteps
+from controller.neuro_common.PhaseProbes import PhaseProbes
 
 from ProcessOrganisation.ProcessModule.ProcessingModule import ProcessingModule
 
@@ -27,6 +31,8 @@ class NeuroWalknet (ProcessingModule):
         Name of the controller    
     robot : RobotF
         Controlled robot object
+    substeps : int
+        Number of network iterations per control step (of 10 ms)
 
     Methods
     -------
@@ -34,7 +40,7 @@ class NeuroWalknet (ProcessingModule):
         Called automatically from the simulation loop as a step of the controller.
     '''
 
-    def __init__(self, name, robot=None):
+    def __init__(self, name, robot=None, substeps=None):
         """
         Parameters
         ----------
@@ -43,6 +49,9 @@ class NeuroWalknet (ProcessingModule):
         robot : RobotF, optional
             reference to the robot object from which current sensor values
             can be read and commands are send to.
+        substeps : int, optional
+            Number of network iterations per control step, one of 10, 5, 2 or 1
+            (time step of 1, 2, 5 or 10 ms; default: substeps in Settings).
         """
         self.name = name
         ProcessingModule.__init__(self, name)
@@ -52,6 +61,11 @@ class NeuroWalknet (ProcessingModule):
         else:
             self.robot = robot
         self.count = 0
+        # Network iterations per control step and integration time step (ms) of the networks
+        self.substeps = WNParams.substeps if substeps is None else substeps
+        if self.substeps not in (10, 5, 2, 1):
+            raise Exception("The number of network iterations per control step has to be 10, 5, 2 or 1, not " + str(self.substeps))
+        self.dt = 10 // self.substeps
         
         # Six leg controllers are initialized and each gets a reference
         # for the specific leg.
@@ -68,9 +82,44 @@ class NeuroWalknet (ProcessingModule):
         self.controller_objs[4] = controller_obj_HL
         controller_obj_HR = NeuroLegMovement("controller_HR", robot.hind_right_leg)
         self.controller_objs[5] = controller_obj_HR
+
+        # Integration time step of the leg networks
+        for controller in self.controller_objs:
+            if controller:
+                controller.set_time_step(self.dt)
+
+        # Batched engine: the networks of all legs are computed at once (see Settings)
+        self.network_batch = None
+        if WNParams.engine == "batched":
+            self.network_batch = LegNetworkBatch(self.controller_objs)
+        # Dead-neuron elimination: the network phases compute the live neurons only (see Settings)
+        if WNParams.compact_state:
+            if WNParams.engine == "scalar":
+                raise Exception("The compacted network state requires the vectorized or batched engine.")
+            for network in [self.network_batch] if self.network_batch else [leg for leg in self.controller_objs if leg]:
+                network.compact()
+        # Adaptive substeps: settled leg networks reuse the result of their network phase (see Settings)
+        self.adaptive_substeps = None
+        if WNParams.adaptive_substeps:
+            self.adaptive_substeps = AdaptiveSubsteps(self.controller_objs, WNParams.substep_threshold)
         
         # Coordination rules are loaded
-        self.coordination_rules = NeuroCoordinationRules(self.controller_objs)
+        if self.network_batch:
+            self.coordination_rules = NeuroCoordinationRules(self.controller_objs, self.network_batch.v, self.dt)
+        else:
+            self.coordination_rules = NeuroCoordinationRules(self.controller_objs, dt=self.dt)
+
+        # Timing of the phases of the update of the legs and of the coordination rules (see Settings)
+        self.probes = None
+        self.coordination_probe = None
+        if WNParams.phase_probes and __debug__:
+            self.probes = PhaseProbes()
+            for controller in self.controller_objs:
+                if controller:
+                    controller.set_probe(self.probes.probe(controller.name))
+            if self.network_batch:
+                self.network_batch.probe = self.probes.probe("batch")
+            self.coordination_probe = self.probes.probe("coordination")
         
         # Settings for joint parameters
         # Original value for all joints was 855 (and 0.4 for damping)
@@ -86,6 +135,18 @@ class NeuroWalknet (ProcessingModule):
         robot.middle_right_leg.beta.springConstant = spm #100
         robot.hind_right_leg.beta.springConstant = sph #100
 
+    def reconfigure(self):
+        """
+        Takes over changed settings (NeuroWNSettings) in the experimental
+        parameters and experiments of the leg controllers (see LegConfiguration
+        and LegExperiments) and in the strengths of the coordination rules.
+        """
+        for controller in self.controller_objs:
+            if controller:
+                controller.config.reconfigure()
+                controller.select_experiments()
+        self.coordination_rules.reconfigure()
+
     #\param timeStamp       current simulator time
     def processing_step(self, timeStamp):
         """
@@ -105,15 +166,38 @@ class NeuroWalknet (ProcessingModule):
                 controller.update_joint_positions()
         # Compute the neural networks 
         # (is done with a 10 times higher frequency:
-        #  simulator runs at 100 Hz, but neurons operate on millisecond scale)
-        for i in range(0,10):
-            self.count = self.count +1
+        #  simulator runs at 100 Hz, but neurons operate on millisecond scale;
+        #  with longer time steps of the integrator, substeps < 10 iterations are computed)
+        if self.adaptive_substeps:
+            self.adaptive_substeps.start_step()
+        for i in range(0,self.substeps):
+            self.count = self.count + self.dt   # time counter (ms)
             # Update Leg networks.
-            for controller in self.controller_objs:
-                if controller:
-                    controller.update_leg_controller(timeStamp)
+            if self.adaptive_substeps:
+                if self.network_batch:
+                    self.adaptive_substeps.update_batch(self.network_batch, timeStamp)
+                else:
+                    for controller in self.controller_objs:
+                        if controller:
+                            self.adaptive_substeps.update_leg(controller, timeStamp)
+            elif self.network_batch:
+                for controller in self.controller_objs:
+                    if controller:
+                        controller.update_inputs(timeStamp)
+                self.network_batch.update_networks()
+                for controller in self.controller_objs:
+                    if controller:
+                        controller.update_outputs(timeStamp)
+            else:
+                for controller in self.controller_objs:
+                    if controller:
+                        controller.update_leg_controller(timeStamp)
             # Update coordination influences.
+            if __debug__:
+                if self.coordination_probe: self.coordination_probe.start()
             self.coordination_rules.update_coordination_rules(timeStamp)
+            if __debug__:
+                if self.coordination_probe: self.coordination_probe.lap("coordination")
 
             # Show current state of the leg controller
           #  self.controller_objs[0].output_current_state()  # FL      
@@ -4,11 +4,11 @@ Main file for hexapod simulations using the hector simulator.
 The file initialises the environment and loads the robot description from xml.
 Then it continues with the controller.
 '''
-import comminter
 import sys, time
 import inspect, os
 
 from Hector.RobotF import Robot
+from ProcessOrganisation.ProcessModule.RealtimeScheduler import RealtimeScheduler
 import geomparse
 
 ##  Getting the command line arguments. 
@@ -19,15 +19,54 @@ def _args():
         dest="simulationDuration", help="Duration of the simulation in seconds (in simulation time).")
     parser.add_argument("-l", "--log", action="store_true", default=False,
         dest="log", help="Log output.")
+    parser.add_argument("-e", "--engine", action="store", default=None, choices=["scalar", "vectorized", "batched"],
+        dest="engine", help="Implementation of the neuron update (default: engine in NeuroWNSettings).")
+    parser.add_argument("--headless", action="store_true", default=False,
+        dest="headless", help="Run on the kinematic plant instead of the Hector simulator.")
+    parser.add_argument("-n", "--ticks", action="store", default=None, type=int,
+        dest="ticks", help="Batch run: number of control steps, run as fast as possible without visualizations; the throughput is reported at the end.")
+    parser.add_argument("--integrator", action="store", default=None, choices=["euler", "exponential"],
+        dest="integrator", help="Integration of the membrane equation (default: integrator in NeuroWNSettings).")
+    parser.add_argument("--substeps", action="store", default=None, type=int, choices=[10, 5, 2, 1],
+        dest="substeps", help="Network iterations per control step, i.e. time steps of 1, 2, 5 or 10 ms (default: substeps in NeuroWNSettings).")
+    parser.add_argument("--adaptive-substeps", action="store", default=None, type=float, metavar="THRESHOLD",
+        dest="adaptive_substeps", help="Extrapolate the remaining iterations of a control step for leg networks whose activations change by at most THRESHOLD mV per iteration (see adaptive_substeps in NeuroWNSettings).")
+    parser.add_argument("--realtime", action="store", default="catch-up", choices=RealtimeScheduler.POLICIES,
+        dest="realtime", help="Pacing of the control steps in real time: after an overrun catch up with the schedule (catch-up) or drop the missed periods (drop); none runs as fast as possible. A latency summary is printed at the end.")
+    parser.add_argument("--phase-probes", action="store_true", default=False,
+        dest="phase_probes", help="Time the phases of the leg network update and the coordination rules; the ranking is printed at the end (not with python -O).")
+    parser.add_argument("--profile", action="store", default=None, metavar="FILE",
+        dest="profile", help="Time the pre, processing and post steps of each module and write the statistics as JSON to FILE at the end of the run.")
     return parser.parse_args()
 
 ##  Initialisation of the environment.
 #   Building up the communication client and starting the main loop.
 def init_environment(args):
     controllerFrequency=100 # Define the frequency with which the controller should run.
+
+    # Select the implementation of the neuron update, has to be done before the controller is built
+    import controller.neuro_walknet.NeuroWNSettings as WNParams
+    if args.engine is not None:
+        WNParams.engine = args.engine
+    # Integrator and time step of the leg networks
+    if args.integrator is not None:
+        WNParams.integrator = args.integrator
+    if args.substeps is not None:
+        WNParams.substeps = args.substeps
+    # Adaptive substeps of the leg networks
+    if args.adaptive_substeps is not None:
+        WNParams.adaptive_substeps, WNParams.substep_threshold = True, args.adaptive_substeps
+    # Timing of the phases of the leg network update
+    WNParams.phase_probes = args.phase_probes
     
     # Create the communication interface
-    communication_interface=comminter.CommunicationInterface()
+    if args.headless:
+        # Kinematic plant (Hector/KinematicPlantF.py) in place of the simulator
+        from Hector.KinematicPlantF import CommunicationInterface
+        communication_interface=CommunicationInterface()
+    else:
+        import comminter
+        communication_interface=comminter.CommunicationInterface()
     protocolXmlDirectory="../hector/BioFlexBusProtocolXmls/"
     communication_interface.ParseProtocolXmls([protocolXmlDirectory+protocolXml for protocolXml in ["BIOFLEX_1_PROT.xml", "BIOFLEX_ROTATORY_1_PROT.xml", "BIOFLEX_ROTATORY_CONTROL_1_PROT.xml", "BIOFLEX_ROTATORY_ERROR_PROT.xml", "SIMSERV_1_PROT.xml", "IMU_PROT.xml", "PRESSURE_SENSOR_PROT.xml"]]) # Parse the xml files that contain the command-protocol definitions
 
@@ -48,7 +87,13 @@ def init_environment(args):
 
     # Module main executor
     from ProcessOrganisation.ProcessModule.ProcessModuleQueuedExecution import ProcessModuleQueuedExecution
-    mainProcessModuleExecution = ProcessModuleQueuedExecution(debug_time=False)
+    # Integer clock of the control loop (control steps), advanced by the main executor and read by the modules
+    from ProcessOrganisation.SimulatorModule.TickClock import TickClock
+    clock = TickClock(controllerFrequency)
+    # Timing of the modules (written at the end of the run)
+    from ProcessOrganisation.ProcessModule.ModuleProfiler import ModuleProfiler
+    profiler = ModuleProfiler() if args.profile else None
+    mainProcessModuleExecution = ProcessModuleQueuedExecution(debug_time=False, clock=clock, profiler=profiler)
     
     # Build up the individual Modules
 
@@ -79,11 +124,14 @@ def init_environment(args):
 
     ####################
     # Turn visualizations on and off.
+    # (batch runs are without visualizations)
+    visualize = args.ticks is None
     
     # Footfall pattern
-    from Visualizations.PEPVisualizationModule import PEPVisualizationModule
-    pepVisualization = PEPVisualizationModule("pepVisualization", controller_obj)
-    mainProcessModuleExecution.add_module(pepVisualization)
+    if visualize:
+        from Visualizations.PEPVisualizationModule import PEPVisualizationModule
+        pepVisualization = PEPVisualizationModule("pepVisualization", controller_obj)
+        mainProcessModuleExecution.add_module(pepVisualization)
 
     # Footpositions in robot CS
 #    from Visualizations.FootPointVisualizationModule import FootPointVisualizationModule
@@ -121,30 +169,62 @@ def init_environment(args):
 
     # Load the module for the timing of the simulator
     from ProcessOrganisation.SimulatorModule.SimulatorTimerModule import SimulatorTimerModule as SimulatorTimerModule
-    simulatorTimer = SimulatorTimerModule("Simulator_Timer", robot, controllerFrequency)
+    simulatorTimer = SimulatorTimerModule("Simulator_Timer", robot, controllerFrequency, clock)
     mainProcessModuleExecution.add_module(simulatorTimer)
     
     try:    
     
-        simulationTime = 0 # In order to let the simulation run in realtime, the simulation time is tracked and compared to the real time in order to let the simulation sleep if it's too fast.
-        realTimeOffset = time.time() # The current time at the beginning of the simulation
-        
         mainProcessModuleExecution.init_all_modules()
 
+        # BATCH RUN: fixed number of control steps as fast as possible
+        if args.ticks is not None:
+            adaptive = controller_obj.adaptive_substeps
+            network_iterations = controller_obj.count
+            computed = adaptive.computed if adaptive else 0
+            start = time.perf_counter()
+            for _ in range(args.ticks):
+                mainProcessModuleExecution.execute_complete_step(clock.time())
+                communication_interface.NotifyOfNextIteration()
+            duration = time.perf_counter() - start
+            leg_controllers = [leg_controller for leg_controller in controller_obj.controller_objs if leg_controller]
+            if adaptive:
+                # only the network phases that were computed (the extrapolated ones hold the state)
+                neuron_updates = (adaptive.computed - computed) * leg_controllers[0].n
+            else:
+                neuron_updates = (controller_obj.count - network_iterations) // controller_obj.dt * sum(leg_controller.n for leg_controller in leg_controllers)
+            print("%d control steps (%.2f s simulation time) in %.2f s: %.1f control steps/s, %.3g neuron-updates/s" %
+                  (args.ticks, args.ticks/controllerFrequency, duration, args.ticks/duration, neuron_updates/duration))
+            if adaptive:
+                print("Adaptive substeps: %d leg network iterations computed, %d extrapolated (%.1f %% saved)" %
+                      (adaptive.computed, adaptive.skipped, 100*adaptive.saved()))
+            return
+
         # THE MAIN LOOP
-        while (simulationTime <= args.simulationDuration):
-            start = time.time()
-            
+        # The scheduler calls the control step every 1/controllerFrequency seconds (real time) and tracks the overruns.
+        scheduler = RealtimeScheduler(1/controllerFrequency, args.realtime)
+
+        def control_step(simulationTime):
+            start = time.perf_counter()
+
             mainProcessModuleExecution.execute_complete_step(simulationTime)
-            
-            simulationTime+=1/controllerFrequency # Update the variable holding the current simulation time.
+
             communication_interface.NotifyOfNextIteration() # Tell the communication interface that a new controller iteration has begun.
 
             if args.log == True:
-                print(timeStamp,";",(time.time()-start))
+                print(simulationTime,";",(time.perf_counter()-start))
+
+        try:
+            scheduler.run(control_step, args.simulationDuration, clock)
+        finally:
+            print(scheduler.report())
 
     except KeyboardInterrupt as err:
         print("\n terminated by user", err)
+    finally:
+        if profiler:
+            profiler.dump(args.profile)
+        if controller_obj.probes:
+            print(controller_obj.probes.report())
 
 ## Main method
 if __name__ == "__main__":
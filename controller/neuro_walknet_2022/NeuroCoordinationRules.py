@@ -2,6 +2,43 @@
 
 import numpy
 import controller.neuro_walknet_2022.NeuroWNSettings as WNParams
+from controller.neuro_common.CoordinationOperator import CoordinationOperator
+
+# Couplings between the leg networks, in the order of application:
+# (target leg, target neuron, source leg, source neuron, rule)
+# Leg_nr: FL = 0, FR = 1, ML = 2, MR = 3, HL = 4, HR = 5
+coupling_table = [
+    # Coordination from Middle Left Leg - to Front Left Leg
+    (0, 140, 2, 158, "R1a"), (0, 140, 2, 146, "R1b"), (0, 141, 2, 160, "R2i"), (2, 141, 0, 149, "R3i"),
+    (0, 173, 2, 172, "R5i"), (2, 173, 0, 172, "R5i"), (0, 303, 2, 302, "R5iD"), (2, 303, 0, 302, "R5iD"),
+    (0, 310, 2, 301, "R5Pi"), (2, 310, 0, 301, "R5Pi"),
+    # Coordination from Hind Left Leg - to Middle Left Leg
+    (2, 140, 4, 158, "R1a"), (2, 140, 4, 146, "R1b"), (2, 141, 4, 160, "R2i"), (4, 141, 2, 149, "R3i"),
+    (2, 173, 4, 172, "R5i"), (4, 173, 2, 172, "R5i"), (2, 303, 4, 302, "R5iD"), (4, 303, 2, 302, "R5iD"),
+    (2, 310, 4, 301, "R5Pi"), (4, 310, 2, 301, "R5Pi"),
+    # Coordination from Middle Right Leg - to Front Right Leg
+    (1, 140, 3, 158, "R1a"), (1, 140, 3, 146, "R1b"), (1, 141, 3, 160, "R2i"), (3, 141, 1, 149, "R3i"),
+    (1, 173, 3, 172, "R5i"), (3, 173, 1, 172, "R5i"), (1, 303, 3, 302, "R5iD"), (3, 303, 1, 302, "R5iD"),
+    (1, 310, 3, 301, "R5Pi"), (3, 310, 1, 301, "R5Pi"),
+    # Coordination from Hind Right Leg - to Middle Right Leg
+    (3, 140, 5, 158, "R1a"), (3, 140, 5, 146, "R1b"), (3, 141, 5, 160, "R2i"), (5, 141, 3, 149, "R3i"),
+    (3, 173, 5, 172, "R5i"), (5, 173, 3, 172, "R5i"), (3, 303, 5, 302, "R5iD"), (5, 303, 3, 302, "R5iD"),
+    (3, 310, 5, 301, "R5Pi"), (5, 310, 3, 301, "R5Pi"),
+    # Contralateral Coordination between Front Right Leg - and Front Left Leg
+    (0, 141, 1, 157, "R2cf"), (0, 141, 1, 152, "R3cf"), (1, 141, 0, 157, "R2cf"), (1, 141, 0, 152, "R3cf"),
+    (0, 174, 1, 172, "R5c"), (1, 174, 0, 172, "R5c"), (0, 304, 1, 302, "R5cD"), (1, 304, 0, 302, "R5cD"),
+    (0, 311, 1, 301, "R5Pc"), (1, 311, 0, 301, "R5Pc"),
+    # Contralateral Coordination between Middle Left Leg - and Middle Right Leg
+    (2, 141, 3, 157, "R2cm"), (3, 141, 2, 157, "R2cm"), (2, 174, 3, 172, "R5c"), (3, 174, 2, 172, "R5c"),
+    (2, 304, 3, 302, "R5cD"), (3, 304, 2, 302, "R5cD"), (2, 311, 3, 301, "R5Pc"), (3, 311, 2, 301, "R5Pc"),
+    # Contralateral Coordination between Hind Right Leg - and Hind Left Leg
+    (4, 141, 5, 157, "R2ch"), (4, 141, 5, 152, "R3ch"), (5, 141, 4, 157, "R2ch"), (5, 141, 4, 152, "R3ch"),
+    (4, 175, 5, 172, "R5ch"), (5, 175, 4, 172, "R5ch"), (4, 305, 5, 302, "R5chD"), (5, 305, 4, 302, "R5chD"),
+    (4, 311, 5, 301, "R5Pc"), (5, 311, 4, 301, "R5Pc"),
+    ]
+
+# Upper limits of the influenced neurons (neuron, limit), in all legs
+coupling_limits = [(173, 50.), (175, 50.)]
 
 class NeuroCoordinationRules:
     """
@@ -21,10 +58,41 @@ class NeuroCoordinationRules:
         Called automatically from the simulation loop as a step of the controller.
     """
 
-    def __init__(self, contr):
+    def __init__(self, contr, activations=None, dt=1):
         self.controller_objs = contr
+        # Integration time step (ms) of the networks: the influences are added once per
+        # network iteration and scaled with the time step (see CoordinationOperator)
+        self.dt = dt
+        legs = [i for i, controller in enumerate(self.controller_objs) if controller]
+        self.rows = [legs.index(i) if i in legs else None for i in range(len(self.controller_objs))]
+        # Stacked activations of the legs (batched engine). With the vectorized engine
+        # the activations are stacked here once, the legs keep views on their rows.
+        self.activations = activations
+        if self.activations is None and WNParams.engine != "scalar":
+            legs = [controller for controller in self.controller_objs if controller]
+            self.activations = numpy.array([leg.v for leg in legs])
+            for row, leg in enumerate(legs):
+                leg.v = self.activations[row]
+        self.operator = None
+        if WNParams.engine != "scalar":
+            self.compile_operator()
         print("Initialized coordination rule processor")
 
+    def compile_operator(self):
+        """
+        Compile the coupling table with the current rule strengths into a coupling operator.
+        """
+        n = [controller for controller in self.controller_objs if controller][0].n
+        self.operator = CoordinationOperator(coupling_table, WNParams.coord_rules, self.rows, n, coupling_limits, self.dt)
+
+    def reconfigure(self):
+        """
+        Takes over changed strengths of the rules (WNParams.coord_rules, e.g. after
+        a change of the walking mode, see NeuroWalknet.reconfigure).
+        """
+        if WNParams.engine != "scalar":
+            self.compile_operator()
+
     def update_coordination_rules(self, timeStamp):
         """
         Update coordination rules
@@ -39,101 +107,112 @@ class NeuroCoordinationRules:
         timestamp : float
             Current timestep.
         """
+        if WNParams.engine == "scalar":
+            self.update_coordination_rules_scalar()
+            return
+        self.operator.apply(self.activations)
+
+    def update_coordination_rules_scalar(self):
+        """
+        Update coordination rules, original version applying the rules one after the other (reference).
+        """
         # Update the current activation values of neurons in the different legs
         # = simply overwrite these externally
         # weights for interleg coordination, e.g. rule 1: vML 122 (Swing) to vFL 123(Stance)
         # Leg_nr: FL = 0, FR = 1, ML = 2, MR = 3, HL = 4, HR = 5
+        # strengths of the rules scaled with the time step
+        coord_rules = {rule: strength*self.dt for rule, strength in WNParams.coord_rules.items()}
         # Coordination from Middle Left Leg - to Front Left Leg
         if (self.controller_objs[2] and self.controller_objs[0]):    # FL 0, ML 2
-            self.controller_objs[0].v[140] += self.controller_objs[2].v[158]*WNParams.coord_rules["R1a"] # rule 1a
-            self.controller_objs[0].v[140] += self.controller_objs[2].v[146]*WNParams.coord_rules["R1b"] # rule 1b
-            self.controller_objs[0].v[141] += self.controller_objs[2].v[160]*WNParams.coord_rules["R2i"] # rule 2i
-            self.controller_objs[2].v[141] += self.controller_objs[0].v[149]*WNParams.coord_rules["R3i"] # rule 3i
-
-            self.controller_objs[0].v[173] += self.controller_objs[2].v[172]*WNParams.coord_rules["R5i"] # rule 5i
-            self.controller_objs[2].v[173] += self.controller_objs[0].v[172]*WNParams.coord_rules["R5i"] # rule 5i
-            self.controller_objs[0].v[303] += self.controller_objs[2].v[302]*WNParams.coord_rules["R5iD"] # rule 5i   Dep
-            self.controller_objs[2].v[303] += self.controller_objs[0].v[302]*WNParams.coord_rules["R5iD"] # rule 5i   Dep
-            self.controller_objs[0].v[310] += self.controller_objs[2].v[301]*WNParams.coord_rules["R5Pi"] # rule 5Pi   Lev
-            self.controller_objs[2].v[310] += self.controller_objs[0].v[301]*WNParams.coord_rules["R5Pi"] # rule 5Pi   Lev
+            self.controller_objs[0].v[140] += self.controller_objs[2].v[158]*coord_rules["R1a"] # rule 1a
+            self.controller_objs[0].v[140] += self.controller_objs[2].v[146]*coord_rules["R1b"] # rule 1b
+            self.controller_objs[0].v[141] += self.controller_objs[2].v[160]*coord_rules["R2i"] # rule 2i
+            self.controller_objs[2].v[141] += self.controller_objs[0].v[149]*coord_rules["R3i"] # rule 3i
+
+            self.controller_objs[0].v[173] += self.controller_objs[2].v[172]*coord_rules["R5i"] # rule 5i
+            self.controller_objs[2].v[173] += self.controller_objs[0].v[172]*coord_rules["R5i"] # rule 5i
+            self.controller_objs[0].v[303] += self.controller_objs[2].v[302]*coord_rules["R5iD"] # rule 5i   Dep
+            self.controller_objs[2].v[303] += self.controller_objs[0].v[302]*coord_rules["R5iD"] # rule 5i   Dep
+            self.controller_objs[0].v[310] += self.controller_objs[2].v[301]*coord_rules["R5Pi"] # rule 5Pi   Lev
+            self.controller_objs[2].v[310] += self.controller_objs[0].v[301]*coord_rules["R5Pi"] # rule 5Pi   Lev
 
         # Coordination from Hind Left Leg - to Middle Left Leg
         if (self.controller_objs[4] and self.controller_objs[2]):    # ML 2, HL 4
-            self.controller_objs[2].v[140] += self.controller_objs[4].v[158]*WNParams.coord_rules["R1a"] # rule 1a
-            self.controller_objs[2].v[140] += self.controller_objs[4].v[146]*WNParams.coord_rules["R1b"] # rule 1b
-            self.controller_objs[2].v[141] += self.controller_objs[4].v[160]*WNParams.coord_rules["R2i"] # rule 2i
-            self.controller_objs[4].v[141] += self.controller_objs[2].v[149]*WNParams.coord_rules["R3i"] # rule 3i
-            self.controller_objs[2].v[173] += self.controller_objs[4].v[172]*WNParams.coord_rules["R5i"] # rule 5i
-            self.controller_objs[4].v[173] += self.controller_objs[2].v[172]*WNParams.coord_rules["R5i"] # rule 5i
-            self.controller_objs[2].v[303] += self.controller_objs[4].v[302]*WNParams.coord_rules["R5iD"] # rule 5i  Dep
-            self.controller_objs[4].v[303] += self.controller_objs[2].v[302]*WNParams.coord_rules["R5iD"] # rule 5i  Dep
-            self.controller_objs[2].v[310] += self.controller_objs[4].v[301]*WNParams.coord_rules["R5Pi"] # rule 5Pi  Lev
-            self.controller_objs[4].v[310] += self.controller_objs[2].v[301]*WNParams.coord_rules["R5Pi"] # rule 5Pi  Lev
+            self.controller_objs[2].v[140] += self.controller_objs[4].v[158]*coord_rules["R1a"] # rule 1a
+            self.controller_objs[2].v[140] += self.controller_objs[4].v[146]*coord_rules["R1b"] # rule 1b
+            self.controller_objs[2].v[141] += self.controller_objs[4].v[160]*coord_rules["R2i"] # rule 2i
+            self.controller_objs[4].v[141] += self.controller_objs[2].v[149]*coord_rules["R3i"] # rule 3i
+            self.controller_objs[2].v[173] += self.controller_objs[4].v[172]*coord_rules["R5i"] # rule 5i
+            self.controller_objs[4].v[173] += self.controller_objs[2].v[172]*coord_rules["R5i"] # rule 5i
+            self.controller_objs[2].v[303] += self.controller_objs[4].v[302]*coord_rules["R5iD"] # rule 5i  Dep
+            self.controller_objs[4].v[303] += self.controller_objs[2].v[302]*coord_rules["R5iD"] # rule 5i  Dep
+            self.controller_objs[2].v[310] += self.controller_objs[4].v[301]*coord_rules["R5Pi"] # rule 5Pi  Lev
+            self.controller_objs[4].v[310] += self.controller_objs[2].v[301]*coord_rules["R5Pi"] # rule 5Pi  Lev
 
         # Coordination from Middle Right Leg - to Front Right Leg
         if (self.controller_objs[3] and self.controller_objs[1]):    # FR 1, MR 3
-            self.controller_objs[1].v[140] += self.controller_objs[3].v[158]*WNParams.coord_rules["R1a"] # rule 1a
-            self.controller_objs[1].v[140] += self.controller_objs[3].v[146]*WNParams.coord_rules["R1b"] # rule 1b
-            self.controller_objs[1].v[141] += self.controller_objs[3].v[160]*WNParams.coord_rules["R2i"] # rule 2i
-            self.controller_objs[3].v[141] += self.controller_objs[1].v[149]*WNParams.coord_rules["R3i"] # rule 3i
-            self.controller_objs[1].v[173] += self.controller_objs[3].v[172]*WNParams.coord_rules["R5i"] # rule 5i
-            self.controller_objs[3].v[173] += self.controller_objs[1].v[172]*WNParams.coord_rules["R5i"] # rule 5i
-            self.controller_objs[1].v[303] += self.controller_objs[3].v[302]*WNParams.coord_rules["R5iD"] # rule 5i   Dep
-            self.controller_objs[3].v[303] += self.controller_objs[1].v[302]*WNParams.coord_rules["R5iD"] # rule 5i   Dep
-            self.controller_objs[1].v[310] += self.controller_objs[3].v[301]*WNParams.coord_rules["R5Pi"] # rule 5Pi   Lev
-            self.controller_objs[3].v[310] += self.controller_objs[1].v[301]*WNParams.coord_rules["R5Pi"] # rule 5Pi   Lev
+            self.controller_objs[1].v[140] += self.controller_objs[3].v[158]*coord_rules["R1a"] # rule 1a
+            self.controller_objs[1].v[140] += self.controller_objs[3].v[146]*coord_rules["R1b"] # rule 1b
+            self.controller_objs[1].v[141] += self.controller_objs[3].v[160]*coord_rules["R2i"] # rule 2i
+            self.controller_objs[3].v[141] += self.controller_objs[1].v[149]*coord_rules["R3i"] # rule 3i
+            self.controller_objs[1].v[173] += self.controller_objs[3].v[172]*coord_rules["R5i"] # rule 5i
+            self.controller_objs[3].v[173] += self.controller_objs[1].v[172]*coord_rules["R5i"] # rule 5i
+            self.controller_objs[1].v[303] += self.controller_objs[3].v[302]*coord_rules["R5iD"] # rule 5i   Dep
+            self.controller_objs[3].v[303] += self.controller_objs[1].v[302]*coord_rules["R5iD"] # rule 5i   Dep
+            self.controller_objs[1].v[310] += self.controller_objs[3].v[301]*coord_rules["R5Pi"] # rule 5Pi   Lev
+            self.controller_objs[3].v[310] += self.controller_objs[1].v[301]*coord_rules["R5Pi"] # rule 5Pi   Lev
 
         # Coordination from Hind Right Leg - to Middle Right Leg
         if (self.controller_objs[5] and self.controller_objs[3]):    # MR 3 , HR 5
-            self.controller_objs[3].v[140] += self.controller_objs[5].v[158]*WNParams.coord_rules["R1a"] # rule 1a
-            self.controller_objs[3].v[140] += self.controller_objs[5].v[146]*WNParams.coord_rules["R1b"] # rule 1b
-            self.controller_objs[3].v[141] += self.controller_objs[5].v[160]*WNParams.coord_rules["R2i"] # rule 2i
-            self.controller_objs[5].v[141] += self.controller_objs[3].v[149]*WNParams.coord_rules["R3i"] # rule 3i
-            self.controller_objs[3].v[173] += self.controller_objs[5].v[172]*WNParams.coord_rules["R5i"] # rule 5i
-            self.controller_objs[5].v[173] += self.controller_objs[3].v[172]*WNParams.coord_rules["R5i"] # rule 5i
-            self.controller_objs[3].v[303] += self.controller_objs[5].v[302]*WNParams.coord_rules["R5iD"] # rule 5i   Dep
-            self.controller_objs[5].v[303] += self.controller_objs[3].v[302]*WNParams.coord_rules["R5iD"] # rule 5i   Dep
-            self.controller_objs[3].v[310] += self.controller_objs[5].v[301]*WNParams.coord_rules["R5Pi"] # rule 5Pi   Lev
-            self.controller_objs[5].v[310] += self.controller_objs[3].v[301]*WNParams.coord_rules["R5Pi"] # rule 5Pi   Lev
+            self.controller_objs[3].v[140] += self.controller_objs[5].v[158]*coord_rules["R1a"] # rule 1a
+            self.controller_objs[3].v[140] += self.controller_objs[5].v[146]*coord_rules["R1b"] # rule 1b
+            self.controller_objs[3].v[141] += self.controller_objs[5].v[160]*coord_rules["R2i"] # rule 2i
+            self.controller_objs[5].v[141] += self.controller_objs[3].v[149]*coord_rules["R3i"] # rule 3i
+            self.controller_objs[3].v[173] += self.controller_objs[5].v[172]*coord_rules["R5i"] # rule 5i
+            self.controller_objs[5].v[173] += self.controller_objs[3].v[172]*coord_rules["R5i"] # rule 5i
+            self.controller_objs[3].v[303] += self.controller_objs[5].v[302]*coord_rules["R5iD"] # rule 5i   Dep
+            self.controller_objs[5].v[303] += self.controller_objs[3].v[302]*coord_rules["R5iD"] # rule 5i   Dep
+            self.controller_objs[3].v[310] += self.controller_objs[5].v[301]*coord_rules["R5Pi"] # rule 5Pi   Lev
+            self.controller_objs[5].v[310] += self.controller_objs[3].v[301]*coord_rules["R5Pi"] # rule 5Pi   Lev
 
         # Contralateral Coordination between Front Right Leg - and Front Left Leg
         if (self.controller_objs[1] and self.controller_objs[0]):    # FL 0 , FR 1
-            self.controller_objs[0].v[141] += self.controller_objs[1].v[157]*WNParams.coord_rules["R2cf"] # rule 2c
-            self.controller_objs[0].v[141] += self.controller_objs[1].v[152]*WNParams.coord_rules["R3cf"] # rule 3c
-            self.controller_objs[1].v[141] += self.controller_objs[0].v[157]*WNParams.coord_rules["R2cf"] # rule 2c
-            self.controller_objs[1].v[141] += self.controller_objs[0].v[152]*WNParams.coord_rules["R3cf"] # rule 3c
-
-            self.controller_objs[0].v[174] += self.controller_objs[1].v[172]*WNParams.coord_rules["R5c"]# rule 5c
-            self.controller_objs[1].v[174] += self.controller_objs[0].v[172]*WNParams.coord_rules["R5c"]# rule 5c
-            self.controller_objs[0].v[304] += self.controller_objs[1].v[302]*WNParams.coord_rules["R5cD"]# rule 5c   Dep
-            self.controller_objs[1].v[304] += self.controller_objs[0].v[302]*WNParams.coord_rules["R5cD"]# rule 5c   Dep
-            self.controller_objs[0].v[311] += self.controller_objs[1].v[301]*WNParams.coord_rules["R5Pc"]# rule 5Pc   Lev
-            self.controller_objs[1].v[311] += self.controller_objs[0].v[301]*WNParams.coord_rules["R5Pc"]# rule 5Pc   Lev
+            self.controller_objs[0].v[141] += self.controller_objs[1].v[157]*coord_rules["R2cf"] # rule 2c
+            self.controller_objs[0].v[141] += self.controller_objs[1].v[152]*coord_rules["R3cf"] # rule 3c
+            self.controller_objs[1].v[141] += self.controller_objs[0].v[157]*coord_rules["R2cf"] # rule 2c
+            self.controller_objs[1].v[141] += self.controller_objs[0].v[152]*coord_rules["R3cf"] # rule 3c
+
+            self.controller_objs[0].v[174] += self.controller_objs[1].v[172]*coord_rules["R5c"]# rule 5c
+            self.controller_objs[1].v[174] += self.controller_objs[0].v[172]*coord_rules["R5c"]# rule 5c
+            self.controller_objs[0].v[304] += self.controller_objs[1].v[302]*coord_rules["R5cD"]# rule 5c   Dep
+            self.controller_objs[1].v[304] += self.controller_objs[0].v[302]*coord_rules["R5cD"]# rule 5c   Dep
+            self.controller_objs[0].v[311] += self.controller_objs[1].v[301]*coord_rules["R5Pc"]# rule 5Pc   Lev
+            self.controller_objs[1].v[311] += self.controller_objs[0].v[301]*coord_rules["R5Pc"]# rule 5Pc   Lev
 
         # Contralateral Coordination between Middle Left Leg - and Middle Right Leg
         if (self.controller_objs[2] and self.controller_objs[3]):    # ML 2 , MR 3
-            self.controller_objs[2].v[141] += self.controller_objs[3].v[157]*WNParams.coord_rules["R2cm"] # rule 2c
-            self.controller_objs[3].v[141] += self.controller_objs[2].v[157]*WNParams.coord_rules["R2cm"] # rule 2c
-            self.controller_objs[2].v[174] += self.controller_objs[3].v[172]*WNParams.coord_rules["R5c"] # rule 5c
-            self.controller_objs[3].v[174] += self.controller_objs[2].v[172]*WNParams.coord_rules["R5c"] # rule 5c
-            self.controller_objs[2].v[304] += self.controller_objs[3].v[302]*WNParams.coord_rules["R5cD"] # rule 5c   Dep
-            self.controller_objs[3].v[304] += self.controller_objs[2].v[302]*WNParams.coord_rules["R5cD"] # rule 5c   Dep
-            self.controller_objs[2].v[311] += self.controller_objs[3].v[301]*WNParams.coord_rules["R5Pc"] # rule 5Pc   Lev
-            self.controller_objs[3].v[311] += self.controller_objs[2].v[301]*WNParams.coord_rules["R5Pc"] # rule 5Pc   Lev
+            self.controller_objs[2].v[141] += self.controller_objs[3].v[157]*coord_rules["R2cm"] # rule 2c
+            self.controller_objs[3].v[141] += self.controller_objs[2].v[157]*coord_rules["R2cm"] # rule 2c
+            self.controller_objs[2].v[174] += self.controller_objs[3].v[172]*coord_rules["R5c"] # rule 5c
+            self.controller_objs[3].v[174] += self.controller_objs[2].v[172]*coord_rules["R5c"] # rule 5c
+            self.controller_objs[2].v[304] += self.controller_objs[3].v[302]*coord_rules["R5cD"] # rule 5c   Dep
+            self.controller_objs[3].v[304] += self.controller_objs[2].v[302]*coord_rules["R5cD"] # rule 5c   Dep
+            self.controller_objs[2].v[311] += self.controller_objs[3].v[301]*coord_rules["R5Pc"] # rule 5Pc   Lev
+            self.controller_objs[3].v[311] += self.controller_objs[2].v[301]*coord_rules["R5Pc"] # rule 5Pc   Lev
 
         # Contralateral Coordination between Hind Right Leg - and Hind Left Leg
         if (self.controller_objs[4] and self.controller_objs[5]):    # HL 4 , HR 5
-            self.controller_objs[4].v[141] += self.controller_objs[5].v[157]*WNParams.coord_rules["R2ch"] # rule 2c
-            self.controller_objs[4].v[141] += self.controller_objs[5].v[152]*WNParams.coord_rules["R3ch"] # rule 3c
-            self.controller_objs[5].v[141] += self.controller_objs[4].v[157]*WNParams.coord_rules["R2ch"] # rule 2c
-            self.controller_objs[5].v[141] += self.controller_objs[4].v[152]*WNParams.coord_rules["R3ch"] # rule 3c
-
-            self.controller_objs[4].v[175] += self.controller_objs[5].v[172]*WNParams.coord_rules["R5ch"] # rule 5ch
-            self.controller_objs[5].v[175] += self.controller_objs[4].v[172]*WNParams.coord_rules["R5ch"] # rule 5ch
-            self.controller_objs[4].v[305] += self.controller_objs[5].v[302]*WNParams.coord_rules["R5chD"] # rule 5ch   Dep
-            self.controller_objs[5].v[305] += self.controller_objs[4].v[302]*WNParams.coord_rules["R5chD"] # rule 5ch   Dep
-            self.controller_objs[4].v[311] += self.controller_objs[5].v[301]*WNParams.coord_rules["R5Pc"] # rule 5Pc   Lev
-            self.controller_objs[5].v[311] += self.controller_objs[4].v[301]*WNParams.coord_rules["R5Pc"] # rule 5Pc   Lev
+            self.controller_objs[4].v[141] += self.controller_objs[5].v[157]*coord_rules["R2ch"] # rule 2c
+            self.controller_objs[4].v[141] += self.controller_objs[5].v[152]*coord_rules["R3ch"] # rule 3c
+            self.controller_objs[5].v[141] += self.controller_objs[4].v[157]*coord_rules["R2ch"] # rule 2c
+            self.controller_objs[5].v[141] += self.controller_objs[4].v[152]*coord_rules["R3ch"] # rule 3c
+
+            self.controller_objs[4].v[175] += self.controller_objs[5].v[172]*coord_rules["R5ch"] # rule 5ch
+            self.controller_objs[5].v[175] += self.controller_objs[4].v[172]*coord_rules["R5ch"] # rule 5ch
+            self.controller_objs[4].v[305] += self.controller_objs[5].v[302]*coord_rules["R5chD"] # rule 5ch   Dep
+            self.controller_objs[5].v[305] += self.controller_objs[4].v[302]*coord_rules["R5chD"] # rule 5ch   Dep
+            self.controller_objs[4].v[311] += self.controller_objs[5].v[301]*coord_rules["R5Pc"] # rule 5Pc   Lev
+            self.controller_objs[5].v[311] += self.controller_objs[4].v[301]*coord_rules["R5Pc"] # rule 5Pc   Lev
 
         # Threshold activation of influenced neurons.
         if self.controller_objs[0].v[173] > 50.: self.controller_objs[0].v[173] = 50.
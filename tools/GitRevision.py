@@ -0,0 +1,15 @@
+'''
+Git revision of the working copy, stored with benchmark results and reference traces.
+'''
+import os, subprocess
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+##  Commit and state (uncommitted changes) of the repository, None outside of a git working copy.
+def git_revision():
+    def git(*command):
+        return subprocess.run(("git",) + command, cwd=REPOSITORY, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,233 @@
+'''
+Golden trace harness: equivalence check of the implementations of the leg networks.
+
+The behaviour of the controller is defined by its exact numerics (e.g. the
+clipping of single units inside the neuron update, the state of the band pass
+filters), so optimized engines are validated against reference traces.
+For each scenario (walking mode or experimental situation, set up by adapting
+NeuroWNSettings) the controller runs a fixed number of control steps on the
+kinematic plant and the activations v, the inputs Iapp and the motor outputs
+(alphaHvelout, betaHvelout, gammaHvelout) of all legs are recorded after each
+network iteration (millisecond).
+
+record: traces of the reference implementation (engine "scalar", dense synapses)
+        are stored as .npz files (one per variant and scenario).
+compare: the traces of an engine are compared to the stored ones within the
+        given tolerances; for each scenario the first divergent millisecond,
+        leg and neuron (or joint) is reported.
+report: divergence of an engine (e.g. with --dtype float32) from the stored
+        traces over the whole run: maximum and RMS deviation of the activations
+        and motor outputs, and the first millisecond from which the activations
+        differ by more than the threshold (--threshold, default 1 mV).
+
+With --adaptive-substeps the engine runs with adaptive substeps (see
+neuro_common/AdaptiveSubsteps.py); with a threshold of 0 it has to reproduce
+the traces without them, e.g. while standing (scenario standing), with a
+larger threshold report shows the deviations of the extrapolated iterations:
+     python3 -m tools.GoldenTrace compare --engine vectorized --adaptive-substeps 0 --scenario standing
+     python3 -m tools.GoldenTrace report --engine vectorized --adaptive-substeps 0.05 --scenario forward
+
+Run: python3 -m tools.GoldenTrace record [--variant neuro_walknet_2022]
+     python3 -m tools.GoldenTrace compare --engine batched [--synapses sparse] [--rtol 1e-9 --atol 1e-9]
+     python3 -m tools.GoldenTrace report --engine batched --dtype float32 [--scenario forward]
+'''
+import os, io, sys, json, random, contextlib, importlib
+import numpy
+
+from tools.HeadlessControlLoop import ControlLoop
+from tools.GitRevision import git_revision
+
+VARIANTS = ["neuro_walknet", "neuro_walknet_2022"]
+LEG_NAMES = ["front_left_leg", "front_right_leg", "middle_left_leg", "middle_right_leg", "hind_left_leg", "hind_right_leg"]
+# Recorded quantities: activations, inputs (per neuron) and motor outputs (per joint)
+QUANTITIES = ("v", "Iapp", "motor")
+JOINTS = ("alphaHvelout", "betaHvelout", "gammaHvelout")
+
+##  Getting the command line arguments.
+def _args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Golden trace harness for the leg network engines")
+    parser.add_argument("mode", choices=["record", "compare", "report"],
+        help="Record reference traces, compare against them or report the divergence from them.")
+    parser.add_argument("-v", "--variant", action="append", default=None, choices=VARIANTS,
+        dest="variants", help="Controller (can be given several times, default: both).")
+    parser.add_argument("-s", "--scenario", action="append", default=None,
+        choices=list(SCENARIOS), dest="scenarios", help="Scenario (can be given several times, default: all of the variant).")
+    parser.add_argument("-e", "--engine", action="store", default="scalar", choices=["scalar", "vectorized", "batched"],
+        dest="engine", help="Implementation of the neuron update (default: scalar).")
+    parser.add_argument("--synapses", action="store", default="dense", choices=["dense", "sparse", "compact", "active"],
+        dest="synapses", help="Store of the synaptic weights (default: dense).")
+    parser.add_argument("--dtype", action="store", default="float64", choices=["float64", "float32"],
+        dest="dtype", help="Numeric type of the leg networks (default: float64).")
+    parser.add_argument("--adaptive-substeps", action="store", default=None, type=float, metavar="THRESHOLD",
+        dest="adaptive_substeps", help="Run the engine with adaptive substeps with this threshold (default: off).")
+    parser.add_argument("--compact-state", action="store_true", default=False,
+        dest="compact_state", help="Run the engine on the compacted network state (dead-neuron elimination).")
+    parser.add_argument("-n", "--steps", action="store", default=100, type=int,
+        dest="steps", help="Number of control steps (10 network iterations each) to record.")
+    parser.add_argument("-d", "--directory", action="store", default="golden_traces",
+        dest="directory", help="Directory of the reference traces.")
+    parser.add_argument("--rtol", action="store", default=0., type=float,
+        dest="rtol", help="Relative tolerance of the comparison (default: 0, i.e. bitwise up to atol).")
+    parser.add_argument("--atol", action="store", default=0., type=float,
+        dest="atol", help="Absolute tolerance of the comparison.")
+    parser.add_argument("--threshold", action="store", default=1., type=float,
+        dest="threshold", help="Deviation of the activations (mV) that counts as divergence in the report.")
+    return parser.parse_args()
+
+##  Selection of a walking mode: w_mode and the coordination rules as
+#   computed in NeuroWNSettings for this mode.
+def walking_mode(mode):
+    def select(WNParams):
+        with open(WNParams.__file__, "rb") as settings_file:
+            source = settings_file.read()
+        default = b'w_mode = walking_modes["forward"]'
+        if default not in source:
+            raise Exception("Walking mode can not be selected: '" + default.decode() + "' not found in " + WNParams.__file__)
+        settings = {}
+        exec(compile(source.replace(default, b'w_mode = walking_modes["' + mode.encode() + b'"]'), WNParams.__file__, "exec"), settings)
+        WNParams.w_mode, WNParams.coord_rules = settings["w_mode"], settings["coord_rules"]
+    return select
+
+def leg_values(name, value, legs):
+    def select(WNParams):
+        for leg_name in legs:
+            getattr(WNParams, name)[leg_name] = value
+    return select
+
+def setting(name, value):
+    def select(WNParams):
+        setattr(WNParams, name, value)
+    return select
+
+##  Scenarios: changes of the default settings (applied in order).
+#   Scenarios with settings that a variant does not have are skipped for it.
+SCENARIOS = {
+    "forward": [],
+    "standing": [setting("velocity", 0.)],
+    "backward": [walking_mode("backward")],
+    "running": [walking_mode("running")],
+    "curve": [setting("curve_walking", True)],
+    "pilo": [leg_values("pilo", 1., LEG_NAMES[0:3])],
+    "deaff": [leg_values("Deaffonly", 1., LEG_NAMES[2:6]), leg_values("pilo", 1., LEG_NAMES[0:2])],
+    "sax": [leg_values("standL", 1., ["hind_left_leg", "hind_right_leg"]),
+            leg_values("frictW", 1., ["front_left_leg", "middle_left_leg", "middle_right_leg"])],
+    "disturb": [leg_values("disturb", 1., ["middle_right_leg"])],
+    "akay": [setting("Akay", 1.)],
+    "hellhess": [setting("HellHess", 1.)],
+}
+# Settings used by the scenarios (a scenario is only run if the variant has them)
+SCENARIO_SETTINGS = {"curve": "curve_walking", "pilo": "pilo", "deaff": "Deaffonly", "sax": "standL",
+                     "disturb": "disturb", "akay": "Akay", "hellhess": "HellHess"}
+
+def scenarios_of(WNParams, names=None):
+    return [name for name in (names or SCENARIOS)
+            if name not in SCENARIO_SETTINGS or hasattr(WNParams, SCENARIO_SETTINGS[name])]
+
+def trace_file(directory, variant, scenario):
+    return os.path.join(directory, variant + "_" + scenario + ".npz")
+
+##  Running a scenario and recording the traces after each network iteration.
+def run_scenario(variant, scenario, engine, synapses, steps, dtype="float64", adaptive_substeps=None, compact_state=False):
+    WNParams = importlib.import_module("controller." + variant + ".NeuroWNSettings")
+    importlib.reload(WNParams)   # default settings (the module is shared with the controller)
+    for change in SCENARIOS[scenario]:
+        change(WNParams)
+    WNParams.engine, WNParams.synapses, WNParams.dtype = engine, synapses, dtype
+    WNParams.compact_state = compact_state
+    if adaptive_substeps is not None:
+        WNParams.adaptive_substeps, WNParams.substep_threshold = True, adaptive_substeps
+    random.seed(0)
+
+    with contextlib.redirect_stdout(io.StringIO()):   # status output of the controller
+        loop = ControlLoop(variant)
+        legs = loop.controller.controller_objs
+        trace = {quantity: [] for quantity in QUANTITIES}
+        coordination_rules = loop.controller.coordination_rules
+        update_coordination_rules = coordination_rules.update_coordination_rules
+
+        # the coordination rules conclude each network iteration (millisecond)
+        def recording_update(timeStamp):
+            update_coordination_rules(timeStamp)
+            trace["v"].append([leg.v.copy() for leg in legs])
+            trace["Iapp"].append([leg.Iapp.copy() for leg in legs])
+            trace["motor"].append([[getattr(leg, joint) for joint in JOINTS] for leg in legs])
+        coordination_rules.update_coordination_rules = recording_update
+
+        for _ in range(steps):
+            loop.step()
+    importlib.reload(WNParams)
+    return {quantity: numpy.array(values, dtype=float) for quantity, values in trace.items()}
+
+def record(args, variant, scenario):
+    trace = run_scenario(variant, scenario, args.engine, args.synapses, args.steps, args.dtype)
+    info = {"variant": variant, "scenario": scenario, "engine": args.engine, "synapses": args.synapses,
+            "dtype": args.dtype, "steps": args.steps, "revision": git_revision()}
+    os.makedirs(args.directory, exist_ok=True)
+    numpy.savez_compressed(trace_file(args.directory, variant, scenario), info=json.dumps(info), **trace)
+    print("%-20s %-10s recorded %d ms" % (variant, scenario, len(trace["v"])))
+    return True
+
+##  First divergence (millisecond, leg, index, reference, value) of a quantity, None if within the tolerances.
+def first_divergence(reference, values, rtol, atol):
+    length = min(len(reference), len(values))
+    close = numpy.isclose(values[:length], reference[:length], rtol=rtol, atol=atol, equal_nan=True)
+    if close.all():
+        return None
+    ms, leg, index = numpy.argwhere(~close)[0]
+    return ms, leg, index, reference[ms, leg, index], values[ms, leg, index]
+
+def compare(args, variant, scenario):
+    filename = trace_file(args.directory, variant, scenario)
+    if not os.path.exists(filename):
+        print("%-20s %-10s no reference trace (%s)" % (variant, scenario, filename))
+        return False
+    reference = numpy.load(filename)
+    steps = json.loads(str(reference["info"]))["steps"]
+    trace = run_scenario(variant, scenario, args.engine, args.synapses, steps, args.dtype, args.adaptive_substeps,
+                         args.compact_state)
+
+    divergences = []
+    for quantity in QUANTITIES:
+        divergence = first_divergence(reference[quantity], trace[quantity], args.rtol, args.atol)
+        if divergence is not None:
+            divergences.append((divergence[0], quantity) + divergence[1:])
+    if not divergences:
+        deviation = max(numpy.max(numpy.abs(trace[quantity] - reference[quantity]), initial=0.) for quantity in QUANTITIES)
+        print("%-20s %-10s equal (%d ms, max deviation %.3g)" % (variant, scenario, len(trace["v"]), deviation))
+        return True
+    ms, quantity, leg, index, expected, value = min(divergences)
+    unit = JOINTS[index] if quantity == "motor" else "neuron %d" % index
+    print("%-20s %-10s DIVERGES at ms %d: %s %s of %s, reference %.17g, %s %.17g" %
+          (variant, scenario, ms, quantity, unit, LEG_NAMES[leg], expected, args.engine, value))
+    return False
+
+def report(args, variant, scenario):
+    filename = trace_file(args.directory, variant, scenario)
+    if not os.path.exists(filename):
+        print("%-20s %-10s no reference trace (%s)" % (variant, scenario, filename))
+        return False
+    reference = numpy.load(filename)
+    steps = json.loads(str(reference["info"]))["steps"]
+    trace = run_scenario(variant, scenario, args.engine, args.synapses, steps, args.dtype, args.adaptive_substeps,
+                         args.compact_state)
+
+    deviation = {quantity: numpy.abs(trace[quantity] - reference[quantity]) for quantity in ("v", "motor")}
+    diverged = numpy.flatnonzero((deviation["v"] > args.threshold).any(axis=(1, 2)))
+    print("%-20s %-10s %d ms: v max %.3g mV, RMS %.3g mV, > %g mV from ms %s; motor max %.3g, RMS %.3g" %
+          (variant, scenario, len(trace["v"]), deviation["v"].max(), numpy.sqrt(numpy.mean(deviation["v"]**2)),
+           args.threshold, diverged[0] if len(diverged) else "-",
+           deviation["motor"].max(), numpy.sqrt(numpy.mean(deviation["motor"]**2))))
+    return True
+
+def main(args):
+    action = {"record": record, "compare": compare, "report": report}[args.mode]
+    passed = True
+    for variant in (args.variants or VARIANTS):
+        WNParams = importlib.import_module("controller." + variant + ".NeuroWNSettings")
+        for scenario in scenarios_of(WNParams, args.scenarios):
+            passed = action(args, variant, scenario) and passed
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main(_args()))
@@ -0,0 +1,58 @@
+'''
+Control loop of the neuroWalknet controller on the kinematic plant
+(Hector/KinematicPlantF.py), assembled as in the __main__ files of the
+controllers but without simulator and visualizations.
+Used by the benchmarks and the golden trace harness.
+'''
+import os, importlib
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Geometry of the robot (read once, shared by the control loops of a process, e.g. a population)
+_geometry_xml = None
+
+def geometry_xml():
+    global _geometry_xml
+    if _geometry_xml is None:
+        with open(os.path.join(REPOSITORY, "GeometryXmls", "Hector.xml"), "r") as geometry:
+            _geometry_xml = geometry.read()
+    return _geometry_xml
+
+##  Robot, controller and execution of the control loop on the kinematic plant.
+class ControlLoop:
+
+    def __init__(self, variant, controllerFrequency=100):
+        """
+        variant is the package of the controller in controller/ (e.g. "neuro_walknet_2022"),
+        the settings (NeuroWNSettings) have to be adapted before.
+        """
+        from Hector.KinematicPlantF import CommunicationInterface
+        from Hector.RobotF import Robot
+        from ProcessOrganisation.ProcessModule.ProcessModuleQueuedExecution import ProcessModuleQueuedExecution
+        from ProcessOrganisation.SimulatorModule.SimulatorTimerModule import SimulatorTimerModule
+        from ProcessOrganisation.SimulatorModule.TickClock import TickClock
+        import geomparse
+        NeuroWalknet = importlib.import_module("controller." + variant + ".NeuroWalknet").NeuroWalknet
+
+        self.controllerFrequency = controllerFrequency
+        self.communication_interface = CommunicationInterface()
+        simServ = self.communication_interface.CreateBfbClient(14, ["SIMSERV_1_PROT"])
+        simServ.geometryXml = geometry_xml()
+        self.clock = TickClock(controllerFrequency)
+        self.execution = ProcessModuleQueuedExecution(debug_time=False, clock=self.clock)
+        self.robot = Robot("Robot_object", geomparse.parseHectorXml(""), self.communication_interface)
+        self.execution.add_module(self.robot)
+        self.controller = NeuroWalknet("neuro_walknet", self.robot)
+        self.execution.add_control_module_to_queue(self.controller, float('Inf'))
+        self.execution.add_module(SimulatorTimerModule("Simulator_Timer", self.robot, controllerFrequency, self.clock))
+        self.execution.init_all_modules()
+
+    ##  Simulation time of the next control step (seconds, from the tick clock).
+    @property
+    def simulationTime(self):
+        return self.clock.time()
+
+    ##  One control step of all modules (robot, controller, plant).
+    def step(self):
+        self.execution.execute_complete_step(self.simulationTime)
+        self.communication_interface.NotifyOfNextIteration()
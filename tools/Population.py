@@ -0,0 +1,234 @@
+'''
+Population of neuroWalknet controllers, simulated in lockstep for parameter studies.
+
+Instead of one process (and simulator) per parameter set, a population of N
+individuals is built, each with its own robot, controller and kinematic plant
+(Hector/KinematicPlantF.py), constructed with its own settings: any scalar of
+NeuroWNSettings (e.g. velocity), the strength of a coordination rule (e.g. R1a),
+CPGfrequ (same factor for all legs) and the motor noise (noisefct of the legs).
+
+The state of the population is stacked: the leg networks of all individuals
+form one LegNetworkBatch (activations N x 6 x n, see Population.v), the
+individuals differ only in their parameters, so the weight matrices are not
+stacked but shared (PopulationSynapses: one matrix per leg and the weights
+that depend on the parameters or change during walking per individual), the
+coordination rules of the individuals (with their strengths) are compiled
+into one coupling operator and the plants are stacked (N x 6 x 3) and
+advanced at once. The network phase is therefore computed for all individuals
+with one batched product per network iteration; the input and output phases
+stay the code of the leg controllers. All individuals use the same network
+time step (integrator and substeps of the settings).
+
+After each control step the swing/stance state of the legs (v[122] > v[123])
+is recorded, from which the gait metrics of each individual are computed:
+step frequency (swing phases per leg and second), duty factor (fraction of
+stance), mean number of legs in swing and fraction of the time with more than
+three legs in swing.
+
+The numeric type of the networks is the dtype of the settings, it can be
+given as a parameter of the population (dtype="float32" halves the memory
+traffic of the network phase, see NeuroWNSettings.dtype).
+
+Run: python3 -m tools.Population -N 64 -p velocity=20:40 [-p R1a=0.5,1.] [--steps 1000] [--dtype float32] [-o metrics.json]
+'''
+import io, sys, json, time, random, itertools, contextlib, importlib
+import numpy
+
+from tools.HeadlessControlLoop import ControlLoop
+from controller.neuro_common.LegNetworkBatch import LegNetworkBatch
+from controller.neuro_common.CoordinationOperator import CoordinationOperator
+from controller.neuro_common.PopulationSynapses import PopulationSynapses
+from controller.neuro_common import LegNetworkDefinition, NetworkCompiler
+from ProcessOrganisation.SimulatorModule.TickClock import TickClock
+
+# Parameters of the individuals that are not plain settings
+SPECIAL_PARAMETERS = ("CPGfrequ", "noise")
+
+##  Getting the command line arguments.
+def _args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Population of neuroWalknet controllers for parameter studies")
+    parser.add_argument("-v", "--variant", action="store", default="neuro_walknet_2022",
+        choices=["neuro_walknet", "neuro_walknet_2022"], dest="variant", help="Controller.")
+    parser.add_argument("-N", "--individuals", action="store", default=16, type=int,
+        dest="individuals", help="Number of individuals.")
+    parser.add_argument("-p", "--parameter", action="append", default=[], metavar="NAME=VALUES",
+        dest="parameters", help="Parameter of the individuals: NAME=START:STOP (evenly spaced over the individuals) "
+        "or NAME=V1,V2,... (repeated over the individuals). NAME is a setting (e.g. velocity), "
+        "a coordination rule (e.g. R1a), CPGfrequ or noise.")
+    parser.add_argument("-n", "--steps", action="store", default=1000, type=int,
+        dest="steps", help="Number of control steps (10 ms each).")
+    parser.add_argument("--dtype", action="store", default=None, choices=["float64", "float32"],
+        dest="dtype", help="Numeric type of the network state and weights (default: dtype of the settings).")
+    parser.add_argument("-o", "--output", action="store", default=None,
+        dest="output", help="File for the JSON results (default: table on the standard output).")
+    return parser.parse_args()
+
+##  Values of a parameter for the individuals, from START:STOP or V1,V2,...
+def parameter_values(text, individuals):
+    if ":" in text:
+        start, stop = (float(value) for value in text.split(":"))
+        return list(numpy.linspace(start, stop, individuals))
+    values = [float(value) for value in text.split(",")]
+    return list(itertools.islice(itertools.cycle(values), individuals))
+
+##  Parameters of each individual (list of dicts) from the NAME=VALUES arguments.
+def parameter_sets(arguments, individuals):
+    columns = {}
+    for argument in arguments:
+        name, _, text = argument.partition("=")
+        columns[name] = parameter_values(text, individuals)
+    return [{name: values[index] for name, values in columns.items()} for index in range(individuals)]
+
+class Population:
+    """
+    Individuals (ControlLoop objects) with stacked leg networks, coordination and plants.
+    """
+
+    def __init__(self, variant, parameters, controllerFrequency=100, dtype=None):
+        """
+        variant is the package of the controller in controller/ (e.g. "neuro_walknet_2022"),
+        parameters a list with the parameters (dict name: value) of each individual,
+        dtype the numeric type of the networks of all individuals (None: from the settings).
+        """
+        WNParams = importlib.import_module("controller." + variant + ".NeuroWNSettings")
+        rules = importlib.import_module("controller." + variant + ".NeuroCoordinationRules")
+        self.controllerFrequency = controllerFrequency
+        self.parameters = [dict(individual) for individual in parameters]
+        self.individuals = []
+        strengths = []
+        for individual in self.parameters:
+            importlib.reload(WNParams)   # default settings (the module is shared with the controller)
+            self.apply_settings(WNParams, individual)
+            # the networks are stacked below, the individuals are built with the vectorized engine
+            # and dense weights (the population has its own store of the weights)
+            WNParams.engine, WNParams.synapses, WNParams.adaptive_substeps = "vectorized", "dense", False
+            if dtype:
+                WNParams.dtype = dtype
+            loop = ControlLoop(variant, controllerFrequency)
+            for leg in loop.controller.controller_objs:
+                if leg and "noise" in individual:
+                    leg.noisefct = individual["noise"]
+            self.individuals.append(loop)
+            strengths.append(dict(WNParams.coord_rules))
+        importlib.reload(WNParams)
+
+        controllers = [loop.controller for loop in self.individuals]
+        if len(set(controller.substeps for controller in controllers)) > 1:
+            raise Exception("The individuals of a population have to use the same number of network iterations per control step")
+        self.substeps = controllers[0].substeps
+        self.legs = [leg for controller in controllers for leg in controller.controller_objs if leg]
+        self.legs_per_individual = len(self.legs) // len(controllers)
+        self.network_batch = LegNetworkBatch(self.legs, stack_weights=False)
+        n = self.legs[0].n
+        self.v = self.network_batch.v.reshape((len(controllers), self.legs_per_individual, n))
+        # the weights that are the same in all individuals are shared (see PopulationSynapses)
+        # (the weights that depend on the parameters are taken from the connection list, so that
+        #  the pages of the weight matrices of the legs that are shared are not read)
+        stores = []
+        for name in ("WE", "WI"):
+            varying = NetworkCompiler.override_synapses(LegNetworkDefinition.CONNECTIONS, name)
+            matrices = [[getattr(leg, name) for leg in controller.controller_objs if leg] for controller in controllers]
+            weights = [[NetworkCompiler.synapse_weights(LegNetworkDefinition.CONNECTIONS, name, varying, leg.network_parameters)
+                        for leg in controller.controller_objs if leg] for controller in controllers]
+            stores.append(PopulationSynapses(matrices, varying, getattr(self.legs[0], "dynamic_weights_" + name), weights))
+        self.network_batch.use_stores(*stores)
+
+        # coordination rules of all individuals, with their strengths, as one operator on the stacked activations
+        operators = []
+        for index, controller in enumerate(controllers):
+            present = [i for i, leg in enumerate(controller.controller_objs) if leg]
+            rows = [index*self.legs_per_individual + present.index(i) if i in present else None
+                    for i in range(len(controller.controller_objs))]
+            operators.append(CoordinationOperator(rules.coupling_table, strengths[index], rows, n, rules.coupling_limits,
+                                                  controller.dt))
+        self.coordination = CoordinationOperator.concatenate(operators)
+
+        from Hector.KinematicPlantF import KinematicPlant
+        self.plant = KinematicPlant.stack([loop.communication_interface.plant for loop in self.individuals])
+        self.clock = TickClock(controllerFrequency)
+        self.swing = []
+
+    @staticmethod
+    def apply_settings(WNParams, individual):
+        for name, value in individual.items():
+            if name == "CPGfrequ":
+                WNParams.CPGfrequ = {leg_name: value for leg_name in WNParams.CPGfrequ}
+            elif name == "noise":
+                pass   # set in the legs after the construction
+            elif isinstance(WNParams.coord_rules, dict) and name in WNParams.coord_rules:
+                WNParams.coord_rules = dict(WNParams.coord_rules, **{name: value})
+            elif hasattr(WNParams, name) and not isinstance(getattr(WNParams, name), (dict, list)):
+                setattr(WNParams, name, value)
+            else:
+                raise Exception("Unknown parameter '" + name + "' (a setting, a coordination rule, "
+                                + " or ".join(SPECIAL_PARAMETERS) + ")")
+
+    ##  One control step of all individuals: the steps of NeuroWalknet.processing_step,
+    #   with the network phase and the coordination rules computed for the whole population.
+    def step(self):
+        timeStamp = self.clock.time()
+        for loop in self.individuals:
+            loop.robot.pre_processing_step(timeStamp)
+        for leg in self.legs:
+            leg.update_joint_positions()
+        for _ in range(self.substeps):
+            for leg in self.legs:
+                leg.update_inputs(timeStamp)
+            self.network_batch.update_networks()
+            for leg in self.legs:
+                leg.update_outputs(timeStamp)
+            self.coordination.apply(self.network_batch.v)
+        for leg in self.legs:
+            leg.send_control_velocities()
+        for loop in self.individuals:
+            loop.controller.count += self.substeps * loop.controller.dt
+        self.plant.step(1/self.controllerFrequency)
+        self.clock.advance()
+        self.swing.append(self.v[..., 122] > self.v[..., 123])
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+
+    ##  Gait metrics of each individual (list of dicts) from the recorded swing/stance states.
+    def gait_metrics(self):
+        swing = numpy.array(self.swing)   # steps x individuals x legs
+        duration = len(swing) / self.controllerFrequency
+        onsets = numpy.count_nonzero(swing[1:] & ~swing[:-1], axis=0)
+        legs_in_swing = numpy.count_nonzero(swing, axis=2)
+        return [{"step_frequency": float(onsets[index].mean() / duration),
+                 "duty_factor": float(1. - swing[:, index].mean()),
+                 "mean_swing_legs": float(legs_in_swing[:, index].mean()),
+                 "unstable_fraction": float(numpy.mean(legs_in_swing[:, index] > 3))}
+                for index in range(len(self.individuals))]
+
+def main(args):
+    parameters = parameter_sets(args.parameters, args.individuals)
+    random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):   # status output of the controllers
+        start = time.perf_counter()
+        population = Population(args.variant, parameters, dtype=args.dtype)
+        construction = time.perf_counter() - start
+        start = time.perf_counter()
+        population.run(args.steps)
+        duration = time.perf_counter() - start
+    metrics = population.gait_metrics()
+    results = {"variant": args.variant, "individuals": args.individuals, "steps": args.steps, "dtype": str(population.v.dtype),
+               "construction_s": construction, "run_s": duration,
+               "individual_steps_per_s": args.individuals * args.steps / duration,
+               "individuals_results": [dict(parameters=individual, **gait) for individual, gait in zip(parameters, metrics)]}
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        return
+    names = sorted({name for individual in parameters for name in individual})
+    print(" ".join("%10s" % name for name in names) + " %10s %10s %10s %10s" % ("steps/s", "duty", "swing legs", ">3 swing"))
+    for individual, gait in zip(parameters, metrics):
+        print(" ".join("%10.4g" % individual[name] for name in names) + " %10.3f %10.3f %10.3f %10.3f" %
+              (gait["step_frequency"], gait["duty_factor"], gait["mean_swing_legs"], gait["unstable_fraction"]))
+    print("%d individuals, %d control steps in %.1f s (construction %.1f s): %.1f individual control steps/s"
+          % (args.individuals, args.steps, duration, construction, results["individual_steps_per_s"]))
+
+if __name__ == "__main__":
+    sys.exit(main(_args()))